@@ -8,6 +8,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from flask import Flask, g
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_mail import Mail
 from flask_migrate import Migrate
 import stripe
@@ -18,7 +19,21 @@ from models import db, Ticket, Sharpener, Feedback
 from utils.i18n import t
 from utils.banner import print_startup_banner
 from utils.helpers import mask_phone_number, format_datetime
+from utils.metrics import init_metrics
+from utils.sql_profiler import init_sql_profiler
+from utils.log import init_logging
+from utils.assets import init_assets
+from utils.compression import init_compression
+from utils.page_cache import init_page_cache
+from utils.database import database_uri, engine_options
+from services.auth import init_identity
+from services.admission import init_admission
+from services.dispatch import init_dispatch
+from services.clubs import init_clubs
+from services.health import init_health
+from services.profiling import init_profiling
 from routes import register_blueprints
+from commands import register_commands
 
 # Load environment variables from .env file
 load_dotenv()
@@ -37,14 +52,11 @@ def create_app():
     # Use absolute path for SQLite database to avoid path resolution issues
     basedir = os.path.abspath(os.path.dirname(__file__))
     default_db_path = f'sqlite:///{os.path.join(basedir, "instance", "skate_tickets.db")}'
-    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', default_db_path)
+    # postgres:// and postgresql:// URLs are pointed at psycopg2
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(os.environ.get('DATABASE_URL', default_db_path))
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-    # Handle PostgreSQL URL format for SQLAlchemy 2.0+
-    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres://'):
-        app.config['SQLALCHEMY_DATABASE_URI'] = (
-            app.config['SQLALCHEMY_DATABASE_URI'].replace('postgres://', 'postgresql://', 1)
-        )
+    # Connection pool and statement timeout on PostgreSQL (DB_POOL_SIZE, DB_STATEMENT_TIMEOUT_MS, ...)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 
     # Email configuration
     app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -54,6 +66,17 @@ def create_app():
     app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
     app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@skk.dk')
 
+    # Logging (structured JSON written from a background thread)
+    app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+    app.config['LOG_LEVELS'] = os.environ.get('LOG_LEVELS', '')
+    app.config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'json')
+    app.config['LOG_SAMPLE_RATES'] = os.environ.get('LOG_SAMPLE_RATES', '')
+    init_logging(app)
+
+    # Development SQL profiler (per-request query log, N+1 detection)
+    app.config['SQL_PROFILER'] = os.environ.get('SQL_PROFILER', 'false').lower() == 'true'
+    app.config['SQL_PROFILER_SLOW_MS'] = int(os.environ.get('SQL_PROFILER_SLOW_MS', '100'))
+
     # Initialize extensions
     db.init_app(app)
     mail = Mail(app)
@@ -61,10 +84,90 @@ def create_app():
 
     # Configure Stripe
     stripe.api_key = os.environ.get('STRIPE_SECRET_KEY', 'your-stripe-secret-key')
+    # STRIPE_API_BASE can point at a local stand-in (python -m standins.stripe_api)
+    stripe.api_base = os.environ.get('STRIPE_API_BASE', 'https://api.stripe.com')
+    # Keep-alive session per thread, with a timeout well below gunicorn's worker timeout
+    stripe.default_http_client = stripe.http_client.RequestsClient(
+        timeout=float(os.environ.get('STRIPE_TIMEOUT', '20'))
+    )
+
+    # Request, SQL and outbound-call metrics (exposed at /metrics)
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN', '')
+    app.config['METRICS_PUBLIC'] = os.environ.get('METRICS_PUBLIC', 'false').lower() == 'true'
+    init_metrics(app)
+    init_sql_profiler(app)
+
+    # Admission control for ticket requests: rate limits shared by all workers, reCAPTCHA v3
+    app.config['RATE_LIMIT_IP'] = os.environ.get('RATE_LIMIT_IP', '60/hour')
+    app.config['RATE_LIMIT_PHONE'] = os.environ.get('RATE_LIMIT_PHONE', '6/hour')
+    app.config['RECAPTCHA_SITE_KEY'] = os.environ.get('RECAPTCHA_SITE_KEY', '')
+    app.config['RECAPTCHA_SECRET_KEY'] = os.environ.get('RECAPTCHA_SECRET_KEY', '')
+    app.config['RECAPTCHA_MIN_SCORE'] = float(os.environ.get('RECAPTCHA_MIN_SCORE', '0.5'))
+    app.config['RECAPTCHA_TIMEOUT'] = float(os.environ.get('RECAPTCHA_TIMEOUT', '3'))
+    app.config['RECAPTCHA_FAIL_OPEN'] = os.environ.get('RECAPTCHA_FAIL_OPEN', 'true').lower() == 'true'
+    init_admission(app)
+
+    # Client IPs come from X-Forwarded-For set by this many trusted proxies (0 = direct).
+    # Only set it behind a proxy: a direct client can forge the header and get a fresh
+    # rate limit bucket per request; behind one, unset, every customer shares a bucket.
+    proxy_hops = int(os.environ.get('PROXY_FIX_X_FOR', '0'))
+    if proxy_hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops)
+
+    # gzip/brotli for dynamic HTML and JSON (static assets are precompressed at build time)
+    app.config['COMPRESSION'] = os.environ.get('COMPRESSION', 'true').lower() == 'true'
+    app.config['COMPRESSION_MIN_SIZE'] = int(os.environ.get('COMPRESSION_MIN_SIZE', '500'))
+    app.config['COMPRESSION_GZIP_LEVEL'] = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+    app.config['COMPRESSION_BROTLI_QUALITY'] = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+    init_compression(app)
+
+    # Per-request sharpener identity, cached across requests per worker
+    app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', '60'))
+    init_identity(app)
+
+    # Fingerprinted static assets built by flask build-assets (CDN fallback until then)
+    init_assets(app)
+
+    # Rendered intake page per language and price, per worker
+    app.config['PAGE_CACHE'] = os.environ.get('PAGE_CACHE', 'true').lower() == 'true'
+    app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', '300'))
+    init_page_cache(app)
+
+    # Paid tickets: picked from the ready list (manual), offered to or assigned to
+    # available sharpeners (offer, auto)
+    app.config['DISPATCH_MODE'] = os.environ.get('DISPATCH_MODE', 'manual').lower()
+    app.config['DISPATCH_MAX_PER_SHARPENER'] = int(os.environ.get('DISPATCH_MAX_PER_SHARPENER', '1'))
+    app.config['DISPATCH_OFFER_TIMEOUT'] = int(os.environ.get('DISPATCH_OFFER_TIMEOUT', '120'))
+    app.config['DISPATCH_URGENT_MINUTES'] = int(os.environ.get('DISPATCH_URGENT_MINUTES', '30'))
+    init_dispatch(app)
+
+    # Clubs sharing the deployment: /c/<slug>/... paths, club hostnames, else DEFAULT_CLUB
+    app.config['CLUB_PATH_PREFIX'] = os.environ.get('CLUB_PATH_PREFIX', '/c')
+    app.config['DEFAULT_CLUB'] = os.environ.get('DEFAULT_CLUB', '')
+    app.config['CLUB_CACHE_TTL'] = int(os.environ.get('CLUB_CACHE_TTL', '60'))
+    init_clubs(app)
+
+    # /healthz (no I/O) and /readyz (database, sidecar lag, provider errors; cached per worker)
+    app.config['READY_CACHE_TTL'] = int(os.environ.get('READY_CACHE_TTL', '5'))
+    app.config['READY_EXPIRY_LAG_SECONDS'] = int(os.environ.get('READY_EXPIRY_LAG_SECONDS', '3600'))
+    # Only deployments that run `flask expire-tickets` can fall behind on it; the TTL must match the job's
+    app.config['READY_CHECK_EXPIRY'] = os.environ.get('READY_CHECK_EXPIRY', 'false').lower() == 'true'
+    app.config['UNPAID_TICKET_TTL_HOURS'] = float(os.environ.get('UNPAID_TICKET_TTL_HOURS', '48'))
+    init_health(app)
 
     # Register blueprints
     register_blueprints(app)
 
+    # Register CLI commands
+    register_commands(app)
+
+    # Admins can profile a single request with ?_profile=1 (cProfile) or ?_profile=sample
+    # (stack samples for a flame graph); stored profiles are listed at /admin/profiles.
+    # Registered last, so the profile covers the view rather than the other hooks.
+    app.config['PROFILING'] = os.environ.get('PROFILING', 'true').lower() == 'true'
+    app.config['PROFILE_KEEP'] = int(os.environ.get('PROFILE_KEEP', '50'))
+    init_profiling(app)
+
     # Register Jinja2 filters
     app.jinja_env.filters['mask_phone'] = mask_phone_number
     app.jinja_env.filters['fmt_dt'] = format_datetime
@@ -75,8 +178,7 @@ def create_app():
         """Make common variables available in all templates"""
         return {
             't': t,
-            'recaptcha_site_key': os.environ.get('RECAPTCHA_SITE_KEY', ''),
-            'sharpening_price': int(os.environ.get('SHARPENING_PRICE_DKK', '80'))
+            'recaptcha_site_key': app.config['RECAPTCHA_SITE_KEY'],
         }
 
     # Database migrations are handled by Flask-Migrate
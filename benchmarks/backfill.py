@@ -0,0 +1,151 @@
+"""
+Backfill benchmark: how long do writers wait while a migration fills a column?
+
+Seeds --tickets tickets into a scratch SQLite file and adds an empty column,
+then fills it twice while a writer thread updates random tickets at --rate
+commits per second: once with a single `UPDATE ticket SET ...` (what a
+revision did before), once with `utils.backfill`. For each it reports the
+duration and the writer's p50/p99/max commit latency.
+
+It then checks resuming: a backfill stopped by max_seconds partway must
+leave a checkpoint, and the next run must finish the rest.
+
+Usage:
+    python -m benchmarks.backfill --tickets 500000 --rate 20
+    python -m benchmarks.backfill --batch-seconds 0.1 --output backfill.json
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.backup import Writer
+from benchmarks.harness import configure_environment, percentile, reset_database, save_results
+
+COLUMN = 'backfill_bench'
+
+
+def with_writer(source, rate, max_id, fill):
+    """Run fill() while a Writer commits at rate; returns (seconds, writer latencies in ms)"""
+    writer = Writer(source, rate, max_id)
+    writer.start()
+    time.sleep(0.5)
+    writer.latencies.clear()
+    started = time.perf_counter()
+    try:
+        fill()
+    finally:
+        elapsed = time.perf_counter() - started
+        writer.stopping.set()
+        writer.join()
+    return elapsed, writer.latencies
+
+
+def clear_column(source):
+    connection = sqlite3.connect(source)
+    connection.execute(f'UPDATE ticket SET {COLUMN} = NULL')
+    connection.execute("DELETE FROM job_checkpoint WHERE name LIKE 'backfill:%'")
+    connection.commit()
+    connection.close()
+
+
+def null_rows(source):
+    connection = sqlite3.connect(source)
+    count = connection.execute(f'SELECT COUNT(*) FROM ticket WHERE {COLUMN} IS NULL').fetchone()[0]
+    connection.close()
+    return count
+
+
+def run_backfill(engine, **kwargs):
+    """utils.backfill.backfill() outside of `flask db upgrade`, through its own migration context"""
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    from utils.backfill import backfill
+    with engine.connect() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            return backfill('ticket', f'{COLUMN} = :value', where=f'{COLUMN} IS NULL', params={'value': 1},
+                            name='ticket.backfill_bench', **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=500000, help='Tickets to seed')
+    parser.add_argument('--rate', type=float, default=20, help='Writer commits per second')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Ids per statement to start with')
+    parser.add_argument('--batch-seconds', type=float, default=0.25, help='Batch duration to aim for')
+    parser.add_argument('--pause', type=float, default=0.05, help='Seconds between batches')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    # Always a scratch SQLite file: this measures SQLite's write lock
+    configure_environment(f"sqlite:///{tempfile.mkdtemp(prefix='skate-bench-')}/bench.db")
+
+    from app import app
+    from models import db
+    from commands.seed import seed_command
+    from services.backup import sqlite_database_path
+    from utils.backfill import BackfillInterrupted
+    with app.app_context():
+        reset_database(db)
+        source = sqlite_database_path(db.engine.url)
+    print(f"Seeding {args.tickets} tickets ...")
+    result = app.test_cli_runner().invoke(seed_command, ['--tickets', str(args.tickets)])
+    if result.exit_code != 0:
+        print(result.output)
+        return 1
+    with app.app_context():
+        engine = db.engine
+        max_id = db.session.execute(db.text('SELECT MAX(id) FROM ticket')).scalar()
+        db.session.execute(db.text(f'ALTER TABLE ticket ADD COLUMN {COLUMN} INTEGER'))
+        db.session.commit()
+    settings = {'batch_size': args.batch_size, 'batch_seconds': args.batch_seconds, 'pause': args.pause}
+
+    def single_update():
+        connection = sqlite3.connect(source, timeout=60)
+        connection.execute(f'UPDATE ticket SET {COLUMN} = 1 WHERE {COLUMN} IS NULL')
+        connection.commit()
+        connection.close()
+
+    runs = {}
+    for label, fill in (('single UPDATE', single_update),
+                        ('backfill', lambda: run_backfill(engine, **settings))):
+        clear_column(source)
+        elapsed, latencies = with_writer(source, args.rate, max_id, fill)
+        runs[label] = {
+            'seconds': round(elapsed, 2),
+            'writes': len(latencies),
+            'write_p50_ms': round(percentile(latencies, 50), 2),
+            'write_p99_ms': round(percentile(latencies, 99), 2),
+            'write_max_ms': round(max(latencies, default=0), 2),
+        }
+
+    print(f"\nWriter commit latency while {args.tickets} tickets are filled, {args.rate:g} writes/s\n")
+    print(f"{'':<14} {'seconds':>8} {'writes':>7} {'write p50':>10} {'write p99':>10} {'write max':>10}")
+    for label, row in runs.items():
+        print(f"{label:<14} {row['seconds']:>8.2f} {row['writes']:>7} {row['write_p50_ms']:>8.2f}ms "
+              f"{row['write_p99_ms']:>8.2f}ms {row['write_max_ms']:>8.2f}ms")
+
+    # Stop partway, then resume
+    clear_column(source)
+    with app.app_context():
+        try:
+            run_backfill(engine, max_seconds=runs['backfill']['seconds'] / 3, **settings)
+            interrupted = False
+        except BackfillInterrupted:
+            interrupted = True
+        left = null_rows(source)
+        resumed = run_backfill(engine, **settings)
+    resume_ok = interrupted and 0 < left == resumed and null_rows(source) == 0
+    print(f"\nResume: stopped with {left} rows to go, the next run updated {resumed} "
+          f"{'✅' if resume_ok else '❌'}")
+
+    if args.output:
+        save_results(args.output, {'tickets': args.tickets, 'rate': args.rate, 'settings': settings,
+                                   'runs': runs, 'resume_ok': resume_ok})
+        print(f"\nResults written to {args.output}")
+    return 0 if resume_ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Backup benchmark: how long do writers wait while the database is backed up?
+
+Seeds --tickets tickets into a scratch SQLite file, then backs it up with
+`services.backup` while a writer thread updates random tickets at --rate
+commits per second, once per combination of writer rate, journal mode
+(delete, wal) and step size (--pages per step, and everything in one step). For each it
+reports the backup's duration, restarts and lock wait, and the writer's
+p50/p99/max commit latency during the backup. In WAL mode the backup always
+copies in one step, so that mode runs once per rate.
+
+Usage:
+    python -m benchmarks.backup --tickets 200000 --rates 2,20
+    python -m benchmarks.backup --pages 128 --output backup.json
+"""
+import argparse
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.harness import configure_environment, percentile, reset_database, save_results
+
+
+class Writer(threading.Thread):
+    """Commit one small update every 1/rate seconds, recording each commit's latency"""
+
+    def __init__(self, path, rate, max_id):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = 1 / rate
+        self.max_id = max_id
+        self.latencies = []
+        self.stopping = threading.Event()
+
+    def run(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        rng = random.Random(42)
+        while not self.stopping.is_set():
+            started = time.perf_counter()
+            connection.execute('UPDATE ticket SET offer_misses = offer_misses + 1 WHERE id = ?',
+                               (rng.randint(1, self.max_id),))
+            connection.commit()
+            elapsed = time.perf_counter() - started
+            self.latencies.append(elapsed * 1000)
+            time.sleep(max(self.interval - elapsed, 0))
+        connection.close()
+
+
+def run(source, journal_mode, pages, rate, max_id, pause, max_restarts):
+    from services.backup import backup_database
+    connection = sqlite3.connect(source)
+    connection.execute(f'PRAGMA journal_mode = {journal_mode}')
+    connection.close()
+
+    writer = Writer(source, rate, max_id)
+    writer.start()
+    time.sleep(0.5)
+    writer.latencies.clear()
+    directory = tempfile.mkdtemp(prefix='skate-backup-')
+    try:
+        report = backup_database(source, directory, keep=1, compress=False, pages=pages, pause=pause,
+                                 max_restarts=max_restarts)
+    finally:
+        writer.stopping.set()
+        writer.join()
+        shutil.rmtree(directory)
+    latencies = writer.latencies
+    return {
+        'rate': rate,
+        'journal_mode': journal_mode,
+        'pages_per_step': pages,
+        'backup_seconds': round(report.duration, 3),
+        'steps': report.steps,
+        'restarts': report.restarts,
+        'single_step': report.single_step,
+        'lock_wait_ms': round(report.lock_wait * 1000, 1),
+        'longest_step_ms': round(report.longest_step * 1000, 1),
+        'writes': len(latencies),
+        'write_p50_ms': round(percentile(latencies, 50), 2),
+        'write_p99_ms': round(percentile(latencies, 99), 2),
+        'write_max_ms': round(max(latencies, default=0), 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=200000, help='Tickets to seed')
+    parser.add_argument('--rates', default='2,20', help='Writer commits per second to try, e.g. 2,20')
+    parser.add_argument('--pages', type=int, default=256, help='Pages per step for the stepped backup')
+    parser.add_argument('--pause', type=float, default=0.005, help='Seconds between steps')
+    parser.add_argument('--max-restarts', type=int, default=10)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    # Always a scratch SQLite file: this measures SQLite's locking
+    configure_environment(f"sqlite:///{tempfile.mkdtemp(prefix='skate-bench-')}/bench.db")
+
+    from app import app
+    from models import db
+    from commands.seed import seed_command
+    from services.backup import sqlite_database_path
+    with app.app_context():
+        reset_database(db)
+        source = sqlite_database_path(db.engine.url)
+    print(f"Seeding {args.tickets} tickets ...")
+    result = app.test_cli_runner().invoke(seed_command, ['--tickets', str(args.tickets)])
+    if result.exit_code != 0:
+        print(result.output)
+        return 1
+    with app.app_context():
+        db.engine.dispose()
+
+    runs = []
+    for rate in [float(rate) for rate in args.rates.split(',')]:
+        for journal_mode, pages in (('delete', args.pages), ('delete', -1), ('wal', -1)):
+            runs.append(run(source, journal_mode, pages, rate, args.tickets, args.pause, args.max_restarts))
+
+    print(f"\nWriter commit latency during each backup\n")
+    print(f"{'writes/s':>8} {'journal':<8} {'pages':>6} {'backup s':>9} {'steps':>6} {'restarts':>9} {'lock wait':>10} "
+          f"{'longest step':>13} {'write p50':>10} {'write p99':>10} {'write max':>10}")
+    for row in runs:
+        print(f"{row['rate']:>8g} {row['journal_mode']:<8} {'all' if row['pages_per_step'] < 0 else row['pages_per_step']:>6} "
+              f"{row['backup_seconds']:>9.2f} {row['steps']:>6} {row['restarts']:>9}"
+              f"{'*' if row['single_step'] and row['journal_mode'] != 'wal' else ' '}{row['lock_wait_ms']:>8.1f}ms {row['longest_step_ms']:>11.1f}ms "
+              f"{row['write_p50_ms']:>8.2f}ms {row['write_p99_ms']:>8.2f}ms {row['write_max_ms']:>8.2f}ms")
+    if any(row['single_step'] and row['journal_mode'] != 'wal' for row in runs):
+        print(f"\n* more than {args.max_restarts} restarts, the rest was copied in one step")
+
+    if args.output:
+        save_results(args.output, {'tickets': args.tickets, 'runs': runs})
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
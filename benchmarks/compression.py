@@ -0,0 +1,132 @@
+"""
+Response compression benchmark.
+
+Seeds a busy rink (a queue of paid tickets, a full page of unpaid ones),
+then fetches the largest pages with each Accept-Encoding the middleware
+supports and reports, per page and encoding, the bytes on the wire, the
+saving against the uncompressed response and the CPU time per request
+(total, and the compression step on its own).
+
+Usage:
+    python -m benchmarks.compression --requests 200
+    python -m benchmarks.compression --gzip-level 9 --brotli-quality 6 --output compression.json
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.harness import configure_environment, reset_database, stub_providers, save_results
+
+PAGES = [
+    ('customer.index', '/'),
+    ('sharpener.dashboard', '/sharpener/'),
+    ('sharpener.unpaid_tickets', '/sharpener/unpaid'),
+    ('metrics', '/metrics'),
+]
+
+
+def seed(db, Ticket, Sharpener, queued, unpaid):
+    from werkzeug.security import generate_password_hash
+    sharpener = Sharpener(club_id=1, name='Bench', email='bench@example.com', phone='4512345678',
+                          username='bench', password_hash=generate_password_hash('bench'), is_admin=True)
+    db.session.add(sharpener)
+    now = datetime.utcnow()
+    for i in range(queued + unpaid):
+        paid = i < queued
+        db.session.add(Ticket(
+            club_id=1, code=f'BN-{i:03d}', customer_name=f'Customer {i}', customer_phone=f'45{20000000 + i}',
+            brand='graf', color='white', size='40', price=80,
+            status='paid' if paid else 'unpaid', payment_id=f'pi_bench_{i}',
+            created_at=now - timedelta(minutes=i), paid_at=now - timedelta(minutes=i) if paid else None,
+        ))
+    db.session.commit()
+
+
+def measure(client, path, accept_encoding, requests):
+    """(wire bytes, Content-Encoding, CPU ms and wall ms per request) for one page and encoding"""
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    response = client.get(path, headers=headers)
+    size = len(response.data)
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for _ in range(requests):
+        client.get(path, headers=headers)
+    cpu = (time.process_time() - cpu_start) / requests * 1000
+    wall = (time.perf_counter() - wall_start) / requests * 1000
+    return size, response.headers.get('Content-Encoding'), cpu, wall
+
+
+def compress_cost(middleware, body, encoding, repeat=50):
+    """CPU ms to compress body once"""
+    start = time.process_time()
+    for _ in range(repeat):
+        middleware.compress(body, encoding)
+    return (time.process_time() - start) / repeat * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help='Requests per page and encoding')
+    parser.add_argument('--queued', type=int, default=40, help='Paid tickets in the queue')
+    parser.add_argument('--unpaid', type=int, default=50, help='Unpaid tickets')
+    parser.add_argument('--gzip-level', type=int, default=6)
+    parser.add_argument('--brotli-quality', type=int, default=4)
+    parser.add_argument('--database-url',
+                        help='Database to run against (default: TEST_DATABASE_URL or a scratch SQLite file)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    configure_environment(args.database_url,
+                          COMPRESSION_GZIP_LEVEL=str(args.gzip_level),
+                          COMPRESSION_BROTLI_QUALITY=str(args.brotli_quality))
+
+    from app import app
+    from models import db, Ticket, Sharpener
+    from utils.compression import CompressionMiddleware
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        reset_database(db)
+        seed(db, Ticket, Sharpener, args.queued, args.unpaid)
+
+    middleware = app.wsgi_app
+    while not isinstance(middleware, CompressionMiddleware):
+        middleware = middleware.app
+    encodings = [None] + list(reversed(middleware.encodings))
+
+    client = app.test_client()
+    results = {'gzip_level': args.gzip_level, 'brotli_quality': args.brotli_quality, 'pages': {}}
+    with stub_providers():
+        client.post('/sharpener/login', data={'username': 'bench', 'password': 'bench'})
+
+        print(f"\n{'page':<26} {'encoding':<9} {'bytes':>8} {'saved':>7} {'cpu ms':>8} {'+cpu ms':>8} "
+              f"{'compress ms':>12}")
+        for label, path in PAGES:
+            body = client.get(path).data
+            page = results['pages'][label] = {}
+            for encoding in encodings:
+                size, applied, cpu, wall = measure(client, path, encoding, args.requests)
+                if encoding is None:
+                    # Savings are relative to the uncompressed response
+                    baseline_size, baseline_cpu = size, cpu
+                cost = compress_cost(middleware, body, applied) if applied else 0.0
+                page[encoding or 'identity'] = stats = {
+                    'bytes': size,
+                    'bytes_saved': baseline_size - size,
+                    'saved_pct': round((1 - size / baseline_size) * 100, 1) if baseline_size else 0.0,
+                    'cpu_ms_per_request': round(cpu, 3),
+                    'added_cpu_ms_per_request': round(cpu - baseline_cpu, 3),
+                    'compress_ms': round(cost, 3),
+                    'wall_ms_per_request': round(wall, 3),
+                }
+                print(f"{label:<26} {applied or 'identity':<9} {size:>8} {stats['saved_pct']:>6.1f}% "
+                      f"{cpu:>8.3f} {stats['added_cpu_ms_per_request']:>8.3f} {cost:>12.3f}")
+
+    if args.output:
+        save_results(args.output, results)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
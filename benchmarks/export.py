@@ -0,0 +1,102 @@
+"""
+Export memory benchmark: peak RSS of `flask export` over a large data set.
+
+Seeds --tickets tickets (with `flask seed`, feedback included), then runs each
+export in its own process, writing to /dev/null, and reads that process's
+peak resident set size from wait4(). An export that matches no rows gives the
+baseline (interpreter, app and drivers); the growth of each full export over
+that baseline must stay below --max-growth-mb, whatever the number of rows.
+
+Usage:
+    python -m benchmarks.export --tickets 1000000
+    python -m benchmarks.export --tickets 200000 --max-growth-mb 40 --output export.json
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import PROJECT_ROOT, configure_environment, reset_database, save_results
+
+EXPORTS = [
+    ('tickets csv', ['tickets', '--format', 'csv']),
+    ('tickets ndjson', ['tickets', '--format', 'ndjson']),
+    ('tickets csv gzip', ['tickets', '--format', 'csv', '--gzip']),
+    ('feedback ndjson', ['feedback', '--format', 'ndjson']),
+]
+
+
+def run_export(args):
+    """(peak RSS in MB, seconds) of one `flask export` process"""
+    command = [sys.executable, '-m', 'flask', 'export', *args, '--output', os.devnull]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = process.stderr.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.perf_counter() - started
+    if process.returncode != 0:
+        raise RuntimeError(f"flask export {' '.join(args)} failed:\n{stderr.decode(errors='replace')}")
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return peak, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=1000000, help='Tickets to seed')
+    parser.add_argument('--max-growth-mb', type=float, default=32,
+                        help='Allowed peak RSS above the empty export (default 32 MB)')
+    parser.add_argument('--database-url',
+                        help='Database to run against (default: TEST_DATABASE_URL or a scratch SQLite file)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    configure_environment(args.database_url)
+
+    from app import app
+    from models import db
+    from commands.seed import seed_command
+    with app.app_context():
+        reset_database(db)
+
+    print(f"Seeding {args.tickets} tickets ...")
+    result = app.test_cli_runner().invoke(seed_command, ['--tickets', str(args.tickets)])
+    if result.exit_code != 0:
+        print(result.output)
+        raise SystemExit(1)
+
+    baseline, _ = run_export(['tickets', '--until', '2000-01-01'])
+    print(f"\nEmpty export: {baseline:.1f} MB peak RSS\n")
+    print(f"{'export':<20} {'seconds':>8} {'rows/s':>9} {'peak MB':>8} {'growth MB':>10}")
+
+    exports = {}
+    failures = []
+    for label, export_args in EXPORTS:
+        peak, elapsed = run_export(export_args)
+        rows = args.tickets if export_args[0] == 'tickets' else None
+        growth = peak - baseline
+        exports[label] = {'seconds': round(elapsed, 2), 'peak_rss_mb': round(peak, 1),
+                          'growth_mb': round(growth, 1)}
+        rate = f"{rows / elapsed:>9.0f}" if rows else f"{'':>9}"
+        print(f"{label:<20} {elapsed:>8.1f} {rate} {peak:>8.1f} {growth:>10.1f}")
+        if growth > args.max_growth_mb:
+            failures.append(f"{label}: {growth:.1f} MB above the empty export")
+
+    if args.output:
+        save_results(args.output, {'tickets': args.tickets, 'baseline_rss_mb': round(baseline, 1),
+                                   'exports': exports})
+        print(f"\nResults written to {args.output}")
+
+    if failures:
+        print(f"\n❌ Peak RSS grew more than {args.max_growth_mb:g} MB:")
+        for line in failures:
+            print(f"   - {line}")
+        return 1
+    print(f"\n✅ Every export stayed within {args.max_growth_mb:g} MB of the empty export")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
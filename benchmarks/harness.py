@@ -0,0 +1,180 @@
+"""
+Shared setup for the benchmark scripts.
+
+Creates the app against a throwaway SQLite database with Stripe and GatewayAPI
+stubbed in-process, counts SQL statements per request and summarises
+latencies. Import this module before anything that imports `app`, since the
+app reads its configuration from the environment at import time.
+
+Set TEST_DATABASE_URL (e.g. postgresql://postgres@localhost:5433/skate_test)
+to run against that database instead; its tables are dropped and recreated
+at the start of each run.
+"""
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Where sharpener pages redirect without a session
+LOGIN_PATH = '/sharpener/login'
+
+
+def configure_environment(database_url=None, **overrides):
+    """Point the app at a scratch database and fake provider credentials"""
+    database_url = database_url or os.environ.get('TEST_DATABASE_URL')
+    if not database_url:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='skate-bench-'), 'bench.db')}"
+    defaults = {
+        'DATABASE_URL': database_url,
+        'STRIPE_SECRET_KEY': 'sk_test_benchmark',
+        'GATEWAYAPI_TOKEN': 'benchmark-token',
+        'MAIL_SERVER': '',
+        'LOG_LEVEL': 'WARNING',
+        'SHARPENING_PRICE_DKK': '80',
+        # Every simulated customer comes from 127.0.0.1
+        'RATE_LIMIT_IP': 'off',
+        'RATE_LIMIT_PHONE': 'off',
+        # In-process test client only
+        'METRICS_PUBLIC': 'true',
+    }
+    defaults.update(overrides)
+    for key, value in defaults.items():
+        os.environ[key] = value
+
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    os.chdir(PROJECT_ROOT)
+
+
+def reset_database(db):
+    """
+    Empty schema with one club (id 1) for a run (a scratch SQLite file is new
+    anyway; a server database is reused)
+    """
+    from models import Club
+    db.drop_all()
+    db.create_all()
+    db.session.add(Club(slug='default', name='Benchmark'))
+    db.session.commit()
+
+
+@contextmanager
+def stub_providers(latency_ms=0):
+    """
+    Replace Stripe and GatewayAPI network calls with in-process fakes.
+
+    latency_ms adds a fixed sleep to each fake call to mimic provider latency.
+    """
+    intents = {}
+
+    def delay():
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+
+    def create_intent(amount, metadata=None, **kwargs):
+        delay()
+        intent_id = f"pi_bench_{len(intents) + 1}"
+        intents[intent_id] = SimpleNamespace(
+            id=intent_id, client_secret=f"{intent_id}_secret", status='requires_action',
+            amount=amount, metadata=metadata or {}
+        )
+        return intents[intent_id]
+
+    def retrieve_intent(intent_id, **kwargs):
+        delay()
+        return intents[intent_id]
+
+    def post_sms(url, json=None, auth=None, timeout=None):
+        delay()
+        return SimpleNamespace(status_code=200, text='{"ids": [1]}')
+
+    with mock.patch('stripe.PaymentIntent.create', side_effect=create_intent), \
+            mock.patch('stripe.PaymentIntent.retrieve', side_effect=retrieve_intent), \
+            mock.patch('services.sms.requests.post', side_effect=post_sms):
+        yield intents
+
+
+class QueryCounter:
+    """Count SQL statements executed on any engine between reset() calls"""
+
+    def __init__(self):
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        self.count = 0
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+
+    def _after_execute(self, *args):
+        self.count += 1
+
+    def reset(self):
+        self.count = 0
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def is_error(response):
+    """4xx/5xx, or a redirect to the login page (the benchmark's session was lost)"""
+    status = getattr(response, 'status_code', None)
+    if status is None:
+        return False
+    return status >= 400 or (300 <= status < 400 and LOGIN_PATH in (response.location or ''))
+
+
+class Recorder:
+    """Collect latency, query counts and failed responses per endpoint label"""
+
+    def __init__(self, query_counter):
+        self.query_counter = query_counter
+        self.samples = {}
+
+    def call(self, label, fn, *args, **kwargs):
+        self.query_counter.reset()
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        sample = self.samples.setdefault(label, {'latency_ms': [], 'queries': [], 'errors': 0})
+        sample['latency_ms'].append(elapsed * 1000)
+        sample['queries'].append(self.query_counter.count)
+        sample['errors'] += is_error(result)
+        return result
+
+    def errors(self):
+        return sum(sample['errors'] for sample in self.samples.values())
+
+    def summary(self):
+        endpoints = {}
+        for label, sample in self.samples.items():
+            latencies = sample['latency_ms']
+            endpoints[label] = {
+                'requests': len(latencies),
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'queries_per_request': round(sum(sample['queries']) / len(sample['queries']), 2),
+                'max_queries': max(sample['queries']),
+                'errors': sample['errors'],
+            }
+        return endpoints
+
+
+def save_results(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,166 @@
+"""
+End-to-end throughput benchmark for the ticket lifecycle.
+
+Drives request_ticket -> pay -> Stripe webhook -> claim -> complete -> feedback
+through the Flask test client with Stripe and GatewayAPI stubbed, and reports
+requests per second, p50/p95/p99 latency and queries per request for each
+endpoint.
+
+Usage:
+    python -m benchmarks.lifecycle --iterations 500 --output bench.json
+    python -m benchmarks.lifecycle --baseline bench.json --max-regression 0.2
+
+With --baseline the run fails (exit status 1) if any endpoint's p95 latency
+grew by more than --max-regression, or it issues more queries per request
+than before (beyond a small tolerance for ticket-code retries).
+
+Ticket codes come from a space of a few thousand, so keep iterations well
+below that or request_ticket will spend its time retrying collisions.
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.harness import (
+    configure_environment, reset_database, stub_providers, QueryCounter, Recorder, save_results, load_results
+)
+
+# Ticket-code collisions add the odd extra query; don't call that a regression
+QUERY_TOLERANCE = 0.1
+
+
+def create_sharpener(db, Sharpener):
+    from werkzeug.security import generate_password_hash
+    sharpener = Sharpener(club_id=1, name='Bench', email='bench@example.com', phone='4512345678',
+                          username='bench', password_hash=generate_password_hash('bench'), is_admin=True)
+    db.session.add(sharpener)
+    db.session.commit()
+
+
+def run_lifecycle(client, app, recorder, db, Ticket, iteration):
+    """Take one ticket through every step of its lifecycle"""
+    form = {
+        'name': f'Customer {iteration}',
+        'phone': f'{20000000 + iteration}',
+        'brand': 'graf',
+        'color': 'white',
+        'size': '40',
+    }
+    recorder.call('customer.request_ticket', client.post, '/request_ticket', data=form)
+
+    with app.app_context():
+        ticket = Ticket.query.order_by(Ticket.id.desc()).first()
+        ticket_id, code = ticket.id, ticket.code
+
+    recorder.call('customer.payment_page', client.get, f'/pay/{code}')
+
+    with app.app_context():
+        payment_id = db.session.get(Ticket, ticket_id).payment_id
+
+    event = {
+        'id': f'evt_bench_{iteration}',
+        'object': 'event',
+        'type': 'payment_intent.succeeded',
+        'data': {'object': {'id': payment_id, 'object': 'payment_intent',
+                            'metadata': {'ticket_code': code}}},
+    }
+    recorder.call('customer.stripe_webhook', client.post, '/stripe/webhook', json=event)
+    recorder.call('sharpener.claim_ticket', client.get, f'/sharpener/claim/{ticket_id}')
+    recorder.call('sharpener.complete_ticket', client.get, f'/sharpener/complete/{ticket_id}')
+    recorder.call('customer.feedback', client.post, f'/feedback/{code}',
+                  data={'rating': str(iteration % 5 + 1), 'comment': 'Sharp!'})
+
+
+def compare(results, baseline, max_regression):
+    """Return a list of human-readable regressions against a baseline run"""
+    regressions = []
+    for endpoint, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(endpoint)
+        if not previous:
+            continue
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + max_regression):
+            regressions.append(f"{endpoint}: p95 {previous['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+        if current['queries_per_request'] > previous['queries_per_request'] + QUERY_TOLERANCE:
+            regressions.append(f"{endpoint}: queries/request {previous['queries_per_request']} "
+                               f"-> {current['queries_per_request']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200, help='Tickets to take through the lifecycle')
+    parser.add_argument('--warmup', type=int, default=10, help='Untimed iterations before measuring')
+    parser.add_argument('--stub-latency-ms', type=float, default=0, help='Simulated provider latency')
+    parser.add_argument('--database-url',
+                        help='Database to run against (default: TEST_DATABASE_URL or a scratch SQLite file)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare against a previous JSON result')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Allowed relative p95 increase before failing (default 0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    configure_environment(args.database_url)
+
+    from app import app
+    from models import db, Ticket, Sharpener
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        reset_database(db)
+        create_sharpener(db, Sharpener)
+
+    query_counter = QueryCounter()
+    client = app.test_client()
+
+    with stub_providers(args.stub_latency_ms):
+        client.post('/sharpener/login', data={'username': 'bench', 'password': 'bench'})
+
+        warmup = Recorder(query_counter)
+        for i in range(args.warmup):
+            run_lifecycle(client, app, warmup, db, Ticket, i)
+
+        recorder = Recorder(query_counter)
+        start = time.perf_counter()
+        for i in range(args.warmup, args.warmup + args.iterations):
+            run_lifecycle(client, app, recorder, db, Ticket, i)
+        elapsed = time.perf_counter() - start
+
+    endpoints = recorder.summary()
+    total_requests = sum(e['requests'] for e in endpoints.values())
+    results = {
+        'iterations': args.iterations,
+        'total_requests': total_requests,
+        'elapsed_seconds': round(elapsed, 3),
+        'requests_per_second': round(total_requests / elapsed, 1),
+        'errors': recorder.errors(),
+        'endpoints': endpoints,
+    }
+
+    print(f"\n{total_requests} requests in {elapsed:.2f}s ({results['requests_per_second']} req/s)\n")
+    print(f"{'endpoint':<28} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'errors':>7}")
+    for endpoint, stats in endpoints.items():
+        print(f"{endpoint:<28} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+              f"{stats['p99_ms']:>8.2f} {stats['queries_per_request']:>8} {stats['errors']:>7}")
+
+    if args.output:
+        save_results(args.output, results)
+        print(f"\nResults written to {args.output}")
+
+    # Timings of error pages and login redirects say nothing about the lifecycle
+    if recorder.errors():
+        print(f"\n❌ {recorder.errors()} requests failed or were sent to the login page")
+        return 1
+
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.max_regression)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   - {line}")
+            return 1
+        print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Multi-club benchmark: does one club get slower as more clubs share the database?
+
+For each club count (1 and 50 by default) the database is rebuilt with that
+many clubs, each with the same history (--tickets completed tickets) and the
+same live state (a queue of paid tickets, a few in progress, a page of unpaid
+ones). The first club's busiest pages are then timed through the test client
+and reported side by side, with the query plans of the club-scoped lists.
+
+With the club_id-leading indexes the per-club latency should stay flat; a
+query that ignores club_id shows up as a p50 that grows with the club count.
+
+Usage:
+    python -m benchmarks.tenancy --clubs 1,50 --tickets 2000
+    python -m benchmarks.tenancy --clubs 1,10,50 --output tenancy.json
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.harness import (
+    configure_environment, reset_database, stub_providers, QueryCounter, Recorder, save_results
+)
+
+QUEUED = 20
+IN_PROGRESS = 2
+UNPAID = 30
+
+
+def seed_club(db, Club, Ticket, Sharpener, number, history, now):
+    """Create club `number` (1 is the harness's club) with a sharpener and its tickets"""
+    from werkzeug.security import generate_password_hash
+    if number == 1:
+        club_id = 1
+    else:
+        club = Club(slug=f'club{number}', name=f'Club {number}')
+        db.session.add(club)
+        db.session.flush()
+        club_id = club.id
+    sharpener = Sharpener(club_id=club_id, name=f'Bench {number}', email=f'bench{number}@example.com',
+                          phone=f'45{10000000 + number}', username=f'bench{number}',
+                          password_hash=generate_password_hash('bench', method='pbkdf2:sha256:1000'),
+                          is_admin=True)
+    db.session.add(sharpener)
+    db.session.flush()
+
+    rows = []
+
+    def add(status, created_at, **values):
+        row = dict(
+            club_id=club_id, code=f'BN-{len(rows):05d}', customer_name=f'Customer {len(rows)}',
+            customer_phone=f'45{20000000 + len(rows)}', brand='graf', color='white', size=40, price=80,
+            status=status, payment_id=None, created_at=created_at, paid_at=None, started_at=None,
+            completed_at=None, sharpened_by_id=None, offer_misses=0
+        )
+        row.update(values)
+        rows.append(row)
+
+    # History: spread over the last season, oldest first
+    for i in range(history):
+        created_at = now - timedelta(days=180) + timedelta(minutes=i * 180 * 24 * 60 // max(history, 1))
+        add('completed', created_at, paid_at=created_at, started_at=created_at + timedelta(minutes=10),
+            completed_at=created_at + timedelta(minutes=15), sharpened_by_id=sharpener.id)
+    for i in range(QUEUED):
+        created_at = now - timedelta(minutes=QUEUED - i)
+        add('paid', created_at, paid_at=created_at, payment_id=f'pi_bench_{club_id}_{i}')
+    for i in range(IN_PROGRESS):
+        created_at = now - timedelta(minutes=30 + i)
+        add('in_progress', created_at, paid_at=created_at, started_at=now - timedelta(minutes=2),
+            sharpened_by_id=sharpener.id)
+    for i in range(UNPAID):
+        add('unpaid', now - timedelta(minutes=i))
+
+    db.session.execute(Ticket.__table__.insert(), rows)
+    db.session.commit()
+
+
+def query_plans(db, club_id):
+    """Plan of each club-scoped list query, one string per query"""
+    from sqlalchemy import text
+    from routes.sharpener import unpaid_tickets_query
+    from models import Ticket
+    queries = {
+        'unpaid list': unpaid_tickets_query(club_id).order_by(Ticket.created_at.desc(), Ticket.id.desc())
+                                                    .limit(25),
+        'ready queue': Ticket.query.filter_by(club_id=club_id, status='paid'),
+        'completed today': Ticket.query.filter(Ticket.club_id == club_id, Ticket.status == 'completed',
+                                               Ticket.completed_at >= datetime.utcnow().replace(hour=0)),
+    }
+    dialect = db.engine.dialect
+    explain = 'EXPLAIN QUERY PLAN ' if dialect.name == 'sqlite' else 'EXPLAIN '
+    plans = {}
+    for label, query in queries.items():
+        sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+        rows = db.session.execute(text(explain + sql)).all()
+        plans[label] = '; '.join(str(row[-1]) for row in rows)
+    return plans
+
+
+def run(app, club_count, history, requests, query_counter):
+    """Rebuild the database with club_count clubs and time the first club's pages"""
+    from sqlalchemy import text
+    from models import db, Club, Ticket, Sharpener
+    now = datetime.utcnow()
+    with app.app_context():
+        reset_database(db)
+        for number in range(1, club_count + 1):
+            seed_club(db, Club, Ticket, Sharpener, number, history, now)
+        if db.engine.dialect.name == 'postgresql':
+            # Planner statistics for the freshly inserted rows
+            db.session.execute(text('ANALYZE ticket'))
+            db.session.commit()
+        unpaid_code = Ticket.query.filter_by(club_id=1, status='unpaid').first().code
+        plans = query_plans(db, 1)
+
+    pages = [
+        ('customer.index', '/'),
+        ('customer.payment_page', f'/pay/{unpaid_code}'),
+        ('sharpener.dashboard', '/sharpener/'),
+        ('sharpener.unpaid_tickets', '/sharpener/unpaid'),
+    ]
+    client = app.test_client()
+    client.post('/sharpener/login', data={'username': 'bench1', 'password': 'bench'})
+    for _, path in pages:
+        client.get(path)
+
+    recorder = Recorder(query_counter)
+    for _ in range(requests):
+        for label, path in pages:
+            response = recorder.call(label, client.get, path)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} returned {response.status_code}")
+    return {'clubs': club_count, 'endpoints': recorder.summary(), 'query_plans': plans}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clubs', default='1,50', help='Club counts to compare, e.g. 1,10,50')
+    parser.add_argument('--tickets', type=int, default=2000, help='Completed tickets per club')
+    parser.add_argument('--requests', type=int, default=100, help='Timed requests per page')
+    parser.add_argument('--database-url',
+                        help='Database to run against (default: TEST_DATABASE_URL or a scratch SQLite file)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+    club_counts = [int(count) for count in args.clubs.split(',')]
+
+    # Manual dispatch: the dashboard would otherwise offer the seeded queue around
+    configure_environment(args.database_url, DISPATCH_MODE='manual')
+
+    from app import app
+    app.config['TESTING'] = True
+    query_counter = QueryCounter()
+
+    runs = []
+    with stub_providers():
+        for club_count in club_counts:
+            print(f"Seeding {club_count} clubs x {args.tickets + QUEUED + IN_PROGRESS + UNPAID} tickets ...")
+            runs.append(run(app, club_count, args.tickets, args.requests, query_counter))
+
+    first = runs[0]
+    print(f"\np50 / p95 ms of club 1's pages ({args.requests} requests each)\n")
+    headers = ''.join(f" {str(result['clubs']) + ' clubs':>18}" for result in runs)
+    print(f"{'endpoint':<28} {'queries':>8}{headers} {'p50 change':>11}")
+    for endpoint, stats in first['endpoints'].items():
+        cells = ''.join(f" {result['endpoints'][endpoint]['p50_ms']:>8.2f} / "
+                        f"{result['endpoints'][endpoint]['p95_ms']:>7.2f}" for result in runs)
+        change = runs[-1]['endpoints'][endpoint]['p50_ms'] / stats['p50_ms'] - 1 if stats['p50_ms'] else 0.0
+        print(f"{endpoint:<28} {stats['queries_per_request']:>8}{cells} {change:>+10.0%}")
+
+    print(f"\nQuery plans with {runs[-1]['clubs']} clubs:")
+    for label, plan in runs[-1]['query_plans'].items():
+        print(f"  {label}: {plan}")
+
+    if args.output:
+        save_results(args.output, {'tickets_per_club': args.tickets, 'runs': runs})
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,25 @@
+from .ratings import reconcile_ratings_command
+from .seed import seed_command
+from .expiry import expire_tickets_command
+from .payments import reconcile_payments_command
+from .assets import build_assets_command
+from .queue import rebuild_queue_stats_command
+from .capacity import simulate_capacity_command
+from .copy_database import copy_database_command
+from .clubs import clubs_command
+from .export import export_command
+from .backup import backup_database_command
+
+def register_commands(app):
+    """Register all CLI commands with the Flask app"""
+    app.cli.add_command(reconcile_ratings_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(expire_tickets_command)
+    app.cli.add_command(reconcile_payments_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(rebuild_queue_stats_command)
+    app.cli.add_command(simulate_capacity_command)
+    app.cli.add_command(copy_database_command)
+    app.cli.add_command(clubs_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(backup_database_command)
@@ -0,0 +1,21 @@
+"""
+Static asset build
+"""
+import os
+import click
+from utils.assets import build_assets, brotli, TAILWIND_CSS_URL, DIST_DIR
+
+
+@click.command('build-assets')
+@click.option('--tailwind-css', default=lambda: os.environ.get('TAILWIND_CSS') or TAILWIND_CSS_URL,
+              show_default='TAILWIND_CSS or the Tailwind 2.2.19 CDN build',
+              help='URL or path of the full Tailwind stylesheet to purge.')
+def build_assets_command(tailwind_css):
+    """Build fingerprinted, precompressed CSS and favicon into static/dist."""
+    click.echo(f"[Assets] Purging {tailwind_css}")
+    for name, filename, sizes in build_assets(tailwind_css):
+        variants = ', '.join(f"{encoding} {size / 1024:.1f} KB" for encoding, size in sizes.items())
+        click.echo(f"[Assets] {name} -> {filename} ({variants})")
+    if brotli is None:
+        click.echo("[Assets] Brotli not installed, only gzip variants were written")
+    click.echo(f"[Assets] Manifest written to {DIST_DIR / 'manifest.json'}")
@@ -0,0 +1,64 @@
+"""
+Online SQLite backups
+"""
+import logging
+import os
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from models import db
+from services.backup import BackupError, backup_database, sqlite_database_path
+
+logger = logging.getLogger(__name__)
+
+
+@click.command('backup-database')
+@click.option('--dir', 'directory', default=lambda: os.environ.get('BACKUP_DIR', ''),
+              show_default='BACKUP_DIR or instance/backups', help='Directory to write backups to.')
+@click.option('--keep', type=click.IntRange(0), default=lambda: int(os.environ.get('BACKUP_KEEP', '14')),
+              show_default='14 or BACKUP_KEEP', help='Backups to keep, newest first (0 keeps all).')
+@click.option('--gzip/--no-gzip', 'compress',
+              default=lambda: os.environ.get('BACKUP_GZIP', 'true').lower() == 'true',
+              show_default='BACKUP_GZIP, on if unset', help='Compress backups.')
+@click.option('--pages', type=int, default=256, show_default=True,
+              help='Pages copied per step in rollback-journal mode (-1: everything in one step).')
+@click.option('--pause', type=float, default=0.005, show_default=True,
+              help='Seconds to sleep between steps, letting writers in.')
+@click.option('--max-restarts', type=click.IntRange(0), default=10, show_default=True,
+              help='Restarts caused by concurrent writes before copying the rest in one step.')
+@click.option('--every', type=float, default=None,
+              help='Keep running, one backup every N seconds (for a sidecar process).')
+@with_appcontext
+def backup_database_command(directory, keep, compress, pages, pause, max_restarts, every):
+    """Back up the SQLite database with the online backup API, check it and rotate old backups."""
+    source = sqlite_database_path(db.engine.url)
+    if source is None:
+        raise click.ClickException('backup-database backs up SQLite databases; use pg_dump for PostgreSQL')
+    directory = directory or os.path.join(current_app.instance_path, 'backups')
+    if pages == 0 or pages < -1:
+        raise click.BadParameter('use a positive number of pages, or -1', param_hint='--pages')
+
+    while True:
+        started = time.monotonic()
+        try:
+            report = backup_database(source, directory, keep=keep, compress=compress, pages=pages,
+                                     pause=pause, max_restarts=max_restarts)
+        except BackupError as e:
+            if every is None:
+                raise click.ClickException(str(e))
+            logger.error("Database backup failed: %s", e)
+            click.echo(f"[Backup] Failed: {e}", err=True)
+        else:
+            click.echo(
+                f"[Backup] {report.path}: {report.size / 1024 / 1024:.1f} MB, {report.pages} pages "
+                f"({report.journal_mode} journal) in "
+                f"{report.steps} steps, {report.duration:.2f}s, lock wait {report.lock_wait * 1000:.0f} ms, "
+                f"longest step {report.longest_step * 1000:.1f} ms"
+                + (f", {report.restarts} restart(s)" if report.restarts else "")
+                + (" (finished in one step)" if report.single_step and report.journal_mode != 'wal' else "")
+                + (f", deleted {len(report.deleted)} old backup(s)" if report.deleted else "")
+            )
+        if every is None:
+            return
+        time.sleep(max(every - (time.monotonic() - started), 0))
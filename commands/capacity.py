@@ -0,0 +1,87 @@
+"""
+Season staffing simulation
+"""
+import time
+import click
+from flask.cli import with_appcontext
+from models import Club
+from services.capacity import CapacityError, WEEKDAYS, fit_history, plan_capacity, np
+
+
+def _staffing_levels(value):
+    """'2-6' or '2,3,5' -> [2, 3, 4, 5, 6] / [2, 3, 5]"""
+    levels = set()
+    for part in value.split(','):
+        low, _, high = part.strip().partition('-')
+        try:
+            low = int(low)
+            high = int(high) if high else low
+        except ValueError:
+            raise click.BadParameter(f"expected numbers like 2-6 or 2,3,5, got {value!r}")
+        if low < 1 or high < low:
+            raise click.BadParameter(f"invalid range {part.strip()!r}")
+        levels.update(range(low, high + 1))
+    return sorted(levels)
+
+
+@click.command('simulate-capacity')
+@click.option('--sharpeners', 'staffing', default='1-6', show_default=True,
+              callback=lambda ctx, param, value: _staffing_levels(value),
+              help='Staffing levels to simulate, e.g. 2-6 or 2,4,6.')
+@click.option('--days', type=click.IntRange(1, 366), default=182, show_default=True,
+              help='Season length in days (October through March by default).')
+@click.option('--runs', type=click.IntRange(1, 1000), default=10, show_default=True,
+              help='Simulated seasons per staffing level.')
+@click.option('--demand', type=click.FloatRange(0, min_open=True), default=1.0, show_default=True,
+              help='Scale the fitted arrival rates, e.g. 1.2 for 20% more customers.')
+@click.option('--since', type=click.DateTime(), default=None, help='Fit only tickets paid on or after this date.')
+@click.option('--until', type=click.DateTime(), default=None, help='Fit only tickets paid before this date.')
+@click.option('--club', 'club_slug', default=None, help='Fit only this club\'s tickets (slug).')
+@click.option('--empirical', is_flag=True,
+              help='Resample observed sharpening times instead of the fitted lognormal.')
+@click.option('--target-minutes', type=float, default=30, show_default=True,
+              help='Report the share of tickets waiting longer than this.')
+@click.option('--seed', 'random_seed', default=42, show_default=True, help='Random seed.')
+@with_appcontext
+def simulate_capacity_command(staffing, days, runs, demand, since, until, club_slug, empirical, target_minutes,
+                              random_seed):
+    """Fit arrivals and sharpening times from history and simulate a season per staffing level."""
+    if np is None:
+        raise click.ClickException('simulate-capacity needs NumPy (pip install numpy)')
+    club_id = None
+    if club_slug is not None:
+        club = Club.query.filter_by(slug=club_slug).first()
+        if club is None:
+            raise click.ClickException(f"No club {club_slug!r}")
+        club_id = club.id
+
+    started = time.perf_counter()
+    try:
+        fit = fit_history(since, until, club_id)
+    except CapacityError as e:
+        raise click.ClickException(str(e))
+    weekday, hour, busiest = fit.busiest_hour
+    service = fit.service_seconds / 60
+    click.echo(f"[Capacity] History {fit.first:%Y-%m-%d} to {fit.last:%Y-%m-%d}, "
+               f"fitted in {time.perf_counter() - started:.1f}s")
+    click.echo(f"[Capacity] Arrivals: {fit.tickets_per_day:.1f} tickets per open day, busiest "
+               f"{WEEKDAYS[weekday]} {hour:02d}:00 UTC with {busiest:.1f} per hour")
+    click.echo(f"[Capacity] Sharpening time: mean {service.mean():.1f} min, p90 {np.percentile(service, 90):.1f} min "
+               f"({service.size} completed tickets, {'resampled' if empirical else 'lognormal fit'})")
+    observed = fit.observed_waits / 60
+    click.echo(f"[Capacity] Observed wait: p50 {np.percentile(observed, 50):.0f} min, "
+               f"p90 {np.percentile(observed, 90):.0f} min")
+
+    started = time.perf_counter()
+    report = plan_capacity(fit, staffing, days=days, runs=runs, seed=random_seed, demand=demand,
+                           empirical=empirical, target_minutes=target_minutes)
+    elapsed = time.perf_counter() - started
+
+    click.echo(f"\n{'sharpeners':>10} {'tickets':>8} {'p50 wait':>9} {'p90 wait':>9} {'p95 wait':>9} "
+               f"{'p99 wait':>9} {f'>{target_minutes:g} min':>9} {'utilisation':>12}")
+    for row in report:
+        click.echo(f"{row['sharpeners']:>10} {row['tickets_per_season']:>8.0f} {row['wait_p50']:>7.1f} m "
+                   f"{row['wait_p90']:>7.1f} m {row['wait_p95']:>7.1f} m {row['wait_p99']:>7.1f} m "
+                   f"{row['over_target']:>8.1%} {row['utilisation']:>11.1%}")
+    click.echo(f"\n[Capacity] {len(staffing)} staffing levels x {runs} seasons of {days} days "
+               f"in {elapsed:.1f}s ({elapsed / (len(staffing) * runs):.2f}s per season)")
@@ -0,0 +1,69 @@
+"""
+Clubs sharing the deployment
+"""
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from models import db, Club, Sharpener, Ticket
+from services.clubs import club_url, clear_club_cache, ClubContext
+
+
+@click.group('clubs')
+def clubs_command():
+    """List, add and change the clubs sharing this deployment."""
+
+
+@clubs_command.command('list')
+@with_appcontext
+def list_clubs_command():
+    """Show every club with its URL, price and size."""
+    sharpeners = dict(db.session.query(Sharpener.club_id, func.count(Sharpener.id)).group_by(Sharpener.club_id))
+    tickets = dict(db.session.query(Ticket.club_id, func.count(Ticket.id)).group_by(Ticket.club_id))
+    for club in Club.query.order_by(Club.id):
+        context = ClubContext(club)
+        click.echo(f"[Clubs] {club.slug}: {club.name}, {club_url(context)}, {context.price} DKK, "
+                   f"{sharpeners.get(club.id, 0)} sharpeners, {tickets.get(club.id, 0)} tickets")
+
+
+@clubs_command.command('add')
+@click.argument('slug')
+@click.option('--name', required=True, help='Name shown to sharpeners.')
+@click.option('--hostname', default=None, help='Serve the club on this host (default: /c/<slug>/).')
+@click.option('--price', type=click.IntRange(0), default=None,
+              help='Sharpening price in DKK (default: SHARPENING_PRICE_DKK).')
+@with_appcontext
+def add_club_command(slug, name, hostname, price):
+    """Add a club; invite its first sharpener at <club URL>/admin/invite_sharpener."""
+    if Club.query.filter_by(slug=slug).first():
+        raise click.ClickException(f"Club {slug!r} already exists")
+    club = Club(slug=slug, name=name, hostname=hostname.lower() if hostname else None, price=price)
+    db.session.add(club)
+    db.session.commit()
+    clear_club_cache()
+    click.echo(f"[Clubs] Added {slug} at {club_url(ClubContext(club))}")
+
+
+@clubs_command.command('update')
+@click.argument('slug')
+@click.option('--name', default=None, help='New name.')
+@click.option('--hostname', default=None, help="New host, or '' to serve the club under /c/<slug>/.")
+@click.option('--price', default=None, help="New price in DKK, or '' for SHARPENING_PRICE_DKK.")
+@with_appcontext
+def update_club_command(slug, name, hostname, price):
+    """Change a club's name, host or price (other workers pick it up within CLUB_CACHE_TTL)."""
+    club = Club.query.filter_by(slug=slug).first()
+    if club is None:
+        raise click.ClickException(f"No club {slug!r}")
+    if name is not None:
+        club.name = name
+    if hostname is not None:
+        club.hostname = hostname.lower() or None
+    if price is not None:
+        try:
+            club.price = int(price) if price else None
+        except ValueError:
+            raise click.BadParameter(f"expected a whole number of DKK, got {price!r}", param_hint='--price')
+    db.session.commit()
+    clear_club_cache()
+    context = ClubContext(club)
+    click.echo(f"[Clubs] {slug}: {club.name}, {club_url(context)}, {context.price} DKK")
@@ -0,0 +1,61 @@
+"""
+Copy all data from another database (typically the SQLite file) into the
+configured DATABASE_URL, e.g. when moving a rink to PostgreSQL:
+
+    DATABASE_URL=postgresql://... flask db upgrade
+    DATABASE_URL=postgresql://... flask copy-database --source sqlite:///instance/skate_tickets.db
+
+Both databases must be at the same migration (run `flask db upgrade` against
+the source too). Tables are copied parent first; rows are streamed from the
+source and inserted with executemany, one transaction per batch, so memory
+stays flat however large the ticket history is.
+"""
+import time
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import create_engine, func, select
+from models import db, Club, QueueStats
+from utils.database import database_uri, reset_sequences
+
+# The club `flask db upgrade` creates (migration c6e1b8f4a2d9)
+SEEDED_CLUB_ID = 1
+
+
+@click.command('copy-database')
+@click.option('--source', required=True, help='SQLAlchemy URL of the database to copy from.')
+@click.option('--batch-size', type=click.IntRange(1, 100000), default=5000, show_default=True,
+              help='Rows per read and per transaction.')
+@with_appcontext
+def copy_database_command(source, batch_size):
+    """Copy every table from --source into the configured database."""
+    tables = db.metadata.sorted_tables
+    # The migrations insert the first club and its queue statistics row; the source's replace them
+    db.session.execute(QueueStats.__table__.delete())
+    not_empty = [table.name for table in tables
+                 if db.session.execute(select(func.count()).select_from(table)).scalar()]
+    if not_empty == ['club']:
+        # Nothing refers to it yet
+        db.session.execute(Club.__table__.delete().where(Club.id == SEEDED_CLUB_ID, Club.slug == 'default'))
+        not_empty = [] if not db.session.execute(select(func.count()).select_from(Club)).scalar() else not_empty
+    if not_empty:
+        db.session.rollback()
+        raise click.ClickException(f"Target tables are not empty: {', '.join(not_empty)}")
+
+    started = time.perf_counter()
+    source_engine = create_engine(database_uri(source))
+    try:
+        with source_engine.connect() as connection:
+            for table in tables:
+                copied = 0
+                rows = connection.execution_options(yield_per=batch_size).execute(select(table))
+                for batch in rows.partitions():
+                    db.session.execute(table.insert(), [row._asdict() for row in batch])
+                    db.session.commit()
+                    copied += len(batch)
+                click.echo(f"[Copy] {table.name}: {copied} rows")
+    finally:
+        source_engine.dispose()
+
+    reset_sequences(db.session, tables)
+    db.session.commit()
+    click.echo(f"[Copy] Done in {time.perf_counter() - started:.1f}s")
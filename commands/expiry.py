@@ -0,0 +1,87 @@
+"""
+Expiry of stale unpaid tickets
+"""
+import os
+import time
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from models import db, Ticket
+from services.expiry import run_expiry
+from services.payment import stripe_configured
+from services.reconciliation import reconcile_payments
+from commands.payments import echo_reconciliation
+
+
+def _optional_number(value):
+    return float(value) if value not in (None, '') else None
+
+
+@click.command('expire-tickets')
+@click.option('--ttl-hours', type=float, default=lambda: float(os.environ.get('UNPAID_TICKET_TTL_HOURS', '48')),
+              show_default='48 or UNPAID_TICKET_TTL_HOURS', help='Expire tickets unpaid for longer than this.')
+@click.option('--reminder-hours', type=float, default=lambda: _optional_number(os.environ.get('UNPAID_REMINDER_HOURS')),
+              show_default='UNPAID_REMINDER_HOURS, off if unset',
+              help='Send a payment reminder SMS to tickets unpaid for longer than this.')
+@click.option('--release-codes-after-days', type=float,
+              default=lambda: float(os.environ.get('EXPIRED_CODE_RELEASE_DAYS', '30')),
+              show_default='30 or EXPIRED_CODE_RELEASE_DAYS',
+              help='Free the ticket codes of tickets expired this long ago (0 disables).')
+@click.option('--batch-size', type=click.IntRange(1, 1000), default=100, show_default=True,
+              help='Tickets per transaction.')
+@click.option('--max-seconds', type=float, default=30, show_default=True,
+              help='Time budget per run; leftovers are handled by the next run.')
+@click.option('--pause', type=float, default=0.05, show_default=True, help='Seconds to sleep between batches.')
+@click.option('--cancel-concurrency', type=click.IntRange(1, 16), default=4, show_default=True,
+              help='Parallel PaymentIntent cancellations.')
+@click.option('--language', type=click.Choice(['da', 'en']), default='da', show_default=True,
+              help='Language of the reminder SMS.')
+@click.option('--every', type=float, default=None,
+              help='Keep running, starting a new pass every N seconds (for a sidecar process).')
+@click.option('--reconcile/--no-reconcile', default=True, show_default=True,
+              help='Apply payments with missed webhooks (flask reconcile-payments) before expiring.')
+@click.option('--dry-run', is_flag=True, help='Only report how many tickets are due.')
+@with_appcontext
+def expire_tickets_command(ttl_hours, reminder_hours, release_codes_after_days, batch_size, max_seconds,
+                           pause, cancel_concurrency, language, every, reconcile, dry_run):
+    """Remind and expire stale unpaid tickets and cancel their PaymentIntents."""
+    if dry_run:
+        now = datetime.utcnow()
+        due = Ticket.query.filter(Ticket.status == 'unpaid',
+                                  Ticket.created_at < now - timedelta(hours=ttl_hours)).count()
+        click.echo(f"[Expiry] {due} unpaid ticket(s) older than {ttl_hours:g}h would be expired (dry run)")
+        if reminder_hours is not None and reminder_hours < ttl_hours:
+            remind = Ticket.query.filter(Ticket.status == 'unpaid',
+                                         Ticket.created_at < now - timedelta(hours=reminder_hours),
+                                         Ticket.created_at >= now - timedelta(hours=ttl_hours),
+                                         Ticket.reminder_sent_at.is_(None)).count()
+            click.echo(f"[Expiry] {remind} ticket(s) would get a payment reminder (dry run)")
+        return
+
+    while True:
+        started = time.monotonic()
+        if reconcile and stripe_configured():
+            # A ticket whose webhook was lost must not be expired as unpaid
+            echo_reconciliation(reconcile_payments(lookback_hours=ttl_hours + 24))
+        report = run_expiry(
+            ttl_hours=ttl_hours,
+            reminder_hours=reminder_hours,
+            release_codes_after_days=release_codes_after_days or None,
+            batch_size=batch_size,
+            max_seconds=max_seconds,
+            pause=pause,
+            cancel_concurrency=cancel_concurrency,
+            language=language,
+        )
+        click.echo(
+            f"[Expiry] Reminded {report.reminded}, expired {report.expired}, "
+            f"cancelled {report.intents_cancelled} payment intent(s) "
+            f"({report.intents_not_cancelled} not cancellable), released {report.codes_released} code(s)"
+            + (" - time budget used up, continuing next run" if report.out_of_time else "")
+        )
+        if every is None:
+            return
+
+        # Don't keep a connection (or SQLite read snapshot) open while idle
+        db.session.remove()
+        time.sleep(max(every - (time.monotonic() - started), 0))
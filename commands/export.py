@@ -0,0 +1,50 @@
+"""
+Ticket and feedback exports
+"""
+import sys
+import time
+import click
+from flask.cli import with_appcontext
+from models import Club
+from services.export import EXPORT_FORMATS, EXPORT_KINDS, TICKET_STATUSES, ExportError, export_chunks
+
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(EXPORT_KINDS))
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), default='csv', show_default=True)
+@click.option('--club', 'club_slug', default=None, help='Only this club (slug); all clubs by default.')
+@click.option('--since', type=click.DateTime(), default=None, help='Created on or after this date.')
+@click.option('--until', type=click.DateTime(), default=None, help='Created before this date.')
+@click.option('--status', 'statuses', multiple=True, type=click.Choice(TICKET_STATUSES),
+              help='Only tickets with this status (repeatable).')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='Write to this file instead of standard output.')
+@with_appcontext
+def export_command(kind, fmt, club_slug, since, until, statuses, compress, output):
+    """Stream tickets or feedback as CSV or NDJSON, in constant memory."""
+    club_id = None
+    if club_slug is not None:
+        club = Club.query.filter_by(slug=club_slug).first()
+        if club is None:
+            raise click.ClickException(f"No club {club_slug!r}")
+        club_id = club.id
+    try:
+        chunks = export_chunks(kind, fmt, club_id, since, until, statuses, gzip=compress)
+    except ExportError as e:
+        raise click.ClickException(str(e))
+
+    started = time.perf_counter()
+    written = 0
+    stream = open(output, 'wb') if output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            stream.write(chunk)
+            written += len(chunk)
+    finally:
+        if output:
+            stream.close()
+        else:
+            stream.flush()
+    click.echo(f"[Export] {kind} ({fmt}{', gzip' if compress else ''}): {written} bytes "
+               f"in {time.perf_counter() - started:.1f}s", err=True)
@@ -0,0 +1,45 @@
+"""
+Stripe payment reconciliation command
+"""
+import time
+import click
+from flask.cli import with_appcontext
+from models import db
+from services.payment import stripe_configured
+from services.reconciliation import reconcile_payments
+
+
+def echo_reconciliation(report, dry_run=False):
+    """Print a one-line summary of a ReconciliationReport"""
+    action = 'would mark' if dry_run else 'marked'
+    line = (f"[Reconcile] {report.intents} payment intent(s) in {report.pages} page(s), "
+            f"{action} {len(report.tickets_paid)} ticket(s) paid")
+    if report.tickets_paid:
+        line += f": {', '.join(report.tickets_paid)}"
+    if not report.complete:
+        line += " - page limit reached, checkpoint not advanced"
+    click.echo(line)
+
+
+@click.command('reconcile-payments')
+@click.option('--lookback-hours', type=float, default=72, show_default=True,
+              help='Never look at payment intents older than this.')
+@click.option('--max-pages', type=click.IntRange(1, 1000), default=50, show_default=True,
+              help='List calls (of up to 100 intents) per run.')
+@click.option('--every', type=float, default=None, help='Keep running, one pass every N seconds.')
+@click.option('--dry-run', is_flag=True, help='Report missed payments without changing anything.')
+@with_appcontext
+def reconcile_payments_command(lookback_hours, max_pages, every, dry_run):
+    """Apply payments whose Stripe webhook was missed."""
+    if not stripe_configured():
+        click.echo("[Reconcile] Stripe is not configured (simulation mode), nothing to do")
+        return
+
+    while True:
+        started = time.monotonic()
+        report = reconcile_payments(lookback_hours=lookback_hours, max_pages=max_pages, dry_run=dry_run)
+        echo_reconciliation(report, dry_run)
+        if every is None:
+            return
+        db.session.remove()
+        time.sleep(max(every - (time.monotonic() - started), 0))
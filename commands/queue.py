@@ -0,0 +1,19 @@
+"""
+Queue estimate maintenance
+"""
+import click
+from flask.cli import with_appcontext
+from models import Club
+from services.queue import rebuild_queue_stats
+
+
+@click.command('rebuild-queue-stats')
+@click.option('--samples', type=click.IntRange(1, 1000), default=50, show_default=True,
+              help='Recent completed tickets to average the sharpening time over.')
+@with_appcontext
+def rebuild_queue_stats_command(samples):
+    """Renumber each club's paid queue and recompute its average sharpening time."""
+    for club in Club.query.order_by(Club.id).all():
+        waiting, averaged = rebuild_queue_stats(club.id, samples)
+        click.echo(f"[Queue] {club.slug}: {waiting} tickets waiting, renumbered; "
+                   f"average sharpening time from {averaged} completed tickets")
@@ -0,0 +1,68 @@
+"""
+Rating aggregate maintenance commands
+"""
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from models import db, Ticket, Sharpener, Feedback
+
+AGGREGATE_COLUMNS = ['rating_sum', 'rating_count'] + [f'rating_{stars}_count' for stars in range(1, 6)]
+
+
+def compute_rating_aggregates():
+    """
+    Recompute rating aggregates for all sharpeners from the feedback table.
+
+    Returns:
+        dict: sharpener_id -> {column_name: value} for every aggregate column
+    """
+    rows = db.session.query(
+        Ticket.sharpened_by_id, Feedback.rating, func.count(Feedback.id)
+    ).join(Ticket, Feedback.ticket_id == Ticket.id).filter(
+        Ticket.sharpened_by_id.isnot(None)
+    ).group_by(Ticket.sharpened_by_id, Feedback.rating).all()
+
+    aggregates = {}
+    for sharpener_id, rating, count in rows:
+        totals = aggregates.setdefault(sharpener_id, dict.fromkeys(AGGREGATE_COLUMNS, 0))
+        totals['rating_sum'] += rating * count
+        totals['rating_count'] += count
+        if 1 <= rating <= 5:
+            totals[f'rating_{rating}_count'] += count
+    return aggregates
+
+
+@click.command('reconcile-ratings')
+@click.option('--dry-run', is_flag=True, help='Report drift without fixing it.')
+@with_appcontext
+def reconcile_ratings_command(dry_run):
+    """Recompute sharpener rating aggregates and report any drift."""
+    aggregates = compute_rating_aggregates()
+    drifted = 0
+
+    for sharpener in Sharpener.query.order_by(Sharpener.id).all():
+        expected = aggregates.get(sharpener.id, dict.fromkeys(AGGREGATE_COLUMNS, 0))
+        drift = {
+            column: (getattr(sharpener, column) or 0, value)
+            for column, value in expected.items()
+            if (getattr(sharpener, column) or 0) != value
+        }
+        if not drift:
+            continue
+
+        drifted += 1
+        details = ', '.join(f'{column}: {stored} -> {value}' for column, (stored, value) in drift.items())
+        click.echo(f"[Ratings] Drift for sharpener {sharpener.id} ({sharpener.name}): {details}")
+        if not dry_run:
+            for column, value in expected.items():
+                setattr(sharpener, column, value)
+
+    if drifted and not dry_run:
+        db.session.commit()
+
+    if not drifted:
+        click.echo("[Ratings] All rating aggregates are consistent")
+    elif dry_run:
+        click.echo(f"[Ratings] {drifted} sharpener(s) have drifted (dry run, nothing changed)")
+    else:
+        click.echo(f"[Ratings] Fixed rating aggregates for {drifted} sharpener(s)")
@@ -0,0 +1,320 @@
+"""
+Synthetic dataset generator for scale-testing.
+
+`flask seed` bulk-inserts sharpeners, invitations, tickets and feedback with
+realistic status mixes and timestamps spread over several skating seasons,
+spread round-robin over --clubs clubs (created as club1, club2, ... if the
+database has fewer).
+
+Rows are generated with a seeded random.Random, so the same arguments (and
+--as-of reference time) always produce the same data, and written in batches
+with executemany - Core inserts for the small tables and plain DBAPI
+executemany for tickets and feedback, where per-row parameter processing
+would dominate the run time.
+"""
+import bisect
+import random
+import time
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from werkzeug.security import generate_password_hash
+from models import db, Club, Ticket, Sharpener, Feedback, Invitation
+from commands.ratings import compute_rating_aggregates
+from services.queue import rebuild_queue_stats
+from utils.database import reset_sequences
+
+BRANDS = ['jackson', 'edea', 'risport', 'riedell', 'graf', 'other']
+BRAND_WEIGHTS = [30, 25, 15, 15, 10, 5]
+COLORS = ['white', 'black', 'other']
+COLOR_WEIGHTS = [55, 40, 5]
+FIRST_NAMES = ['Emma', 'Ida', 'Clara', 'Freja', 'Alma', 'Ella', 'Sofia', 'Karla', 'Anna', 'Laura',
+               'William', 'Noah', 'Oscar', 'Lucas', 'Carl', 'Victor', 'Malthe', 'Emil', 'Alfred', 'Aksel']
+LAST_NAMES = ['Nielsen', 'Jensen', 'Hansen', 'Pedersen', 'Andersen', 'Christensen', 'Larsen',
+              'Sørensen', 'Rasmussen', 'Jørgensen', 'Petersen', 'Madsen', 'Kristensen', 'Olsen']
+
+# Relative arrival intensity by hour of day (rink opening hours)
+HOURLY_WEIGHTS = [0] * 7 + [1, 3, 4, 4, 3, 3, 3, 4, 6, 9, 10, 8, 5, 2, 0, 0, 0]
+# Weekends are roughly twice as busy as weekdays
+WEEKDAY_WEIGHTS = [1, 1, 1, 1, 1.2, 2, 2]
+
+# Feedback star distribution (1..5)
+RATING_WEIGHTS = [2, 3, 10, 30, 55]
+
+TICKET_COLUMNS = ['id', 'code', 'customer_name', 'customer_phone', 'brand', 'color', 'size', 'price',
+                  'status', 'payment_id', 'created_at', 'paid_at', 'started_at', 'completed_at',
+                  'cancelled_at', 'sharpened_by_id', 'cancelled_by_id', 'club_id']
+FEEDBACK_COLUMNS = ['id', 'ticket_id', 'rating', 'comment', 'created_at']
+
+
+class WeightedChoice:
+    """Faster rng.choices(values, weights)[0] for hot loops"""
+
+    def __init__(self, values, weights):
+        self.values = values
+        self.cumulative = []
+        total = 0
+        for weight in weights:
+            total += weight
+            self.cumulative.append(total)
+        self.total = total
+
+    def pick(self, rng):
+        return self.values[bisect.bisect(self.cumulative, rng.random() * self.total)]
+
+
+BRAND_CHOICE = WeightedChoice(BRANDS, BRAND_WEIGHTS)
+COLOR_CHOICE = WeightedChoice(COLORS, COLOR_WEIGHTS)
+RATING_CHOICE = WeightedChoice([1, 2, 3, 4, 5], RATING_WEIGHTS)
+
+
+def season_days(seasons, now):
+    """Skating-season days (October through March) for the last `seasons` seasons"""
+    days = []
+    last_season_start = now.year if now.month >= 10 else now.year - 1
+    for start_year in range(last_season_start - seasons + 1, last_season_start + 1):
+        day = datetime(start_year, 10, 1)
+        end = min(datetime(start_year + 1, 4, 1), now)
+        while day < end:
+            days.append(day)
+            day += timedelta(days=1)
+    return days
+
+
+def sample_arrivals(rng, days, count, batch_size, now):
+    """
+    Yield batches of realistic ticket creation timestamps in chronological order.
+
+    Days are drawn up front (as small ints) and sorted, so ticket ids increase
+    with created_at just like in a real database. Times later today than `now`
+    are pulled back into the last few hours, which leaves a live queue of
+    paid and in-progress tickets at the end of the data set.
+    """
+    day_weights = [WEEKDAY_WEIGHTS[day.weekday()] for day in days]
+    hours = [hour for hour, weight in enumerate(HOURLY_WEIGHTS) if weight]
+    hour_weights = [HOURLY_WEIGHTS[hour] for hour in hours]
+
+    day_indexes = sorted(rng.choices(range(len(days)), weights=day_weights, k=count))
+    for start in range(0, count, batch_size):
+        batch = day_indexes[start:start + batch_size]
+        picked_hours = rng.choices(hours, weights=hour_weights, k=len(batch))
+        arrivals = []
+        for index, hour in zip(batch, picked_hours):
+            created_at = days[index] + timedelta(hours=hour, seconds=rng.randrange(3600))
+            if created_at > now:
+                created_at = now - timedelta(minutes=rng.uniform(0, 180))
+            arrivals.append(created_at)
+        yield sorted(arrivals)
+
+
+def generate_ticket(rng, ticket_id, club_id, created_at, sharpener_ids, price, now, fmt):
+    """
+    Build one ticket row (in TICKET_COLUMNS order) with its lifecycle timestamps.
+
+    Returns the row and its completed_at (None unless the ticket is completed).
+    Timestamps are passed through `fmt` so they can be pre-rendered for the driver.
+    """
+    # Seeded codes use their own S-prefixed space so they never collide with live LL-NNN codes
+    code = f"S{ticket_id:07d}"
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    phone = f"45{rng.randrange(20000000, 99999999)}"
+    brand = BRAND_CHOICE.pick(rng)
+    color = COLOR_CHOICE.pick(rng)
+    size = rng.randrange(185, 315, 5) if brand == 'edea' else rng.randrange(24, 47)
+    row = [ticket_id, code, name, phone, brand, color, size, price,
+           'unpaid', None, fmt(created_at), None, None, None, None, None, None, club_id]
+
+    # Payment: ~10% are abandoned, the rest pay within a few minutes
+    if rng.random() < 0.10:
+        cancelled_at = created_at + timedelta(days=rng.uniform(1, 14))
+        if rng.random() < 0.3 and cancelled_at <= now:
+            row[8] = 'cancelled'
+            row[14] = fmt(cancelled_at)
+            row[16] = rng.choice(sharpener_ids)
+        return row, None
+
+    paid_at = created_at + timedelta(minutes=rng.lognormvariate(1.0, 0.8))
+    row[8] = 'paid'
+    row[9] = f"pi_seed_{ticket_id}" if price else None
+    row[11] = fmt(paid_at)
+
+    # Queue wait, then service time
+    started_at = paid_at + timedelta(minutes=rng.expovariate(1 / 20))
+    if started_at > now:
+        return row, None
+    completed_at = started_at + timedelta(minutes=max(1.5, rng.gauss(4, 1.2)))
+
+    row[8] = 'in_progress'
+    row[12] = fmt(started_at)
+    row[15] = rng.choice(sharpener_ids)
+    if completed_at > now:
+        return row, None
+
+    row[8] = 'completed'
+    row[13] = fmt(completed_at)
+    return row, completed_at
+
+
+def seed_clubs(count):
+    """Ids of the first `count` clubs, creating the missing ones"""
+    club_ids = [club_id for (club_id,) in db.session.query(Club.id).order_by(Club.id).limit(count)]
+    number = len(club_ids)
+    while len(club_ids) < count:
+        number += 1
+        if Club.query.filter_by(slug=f"club{number}").first():
+            continue
+        club = Club(slug=f"club{number}", name=f"Club {number}")
+        db.session.add(club)
+        db.session.flush()
+        club_ids.append(club.id)
+    db.session.commit()
+    return club_ids
+
+
+def insert_batches(table, rows, batch_size):
+    """Insert rows with Core executemany, committing between batches"""
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(table.insert(), rows[start:start + batch_size])
+        db.session.commit()
+
+
+def driver_insert(table_name, columns, rows):
+    """Plain DBAPI executemany of positional rows, skipping Core parameter processing"""
+    placeholder = '?' if db.engine.dialect.paramstyle == 'qmark' else '%s'
+    sql = (f"INSERT INTO {table_name} ({', '.join(columns)}) "
+           f"VALUES ({', '.join([placeholder] * len(columns))})")
+    db.session.connection().exec_driver_sql(sql, rows)
+
+
+def datetime_formatter():
+    """
+    Return the function used to render datetimes for driver_insert.
+
+    SQLite has no datetime type; SQLAlchemy stores 'YYYY-MM-DD HH:MM:SS.ffffff'
+    strings, so render exactly that. Other drivers take datetime objects.
+    """
+    if db.engine.dialect.name == 'sqlite':
+        return lambda value: value.isoformat(' ', 'microseconds')
+    return lambda value: value
+
+
+@click.command('seed')
+@click.option('--tickets', default=10000, show_default=True, help='Number of tickets to create.')
+@click.option('--sharpeners', default=12, show_default=True, help='Number of sharpener accounts.')
+@click.option('--clubs', type=click.IntRange(1), default=1, show_default=True,
+              help='Clubs to spread sharpeners, invitations and tickets over.')
+@click.option('--invitations', default=20, show_default=True, help='Number of invitations.')
+@click.option('--seasons', default=5, show_default=True, help='Seasons of history to spread tickets over.')
+@click.option('--feedback-ratio', default=0.25, show_default=True, help='Share of completed tickets with feedback.')
+@click.option('--free-ratio', default=0.05, show_default=True, help='Share of free (price 0) tickets.')
+@click.option('--seed', 'random_seed', default=42, show_default=True, help='Random seed.')
+@click.option('--batch-size', default=50000, show_default=True, help='Rows per insert batch.')
+@click.option('--as-of', type=click.DateTime(), default=None,
+              help='Reference "now" for the generated history (default: current UTC time).')
+@with_appcontext
+def seed_command(tickets, sharpeners, clubs, invitations, seasons, feedback_ratio, free_ratio, random_seed,
+                 batch_size, as_of):
+    """Bulk-insert a deterministic synthetic dataset for scale testing."""
+    if sharpeners < clubs:
+        raise click.UsageError('Every club needs a sharpener - use at least as many --sharpeners as --clubs')
+    rng = random.Random(random_seed)
+    now = as_of or datetime.utcnow()
+    started = time.perf_counter()
+
+    if db.engine.dialect.name == 'sqlite':
+        # Bulk load: skip fsync per commit
+        db.session.execute(db.text('PRAGMA synchronous=OFF'))
+
+    club_ids = seed_clubs(clubs)
+
+    # Sharpeners share one password hash - hashing is deliberately slow
+    password_hash = generate_password_hash('seed-password')
+    first_sharpener_id = (db.session.query(func.max(Sharpener.id)).scalar() or 0) + 1
+    sharpener_rows = []
+    for sharpener_id in range(first_sharpener_id, first_sharpener_id + sharpeners):
+        sharpener_rows.append({
+            'id': sharpener_id,
+            'club_id': club_ids[(sharpener_id - first_sharpener_id) % clubs],
+            'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            'email': f"seed-sharpener-{sharpener_id}@example.com",
+            'phone': f"45{rng.randrange(20000000, 99999999)}",
+            'username': f"seed{sharpener_id}",
+            'password_hash': password_hash,
+            'is_active': rng.random() < 0.8,
+            'is_admin': sharpener_id - first_sharpener_id < clubs,
+            'created_at': now - timedelta(days=rng.randrange(30, 365 * seasons)),
+        })
+    insert_batches(Sharpener.__table__, sharpener_rows, batch_size)
+    club_sharpener_ids = {club_id: [row['id'] for row in sharpener_rows if row['club_id'] == club_id]
+                          for club_id in club_ids}
+
+    first_invitation_id = (db.session.query(func.max(Invitation.id)).scalar() or 0) + 1
+    invitation_rows = []
+    for invitation_id in range(first_invitation_id, first_invitation_id + invitations):
+        created_at = now - timedelta(days=rng.uniform(0, 365 * seasons))
+        invitation_rows.append({
+            'id': invitation_id,
+            'club_id': club_ids[invitation_id % clubs],
+            'email': f"seed-invite-{invitation_id}@example.com",
+            'token': f"seed-token-{random_seed}-{invitation_id}",
+            'used': rng.random() < 0.6,
+            'created_at': created_at,
+            'expires_at': created_at + timedelta(days=7),
+        })
+    insert_batches(Invitation.__table__, invitation_rows, batch_size)
+
+    # Tickets and feedback, generated and inserted one batch at a time to bound memory
+    days = season_days(seasons, now)
+    if not days:
+        raise click.UsageError('No season days to spread tickets over - increase --seasons')
+    next_ticket_id = (db.session.query(func.max(Ticket.id)).scalar() or 0) + 1
+    next_feedback_id = (db.session.query(func.max(Feedback.id)).scalar() or 0) + 1
+    status_counts = {}
+    feedback_total = 0
+    created_total = 0
+
+    fmt = datetime_formatter()
+    for arrivals in sample_arrivals(rng, days, tickets, batch_size, now):
+        ticket_rows = []
+        feedback_rows = []
+        for created_at in arrivals:
+            price = 0 if rng.random() < free_ratio else 80
+            club_id = club_ids[next_ticket_id % clubs]
+            row, completed_at = generate_ticket(rng, next_ticket_id, club_id, created_at,
+                                                club_sharpener_ids[club_id], price, now, fmt)
+            ticket_rows.append(tuple(row))
+            status_counts[row[8]] = status_counts.get(row[8], 0) + 1
+
+            if completed_at is not None and rng.random() < feedback_ratio:
+                feedback_rows.append((
+                    next_feedback_id, next_ticket_id, RATING_CHOICE.pick(rng), None,
+                    fmt(completed_at + timedelta(hours=rng.uniform(0.5, 48))),
+                ))
+                next_feedback_id += 1
+            next_ticket_id += 1
+
+        driver_insert(Ticket.__tablename__, TICKET_COLUMNS, ticket_rows)
+        if feedback_rows:
+            driver_insert(Feedback.__tablename__, FEEDBACK_COLUMNS, feedback_rows)
+        db.session.commit()
+        feedback_total += len(feedback_rows)
+        created_total += len(ticket_rows)
+        click.echo(f"[Seed] {created_total}/{tickets} tickets")
+
+    # Keep the running rating aggregates consistent with the new feedback
+    aggregates = compute_rating_aggregates()
+    for sharpener_id, values in aggregates.items():
+        Sharpener.query.filter_by(id=sharpener_id).update(values, synchronize_session=False)
+    # Rows were inserted with explicit ids
+    reset_sequences(db.session, [Club.__table__, Sharpener.__table__, Invitation.__table__, Ticket.__table__,
+                                 Feedback.__table__])
+    db.session.commit()
+    # Number the queued tickets in payment order, as if they had been paid one by one
+    for club_id in club_ids:
+        rebuild_queue_stats(club_id)
+
+    elapsed = time.perf_counter() - started
+    summary = ', '.join(f"{status}: {count}" for status, count in sorted(status_counts.items()))
+    click.echo(f"[Seed] Created {sharpeners} sharpeners in {clubs} clubs, {invitations} invitations, "
+               f"{tickets} tickets ({summary}) and {feedback_total} feedback in {elapsed:.1f}s")
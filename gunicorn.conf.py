@@ -0,0 +1,22 @@
+"""
+Gunicorn configuration.
+
+Loaded automatically when gunicorn is started from the project directory.
+"""
+import os
+import shutil
+
+
+def on_starting(server):
+    """Start every deployment with an empty Prometheus multiprocess directory"""
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Drop live gauges of workers that have exited so /metrics stays accurate"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -14,10 +14,14 @@ def migrate_database(db_path='instance/skate_tickets.db'):
         print(f"Database {db_path} does not exist. No migration needed.")
         return
 
-    # Backup the database first
+    # Backup the database first, through SQLite's backup API (a file copy can be torn
+    # by a concurrent write, and misses pages still in the -wal file)
     backup_path = f"{db_path}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    import shutil
-    shutil.copy2(db_path, backup_path)
+    source, backup = sqlite3.connect(db_path), sqlite3.connect(backup_path)
+    with backup:
+        source.backup(backup)
+    source.close()
+    backup.close()
     print(f"✅ Database backed up to: {backup_path}")
 
     conn = sqlite3.connect(db_path)
@@ -56,10 +60,7 @@ def migrate_database(db_path='instance/skate_tickets.db'):
             # Set placeholder emails for existing users
             cursor.execute("SELECT id, username FROM sharpener WHERE email IS NULL")
             existing_users = cursor.fetchall()
-
-            for user_id, username in existing_users:
-                placeholder_email = f"{username}@example.com"
-                cursor.execute("UPDATE sharpener SET email = ? WHERE id = ?", (placeholder_email, user_id))
+            cursor.execute("UPDATE sharpener SET email = username || '@example.com' WHERE email IS NULL")
 
             if existing_users:
                 print(f"✅ Set placeholder emails for {len(existing_users)} existing users")
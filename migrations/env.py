@@ -93,6 +93,9 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    # One transaction per revision: utils.backfill commits in batches, and
+    # revisions before it should stay applied if a later one fails
+    conf_args.setdefault("transaction_per_migration", True)
 
     connectable = get_engine()
 
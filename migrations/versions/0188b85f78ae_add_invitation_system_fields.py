@@ -16,11 +16,66 @@ branch_labels = None
 depends_on = None
 
 
+def create_base_tables(tables):
+    """
+    Create the tables that predate migrations on an empty database, in their
+    shape before any later revision. Existing databases were made by
+    db.create_all() and already have them.
+    """
+    if 'sharpener' not in tables:
+        op.create_table('sharpener',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(100), nullable=False),
+            sa.Column('email', sa.String(255), nullable=False),
+            sa.Column('phone', sa.String(20), nullable=False),
+            sa.Column('username', sa.String(50), nullable=False),
+            sa.Column('password_hash', sa.String(255), nullable=False),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+            sa.UniqueConstraint('username')
+        )
+    if 'ticket' not in tables:
+        op.create_table('ticket',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('code', sa.String(10), nullable=False),
+            sa.Column('customer_name', sa.String(100), nullable=False),
+            sa.Column('customer_phone', sa.String(20), nullable=False),
+            sa.Column('brand', sa.String(50), nullable=False),
+            sa.Column('color', sa.String(20), nullable=False),
+            sa.Column('size', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(20), nullable=True),
+            sa.Column('payment_id', sa.String(100), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('paid_at', sa.DateTime(), nullable=True),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('completed_at', sa.DateTime(), nullable=True),
+            sa.Column('sharpened_by_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['sharpened_by_id'], ['sharpener.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('code')
+        )
+    if 'feedback' not in tables:
+        op.create_table('feedback',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('ticket_id', sa.Integer(), nullable=False),
+            sa.Column('rating', sa.Integer(), nullable=False),
+            sa.Column('comment', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['ticket_id'], ['ticket.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
 def upgrade():
     # Check if tables exist before modifying
     conn = op.get_bind()
     inspector = sa.inspect(conn)
     tables = inspector.get_table_names()
+    if not {'sharpener', 'ticket', 'feedback'} & set(tables):
+        create_base_tables(tables)
+        tables = sa.inspect(conn).get_table_names()
 
     # Only add columns if sharpener table exists and doesn't have them
     if 'sharpener' in tables:
@@ -34,7 +89,8 @@ def upgrade():
         if 'is_active' not in columns:
             op.add_column('sharpener', sa.Column('is_active', sa.Boolean(), nullable=True))
             # Set all existing users as active
-            op.execute("UPDATE sharpener SET is_active = 1 WHERE is_active IS NULL")
+            conn.execute(sa.text("UPDATE sharpener SET is_active = :active WHERE is_active IS NULL"),
+                         {'active': True})
 
     # Create invitation table if it doesn't exist
     if 'invitation' not in tables:
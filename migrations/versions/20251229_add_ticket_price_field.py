@@ -8,6 +8,8 @@ Create Date: 2025-12-29 08:00:00.000000
 from alembic import op
 import sqlalchemy as sa
 
+from utils.backfill import backfill
+
 
 # revision identifiers, used by Alembic.
 revision = 'a1b2c3d4e5f6'
@@ -24,18 +26,21 @@ def upgrade():
 
     # Only add price column if ticket table exists and doesn't have it
     if 'ticket' in tables:
-        columns = [col['name'] for col in inspector.get_columns('ticket')]
+        columns = {col['name']: col for col in inspector.get_columns('ticket')}
 
         if 'price' not in columns:
             # Add price column with nullable=True initially
             op.add_column('ticket', sa.Column('price', sa.Integer(), nullable=True))
+        elif not columns['price']['nullable']:
+            return
 
-            # Backfill existing tickets with current SHARPENING_PRICE_DKK (80)
-            op.execute("UPDATE ticket SET price = 80 WHERE price IS NULL")
+        # Backfill existing tickets with current SHARPENING_PRICE_DKK (80), in batches;
+        # an interrupted upgrade continues where it stopped
+        backfill('ticket', 'price = :price', where='price IS NULL', params={'price': 80}, name='ticket.price')
 
-            # Make column non-nullable after backfill
-            with op.batch_alter_table('ticket') as batch_op:
-                batch_op.alter_column('price', nullable=False)
+        # Make column non-nullable after backfill
+        with op.batch_alter_table('ticket') as batch_op:
+            batch_op.alter_column('price', existing_type=sa.Integer(), nullable=False)
 
 
 def downgrade():
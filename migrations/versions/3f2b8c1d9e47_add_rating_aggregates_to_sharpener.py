@@ -0,0 +1,58 @@
+"""Add running rating aggregates to Sharpener
+
+Revision ID: 3f2b8c1d9e47
+Revises: 6a57427d97ed
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2b8c1d9e47'
+down_revision = '6a57427d97ed'
+branch_labels = None
+depends_on = None
+
+AGGREGATE_COLUMNS = ['rating_sum', 'rating_count'] + [f'rating_{stars}_count' for stars in range(1, 6)]
+
+
+def column_exists(table_name, column_name):
+    """Check if a column exists in a table."""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    columns = [c['name'] for c in inspector.get_columns(table_name)]
+    return column_name in columns
+
+
+def upgrade():
+    missing = [name for name in AGGREGATE_COLUMNS if not column_exists('sharpener', name)]
+    if not missing:
+        return
+
+    with op.batch_alter_table('sharpener', schema=None) as batch_op:
+        for name in missing:
+            batch_op.add_column(sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from existing feedback
+    star_counts = ',\n'.join(
+        f"rating_{stars}_count = (SELECT COUNT(*) FROM feedback JOIN ticket ON feedback.ticket_id = ticket.id "
+        f"WHERE ticket.sharpened_by_id = sharpener.id AND feedback.rating = {stars})"
+        for stars in range(1, 6)
+    )
+    op.execute(f"""
+        UPDATE sharpener SET
+            rating_sum = COALESCE((SELECT SUM(feedback.rating) FROM feedback JOIN ticket ON feedback.ticket_id = ticket.id
+                                   WHERE ticket.sharpened_by_id = sharpener.id), 0),
+            rating_count = (SELECT COUNT(*) FROM feedback JOIN ticket ON feedback.ticket_id = ticket.id
+                            WHERE ticket.sharpened_by_id = sharpener.id),
+            {star_counts}
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('sharpener', schema=None) as batch_op:
+        for name in reversed(AGGREGATE_COLUMNS):
+            batch_op.drop_column(name)
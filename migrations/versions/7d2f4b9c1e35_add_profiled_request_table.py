@@ -0,0 +1,54 @@
+"""Add profiled_request table
+
+Revision ID: 7d2f4b9c1e35
+Revises: c6e1b8f4a2d9
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2f4b9c1e35'
+down_revision = 'c6e1b8f4a2d9'
+branch_labels = None
+depends_on = None
+
+
+def table_exists(table_name):
+    """Check if a table exists."""
+    bind = op.get_bind()
+    return table_name in inspect(bind).get_table_names()
+
+
+def upgrade():
+    if not table_exists('profiled_request'):
+        op.create_table(
+            'profiled_request',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('club_id', sa.Integer(), nullable=False),
+            sa.Column('sharpener_id', sa.Integer(), nullable=True),
+            sa.Column('method', sa.String(length=10), nullable=False),
+            sa.Column('path', sa.String(length=500), nullable=False),
+            sa.Column('endpoint', sa.String(length=100), nullable=True),
+            sa.Column('status_code', sa.Integer(), nullable=True),
+            sa.Column('mode', sa.String(length=10), nullable=False),
+            sa.Column('duration_ms', sa.Float(), nullable=False),
+            sa.Column('sql_count', sa.Integer(), nullable=False),
+            sa.Column('sql_ms', sa.Float(), nullable=False),
+            sa.Column('sql_summary', sa.Text(), nullable=False),
+            sa.Column('data', sa.LargeBinary(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['club_id'], ['club.id'], name='fk_profiled_request_club'),
+            sa.ForeignKeyConstraint(['sharpener_id'], ['sharpener.id'], name='fk_profiled_request_sharpener'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_profiled_request_club_created_at', 'profiled_request', ['club_id', 'created_at'])
+
+
+def downgrade():
+    if table_exists('profiled_request'):
+        op.drop_index('ix_profiled_request_club_created_at', table_name='profiled_request')
+        op.drop_table('profiled_request')
@@ -0,0 +1,37 @@
+"""Add account_version to Sharpener
+
+Revision ID: 8c4d1e6a2b90
+Revises: 3f2b8c1d9e47
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4d1e6a2b90'
+down_revision = '3f2b8c1d9e47'
+branch_labels = None
+depends_on = None
+
+
+def column_exists(table_name, column_name):
+    """Check if a column exists in a table."""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    columns = [c['name'] for c in inspector.get_columns(table_name)]
+    return column_name in columns
+
+
+def upgrade():
+    if not column_exists('sharpener', 'account_version'):
+        with op.batch_alter_table('sharpener', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('account_version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    if column_exists('sharpener', 'account_version'):
+        with op.batch_alter_table('sharpener', schema=None) as batch_op:
+            batch_op.drop_column('account_version')
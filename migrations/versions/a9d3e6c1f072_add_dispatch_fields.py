@@ -0,0 +1,56 @@
+"""Add dispatcher offer fields to ticket and availability to sharpener
+
+Revision ID: a9d3e6c1f072
+Revises: f5c8a2d7b914
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e6c1f072'
+down_revision = 'f5c8a2d7b914'
+branch_labels = None
+depends_on = None
+
+
+def column_exists(table_name, column_name):
+    """Check if a column exists in a table."""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    columns = [c['name'] for c in inspector.get_columns(table_name)]
+    return column_name in columns
+
+
+def upgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        if not column_exists('ticket', 'assigned_to_id'):
+            batch_op.add_column(sa.Column('assigned_to_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_ticket_assigned_to', 'sharpener', ['assigned_to_id'], ['id'])
+        if not column_exists('ticket', 'assigned_at'):
+            batch_op.add_column(sa.Column('assigned_at', sa.DateTime(), nullable=True))
+        if not column_exists('ticket', 'offer_misses'):
+            batch_op.add_column(sa.Column('offer_misses', sa.Integer(), nullable=False, server_default='0'))
+        if not column_exists('ticket', 'skipped_by_id'):
+            batch_op.add_column(sa.Column('skipped_by_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_ticket_skipped_by', 'sharpener', ['skipped_by_id'], ['id'])
+
+    if not column_exists('sharpener', 'available_since'):
+        with op.batch_alter_table('sharpener', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('available_since', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('sharpener', schema=None) as batch_op:
+        batch_op.drop_column('available_since')
+
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_ticket_skipped_by', type_='foreignkey')
+        batch_op.drop_column('skipped_by_id')
+        batch_op.drop_column('offer_misses')
+        batch_op.drop_column('assigned_at')
+        batch_op.drop_constraint('fk_ticket_assigned_to', type_='foreignkey')
+        batch_op.drop_column('assigned_to_id')
@@ -0,0 +1,35 @@
+"""Add (status, created_at, id) index to Ticket
+
+Revision ID: b7e2f5a13c68
+Revises: 8c4d1e6a2b90
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2f5a13c68'
+down_revision = '8c4d1e6a2b90'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_ticket_status_created_at'
+
+
+def index_exists(table_name, index_name):
+    """Check if an index exists on a table."""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return index_name in [i['name'] for i in inspector.get_indexes(table_name)]
+
+
+def upgrade():
+    if not index_exists('ticket', INDEX_NAME):
+        op.create_index(INDEX_NAME, 'ticket', ['status', 'created_at', 'id'])
+
+
+def downgrade():
+    if index_exists('ticket', INDEX_NAME):
+        op.drop_index(INDEX_NAME, table_name='ticket')
@@ -0,0 +1,147 @@
+"""Add clubs, with club_id on ticket, sharpener and invitation
+
+Existing rows go to a first club ('default'). Ticket codes become unique per
+club, the ticket status index now leads with club_id, and a sharpener's
+recent work gets its own index instead of scanning every club's tickets.
+
+Revision ID: c6e1b8f4a2d9
+Revises: a9d3e6c1f072
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+from utils.backfill import backfill
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e1b8f4a2d9'
+down_revision = 'a9d3e6c1f072'
+branch_labels = None
+depends_on = None
+
+LEGACY_CLUB_ID = 1
+
+# Names SQLite's unnamed unique constraint on ticket.code inside batch mode
+NAMING_CONVENTION = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+
+
+def table_exists(table_name):
+    """Check if a table exists."""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return table_name in inspector.get_table_names()
+
+
+def column_exists(table_name, column_name):
+    """Check if a column exists in a table."""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    columns = [c['name'] for c in inspector.get_columns(table_name)]
+    return column_name in columns
+
+
+def index_exists(table_name, index_name):
+    """Check if an index exists on a table."""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return index_name in [i['name'] for i in inspector.get_indexes(table_name)]
+
+
+def column_nullable(table_name, column_name):
+    """Check if a column allows NULL."""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return next(c['nullable'] for c in inspector.get_columns(table_name) if c['name'] == column_name)
+
+
+def code_unique_constraint():
+    """Name of the unique constraint on ticket.code alone, or None"""
+    for constraint in inspect(op.get_bind()).get_unique_constraints('ticket'):
+        if constraint['column_names'] == ['code']:
+            return constraint['name'] or 'uq_ticket_code'
+    return None
+
+
+def add_club_id(table_name, index=False):
+    """Add ticket/sharpener/invitation.club_id, pointing existing rows at the first club"""
+    if not column_exists(table_name, 'club_id'):
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('club_id', sa.Integer(), nullable=True))
+    elif not column_nullable(table_name, 'club_id'):
+        return
+    # In batches, resuming after an interrupted upgrade
+    backfill(table_name, 'club_id = :club_id', where='club_id IS NULL', params={'club_id': LEGACY_CLUB_ID},
+             name=f'{table_name}.club_id')
+    with op.batch_alter_table(table_name, schema=None) as batch_op:
+        batch_op.alter_column('club_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key(f'fk_{table_name}_club', 'club', ['club_id'], ['id'])
+        if index:
+            batch_op.create_index(f'ix_{table_name}_club_id', ['club_id'])
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not table_exists('club'):
+        op.create_table('club',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('slug', sa.String(50), nullable=False),
+            sa.Column('name', sa.String(100), nullable=False),
+            sa.Column('hostname', sa.String(255), nullable=True),
+            sa.Column('price', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('slug'),
+            sa.UniqueConstraint('hostname')
+        )
+    if not bind.execute(sa.text("SELECT 1 FROM club WHERE id = :id"), {'id': LEGACY_CLUB_ID}).first():
+        bind.execute(sa.text("INSERT INTO club (id, slug, name, created_at) VALUES (:id, 'default', 'Default', :now)"),
+                     {'id': LEGACY_CLUB_ID, 'now': datetime.utcnow()})
+        if bind.dialect.name == 'postgresql':
+            bind.execute(sa.text("SELECT setval(pg_get_serial_sequence('club', 'id'), (SELECT MAX(id) FROM club))"))
+
+    add_club_id('sharpener', index=True)
+    add_club_id('invitation', index=True)
+    add_club_id('ticket')
+
+    # Codes are unique per club; every ticket index leads with club_id
+    unique_code = code_unique_constraint()
+    with op.batch_alter_table('ticket', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        if unique_code:
+            batch_op.drop_constraint(unique_code, type_='unique')
+        batch_op.create_unique_constraint('uq_ticket_club_code', ['club_id', 'code'])
+    if index_exists('ticket', 'ix_ticket_status_created_at'):
+        op.drop_index('ix_ticket_status_created_at', table_name='ticket')
+    if not index_exists('ticket', 'ix_ticket_club_status_created_at'):
+        op.create_index('ix_ticket_club_status_created_at', 'ticket', ['club_id', 'status', 'created_at', 'id'])
+    if not index_exists('ticket', 'ix_ticket_club_status_completed_at'):
+        op.create_index('ix_ticket_club_status_completed_at', 'ticket', ['club_id', 'status', 'completed_at'])
+    if not index_exists('ticket', 'ix_ticket_sharpened_by_status_completed_at'):
+        op.create_index('ix_ticket_sharpened_by_status_completed_at', 'ticket',
+                        ['sharpened_by_id', 'status', 'completed_at'])
+
+
+def downgrade():
+    # Fails if two clubs use the same ticket code; merge or delete those tickets first
+    op.drop_index('ix_ticket_sharpened_by_status_completed_at', table_name='ticket')
+    op.drop_index('ix_ticket_club_status_completed_at', table_name='ticket')
+    op.drop_index('ix_ticket_club_status_created_at', table_name='ticket')
+    op.create_index('ix_ticket_status_created_at', 'ticket', ['status', 'created_at', 'id'])
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_ticket_club_code', type_='unique')
+        batch_op.create_unique_constraint('uq_ticket_code', ['code'])
+        batch_op.drop_constraint('fk_ticket_club', type_='foreignkey')
+        batch_op.drop_column('club_id')
+
+    for table_name in ('invitation', 'sharpener'):
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table_name}_club_id')
+            batch_op.drop_constraint(f'fk_{table_name}_club', type_='foreignkey')
+            batch_op.drop_column('club_id')
+
+    # Queue statistics of other clubs than the first
+    op.get_bind().execute(sa.text("DELETE FROM queue_stats WHERE id != :id"), {'id': LEGACY_CLUB_ID})
+    op.drop_table('club')
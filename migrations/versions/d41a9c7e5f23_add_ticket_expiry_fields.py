@@ -0,0 +1,45 @@
+"""Add expired_at and reminder_sent_at to Ticket
+
+Revision ID: d41a9c7e5f23
+Revises: b7e2f5a13c68
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41a9c7e5f23'
+down_revision = 'b7e2f5a13c68'
+branch_labels = None
+depends_on = None
+
+NEW_COLUMNS = ['expired_at', 'reminder_sent_at']
+
+
+def column_exists(table_name, column_name):
+    """Check if a column exists in a table."""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    columns = [c['name'] for c in inspector.get_columns(table_name)]
+    return column_name in columns
+
+
+def upgrade():
+    missing = [name for name in NEW_COLUMNS if not column_exists('ticket', name)]
+    if missing:
+        with op.batch_alter_table('ticket', schema=None) as batch_op:
+            for name in missing:
+                batch_op.add_column(sa.Column(name, sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    # Expired tickets can't be represented without expired_at; put them back in the unpaid list
+    op.execute("UPDATE ticket SET status = 'unpaid' WHERE status = 'expired'")
+    present = [name for name in NEW_COLUMNS if column_exists('ticket', name)]
+    if present:
+        with op.batch_alter_table('ticket', schema=None) as batch_op:
+            for name in present:
+                batch_op.drop_column(name)
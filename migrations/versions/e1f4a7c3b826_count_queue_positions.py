@@ -0,0 +1,56 @@
+"""Count queue positions with a ticket index, drop QueueStats.dequeued
+
+A ticket's place in the queue is now one plus the club's paid tickets with a
+lower queue_seq, counted on (club_id, status, queue_seq), instead of
+queue_seq minus a counter of departures that tickets leaving from the middle
+of the queue threw off.
+
+Revision ID: e1f4a7c3b826
+Revises: 7d2f4b9c1e35
+Create Date: 2026-10-21 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f4a7c3b826'
+down_revision = '7d2f4b9c1e35'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_ticket_club_status_queue_seq'
+
+
+def index_exists(table_name, index_name):
+    """Check if an index exists on a table."""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return index_name in [i['name'] for i in inspector.get_indexes(table_name)]
+
+
+def column_exists(table_name, column_name):
+    """Check if a column exists in a table."""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    return column_name in [c['name'] for c in inspector.get_columns(table_name)]
+
+
+def upgrade():
+    if not index_exists('ticket', INDEX_NAME):
+        op.create_index(INDEX_NAME, 'ticket', ['club_id', 'status', 'queue_seq'])
+    if column_exists('queue_stats', 'dequeued'):
+        with op.batch_alter_table('queue_stats') as batch_op:
+            batch_op.drop_column('dequeued')
+
+
+def downgrade():
+    # Positions are queue_seq - dequeued again: run `flask rebuild-queue-stats`,
+    # which renumbers the queue from 1 to match the 0 here
+    if not column_exists('queue_stats', 'dequeued'):
+        with op.batch_alter_table('queue_stats') as batch_op:
+            batch_op.add_column(sa.Column('dequeued', sa.Integer(), nullable=False, server_default='0'))
+    if index_exists('ticket', INDEX_NAME):
+        op.drop_index(INDEX_NAME, table_name='ticket')
@@ -0,0 +1,39 @@
+"""Add job_checkpoint table
+
+Revision ID: e83b6f0d2a41
+Revises: d41a9c7e5f23
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = 'e83b6f0d2a41'
+down_revision = 'd41a9c7e5f23'
+branch_labels = None
+depends_on = None
+
+
+def table_exists(table_name):
+    """Check if a table exists."""
+    bind = op.get_bind()
+    return table_name in inspect(bind).get_table_names()
+
+
+def upgrade():
+    if not table_exists('job_checkpoint'):
+        op.create_table(
+            'job_checkpoint',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('value', sa.String(length=255), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade():
+    if table_exists('job_checkpoint'):
+        op.drop_table('job_checkpoint')
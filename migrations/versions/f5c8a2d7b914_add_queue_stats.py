@@ -0,0 +1,91 @@
+"""Add queue_stats table and Ticket.queue_seq
+
+Revision ID: f5c8a2d7b914
+Revises: e83b6f0d2a41
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+import json
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5c8a2d7b914'
+down_revision = 'e83b6f0d2a41'
+branch_labels = None
+depends_on = None
+
+# Completed tickets used to seed the sharpening time average
+SEED_SAMPLES = 50
+
+
+def table_exists(table_name):
+    """Check if a table exists."""
+    bind = op.get_bind()
+    return table_name in inspect(bind).get_table_names()
+
+
+def column_exists(table_name, column_name):
+    """Check if a column exists in a table."""
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    columns = [c['name'] for c in inspector.get_columns(table_name)]
+    return column_name in columns
+
+
+def upgrade():
+    if not column_exists('ticket', 'queue_seq'):
+        with op.batch_alter_table('ticket', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('queue_seq', sa.Integer(), nullable=True))
+
+    if table_exists('queue_stats'):
+        return
+    queue_stats = op.create_table(
+        'queue_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('enqueued', sa.Integer(), nullable=False),
+        sa.Column('dequeued', sa.Integer(), nullable=False),
+        sa.Column('avg_service_seconds', sa.Float(), nullable=True),
+        sa.Column('service_samples', sa.Integer(), nullable=False),
+        sa.Column('sharpener_activity', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Number the tickets already waiting and seed the average from recent work
+    bind = op.get_bind()
+    waiting = bind.execute(sa.text(
+        "SELECT id FROM ticket WHERE status = 'paid' ORDER BY COALESCE(paid_at, created_at), id"
+    )).scalars().all()
+    for seq, ticket_id in enumerate(waiting, start=1):
+        bind.execute(sa.text("UPDATE ticket SET queue_seq = :seq WHERE id = :id"), {'seq': seq, 'id': ticket_id})
+
+    # Typed columns, so SQLite hands back datetimes rather than strings
+    ticket = sa.table('ticket', sa.column('status', sa.String), sa.column('started_at', sa.DateTime),
+                      sa.column('completed_at', sa.DateTime))
+    recent = bind.execute(
+        sa.select(ticket.c.started_at, ticket.c.completed_at)
+        .where(ticket.c.status == 'completed', ticket.c.started_at.isnot(None), ticket.c.completed_at.isnot(None))
+        .order_by(ticket.c.completed_at.desc())
+        .limit(SEED_SAMPLES)
+    ).all()
+    # Same clamp as services/queue.py applies to new samples
+    durations = [min(max((completed - started).total_seconds(), 60), 3600) for started, completed in recent]
+    op.bulk_insert(queue_stats, [{
+        'id': 1,
+        'enqueued': len(waiting),
+        'dequeued': 0,
+        'avg_service_seconds': sum(durations) / len(durations) if durations else None,
+        'service_samples': len(durations),
+        'sharpener_activity': json.dumps({}),
+    }])
+
+
+def downgrade():
+    if table_exists('queue_stats'):
+        op.drop_table('queue_stats')
+    if column_exists('ticket', 'queue_seq'):
+        with op.batch_alter_table('ticket', schema=None) as batch_op:
+            batch_op.drop_column('queue_seq')
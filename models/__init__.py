@@ -1,7 +1,11 @@
 from .database import db
+from .club import Club
 from .ticket import Ticket
 from .sharpener import Sharpener
 from .feedback import Feedback
 from .invitation import Invitation
+from .job_checkpoint import JobCheckpoint
+from .queue_stats import QueueStats
+from .profiled_request import ProfiledRequest
 
-__all__ = ['db', 'Ticket', 'Sharpener', 'Feedback', 'Invitation']
\ No newline at end of file
+__all__ = ['db', 'Club', 'Ticket', 'Sharpener', 'Feedback', 'Invitation', 'JobCheckpoint', 'QueueStats', 'ProfiledRequest']
\ No newline at end of file
@@ -0,0 +1,11 @@
+from datetime import datetime
+from .database import db
+
+class Club(db.Model):
+    """Database model for a club sharing the deployment (see services/clubs.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(50), unique=True, nullable=False)  # Path prefix /c/<slug>
+    name = db.Column(db.String(100), nullable=False)
+    hostname = db.Column(db.String(255), unique=True)  # Served on this host, e.g. skk.example.com
+    price = db.Column(db.Integer)  # Price in DKK; SHARPENING_PRICE_DKK when not set
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
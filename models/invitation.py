@@ -4,6 +4,7 @@ from .database import db
 class Invitation(db.Model):
     """Database model for sharpener invitations."""
     id = db.Column(db.Integer, primary_key=True)
+    club_id = db.Column(db.Integer, db.ForeignKey('club.id'), nullable=False, index=True)  # Club the sharpener joins
     email = db.Column(db.String(255), nullable=False, unique=True)
     token = db.Column(db.String(100), nullable=False, unique=True)
     used = db.Column(db.Boolean, default=False)
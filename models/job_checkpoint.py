@@ -0,0 +1,22 @@
+from datetime import datetime
+from .database import db
+
+class JobCheckpoint(db.Model):
+    """Database model for the resume position of periodic jobs."""
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.String(255), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @staticmethod
+    def get(name, default=None):
+        checkpoint = db.session.get(JobCheckpoint, name)
+        return checkpoint.value if checkpoint else default
+
+    @staticmethod
+    def set(name, value):
+        """Store a checkpoint value (does not commit)"""
+        checkpoint = db.session.get(JobCheckpoint, name)
+        if checkpoint is None:
+            db.session.add(JobCheckpoint(name=name, value=str(value)))
+        else:
+            checkpoint.value = str(value)
@@ -0,0 +1,23 @@
+from datetime import datetime
+from .database import db
+
+class ProfiledRequest(db.Model):
+    """Database model for a request profiled on an admin's demand (see services/profiling.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    club_id = db.Column(db.Integer, db.ForeignKey('club.id'), nullable=False)
+    sharpener_id = db.Column(db.Integer, db.ForeignKey('sharpener.id'))  # Admin who asked for it
+    method = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(500), nullable=False)  # Without the query string: searches hold customer names and phones
+    endpoint = db.Column(db.String(100))
+    status_code = db.Column(db.Integer)
+    mode = db.Column(db.String(10), nullable=False)  # cprofile (pstats) or sample (folded stacks)
+    duration_ms = db.Column(db.Float, nullable=False)
+    sql_count = db.Column(db.Integer, nullable=False, default=0)
+    sql_ms = db.Column(db.Float, nullable=False, default=0)
+    sql_summary = db.Column(db.Text, nullable=False, default='{}')  # JSON: repeated and slowest statement shapes
+    data = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed marshalled pstats, or folded stacks
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_profiled_request_club_created_at', 'club_id', 'created_at'),
+    )
@@ -0,0 +1,16 @@
+import json
+from datetime import datetime
+from .database import db
+
+class QueueStats(db.Model):
+    """Database model for the running statistics of the sharpening queue (one row per club)."""
+    id = db.Column(db.Integer, primary_key=True)  # The club's id
+    enqueued = db.Column(db.Integer, nullable=False, default=0)  # Last queue number handed out (Ticket.queue_seq)
+    avg_service_seconds = db.Column(db.Float)  # Moving average of completed_at - started_at
+    service_samples = db.Column(db.Integer, nullable=False, default=0)
+    sharpener_activity = db.Column(db.Text, nullable=False, default='{}')  # JSON: sharpener id -> last claim/completion (unix time)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def active_sharpeners(self, since):
+        """Number of sharpeners who claimed or completed a ticket after `since` (unix time)"""
+        return sum(1 for last in json.loads(self.sharpener_activity or '{}').values() if last >= since)
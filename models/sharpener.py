@@ -4,6 +4,7 @@ from .database import db
 class Sharpener(db.Model):
     """Database model for skate sharpener staff accounts."""
     id = db.Column(db.Integer, primary_key=True)
+    club_id = db.Column(db.Integer, db.ForeignKey('club.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(255), nullable=False, unique=True)
     phone = db.Column(db.String(20), nullable=False)
@@ -12,7 +13,50 @@ class Sharpener(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     is_admin = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped whenever is_active or is_admin changes; invalidates cached
+    # identities (see services/auth.py)
+    account_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Set while the sharpener takes tickets from the dispatcher (see services/dispatch.py)
+    available_since = db.Column(db.DateTime)
+
+    # Running rating aggregates, maintained alongside each Feedback insert
+    # (see record_rating) and recomputed by `flask reconcile-ratings`
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_1_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_2_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_3_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_4_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_5_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Relationship - explicitly specify foreign_key since Ticket has multiple FKs to Sharpener
     tickets = db.relationship('Ticket', backref='sharpener', lazy=True,
-                              foreign_keys='Ticket.sharpened_by_id')
\ No newline at end of file
+                              foreign_keys='Ticket.sharpened_by_id')
+
+    @property
+    def avg_rating(self):
+        """Average star rating, or 0 if no feedback has been given"""
+        if not self.rating_count:
+            return 0
+        return self.rating_sum / self.rating_count
+
+    @property
+    def rating_histogram(self):
+        """Number of ratings per star, as {1: n, ..., 5: n}"""
+        return {stars: getattr(self, f'rating_{stars}_count') or 0 for stars in range(1, 6)}
+
+    @staticmethod
+    def record_rating(sharpener_id, rating):
+        """
+        Add a rating to a sharpener's running aggregates.
+
+        Issued as a single UPDATE with column arithmetic so concurrent feedback
+        submissions from different workers can't lose increments. Does not
+        commit - call it in the same transaction as the Feedback insert.
+        """
+        star_column = f'rating_{rating}_count'
+        Sharpener.query.filter_by(id=sharpener_id).update({
+            Sharpener.rating_sum: Sharpener.rating_sum + rating,
+            Sharpener.rating_count: Sharpener.rating_count + 1,
+            getattr(Sharpener, star_column): getattr(Sharpener, star_column) + 1,
+        }, synchronize_session=False)
@@ -4,7 +4,8 @@ from .database import db
 class Ticket(db.Model):
     """Database model for customer skate sharpening tickets."""
     id = db.Column(db.Integer, primary_key=True)
-    code = db.Column(db.String(10), unique=True, nullable=False)
+    club_id = db.Column(db.Integer, db.ForeignKey('club.id'), nullable=False)
+    code = db.Column(db.String(10), nullable=False)  # Unique per club
     customer_name = db.Column(db.String(100), nullable=False)
     customer_phone = db.Column(db.String(20), nullable=False)
 
@@ -15,7 +16,7 @@ class Ticket(db.Model):
     price = db.Column(db.Integer, nullable=False)  # Price in DKK
 
     # Status tracking
-    status = db.Column(db.String(20), default='unpaid')  # unpaid, paid, in_progress, completed, cancelled
+    status = db.Column(db.String(20), default='unpaid')  # unpaid, paid, in_progress, completed, cancelled, expired
     payment_id = db.Column(db.String(100))  # Stripe payment intent ID
 
     # Timestamps
@@ -24,10 +25,34 @@ class Ticket(db.Model):
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
     cancelled_at = db.Column(db.DateTime)
+    expired_at = db.Column(db.DateTime)  # Unpaid for too long (see `flask expire-tickets`)
+    reminder_sent_at = db.Column(db.DateTime)  # Payment reminder SMS sent
+
+    # Place in the paid queue (see services/queue.py)
+    queue_seq = db.Column(db.Integer)
 
     # Sharpener tracking
     sharpened_by_id = db.Column(db.Integer, db.ForeignKey('sharpener.id'))
     cancelled_by_id = db.Column(db.Integer, db.ForeignKey('sharpener.id'))
 
+    # Dispatcher offers (see services/dispatch.py)
+    assigned_to_id = db.Column(db.Integer, db.ForeignKey('sharpener.id'))  # Offered to, awaiting an answer
+    assigned_at = db.Column(db.DateTime)
+    offer_misses = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Skipped or timed out
+    skipped_by_id = db.Column(db.Integer, db.ForeignKey('sharpener.id'))
+
     # Relationships
-    feedback = db.relationship('Feedback', backref='ticket', uselist=False)
\ No newline at end of file
+    feedback = db.relationship('Feedback', backref='ticket', uselist=False)
+
+    # Every list a club sees filters on club_id first, so its queries only touch its own rows
+    __table_args__ = (
+        db.UniqueConstraint('club_id', 'code', name='uq_ticket_club_code'),
+        # Per-status lists, newest first (keyset pagination on created_at, id)
+        db.Index('ix_ticket_club_status_created_at', 'club_id', 'status', 'created_at', 'id'),
+        # Queue positions: paid tickets ahead of a queue_seq
+        db.Index('ix_ticket_club_status_queue_seq', 'club_id', 'status', 'queue_seq'),
+        # Completed today on the dashboard
+        db.Index('ix_ticket_club_status_completed_at', 'club_id', 'status', 'completed_at'),
+        # A sharpener's recent work (a sharpener belongs to one club)
+        db.Index('ix_ticket_sharpened_by_status_completed_at', 'sharpened_by_id', 'status', 'completed_at'),
+    )
@@ -1,10 +1,16 @@
 from .customer import customer_bp
 from .sharpener import sharpener_bp
 from .admin import admin_bp, invitation_bp
+from .metrics import metrics_bp
+from .assets import assets_bp
+from .health import health_bp
 
 def register_blueprints(app):
     """Register all blueprints with the Flask app"""
     app.register_blueprint(customer_bp)
     app.register_blueprint(sharpener_bp)
     app.register_blueprint(admin_bp)
-    app.register_blueprint(invitation_bp)
\ No newline at end of file
+    app.register_blueprint(invitation_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(assets_bp)
+    app.register_blueprint(health_bp)
\ No newline at end of file
@@ -1,14 +1,19 @@
+import json
 from datetime import datetime, timedelta
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, Response, abort, render_template, request, redirect, stream_with_context, url_for, flash
 from flask_mail import Message, Mail
 from werkzeug.security import generate_password_hash
 from itsdangerous import URLSafeTimedSerializer
-from models import db, Sharpener, Invitation
+from sqlalchemy.orm import defer
+from models import db, Sharpener, Invitation, ProfiledRequest
+from services import admin_required, current_sharpener
+from services.clubs import club_url, current_club
+from services.export import EXPORT_FORMATS, MIMETYPES, ExportError, export_chunks, export_filename
+from services.profiling import DOWNLOADS, profile_data, profile_report
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
 # Initialize token serializer for invitations (this should come from app config)
-import os
 from flask import current_app
 
 def get_serializer():
@@ -32,8 +37,7 @@ def verify_invitation_token(token, max_age=86400*7):  # 7 days
 def send_invitation_email(email, token):
     """Send invitation email (mock implementation for now)"""
     # In a real app, this would send an actual email
-    base_url = os.environ.get('BASE_URL', 'http://localhost:5000')
-    invitation_url = f"{base_url}/invitation/{token}"
+    invitation_url = club_url(current_club(), f"/invitation/{token}")
 
     print(f"[EMAIL SIMULATION] Invitation sent to {email}")
     print(f"[EMAIL SIMULATION] Invitation URL: {invitation_url}")
@@ -42,6 +46,7 @@ def send_invitation_email(email, token):
     return True
 
 @admin_bp.route('/invite_sharpener', methods=['GET', 'POST'])
+@admin_required
 def invite_sharpener():
     """Send invitation to new sharpener (admin only)"""
     if request.method == 'POST':
@@ -58,6 +63,7 @@ def invite_sharpener():
             expires_at = datetime.utcnow() + timedelta(days=7)  # 7 days to accept
 
             invitation = Invitation(
+                club_id=current_club().id,
                 email=email,
                 token=token,
                 expires_at=expires_at
@@ -71,15 +77,99 @@ def invite_sharpener():
             else:
                 flash(f'Failed to send invitation to {email}.')
 
-    # Get existing sharpeners and pending invitations
-    sharpeners = Sharpener.query.all()
-    pending_invitations = Invitation.query.filter_by(used=False).all()
+    # Get the club's sharpeners and pending invitations
+    club_id = current_club().id
+    sharpeners = Sharpener.query.filter_by(club_id=club_id).all()
+    pending_invitations = Invitation.query.filter_by(club_id=club_id, used=False).all()
 
     return render_template('invite_sharpener.html',
                          sharpeners=sharpeners,
                          pending_invitations=pending_invitations,
+                         export_formats=EXPORT_FORMATS,
                          now=datetime.utcnow())
 
+@admin_bp.route('/sharpener/<int:sharpener_id>/<any(active, admin):flag>', methods=['POST'])
+@admin_required
+def toggle_sharpener_flag(sharpener_id, flag):
+    """Activate/deactivate a sharpener or grant/revoke admin (admin only)"""
+    sharpener = Sharpener.query.filter_by(id=sharpener_id, club_id=current_club().id).first_or_404()
+
+    if sharpener.id == current_sharpener().id:
+        flash('You cannot change your own account status.')
+        return redirect(url_for('admin.invite_sharpener'))
+
+    # Setting the flag bumps account_version, which drops the cached identity
+    # in every worker on commit - a deactivated sharpener is logged out at once
+    if flag == 'active':
+        sharpener.is_active = sharpener.is_active is False
+        flash(f"{sharpener.name} {'activated' if sharpener.is_active else 'deactivated'}.")
+    else:
+        sharpener.is_admin = not sharpener.is_admin
+        flash(f"{sharpener.name} {'is now an admin' if sharpener.is_admin else 'is no longer an admin'}.")
+    db.session.commit()
+
+    return redirect(url_for('admin.invite_sharpener'))
+
+def parse_export_date(name):
+    """Optional YYYY-MM-DD query parameter"""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f"Invalid {name} date {value!r}, expected YYYY-MM-DD")
+
+@admin_bp.route('/export/<any(tickets, feedback):kind>')
+@admin_required
+def export(kind):
+    """Stream the club's tickets or feedback as CSV or NDJSON, optionally gzipped (admin only)"""
+    club = current_club()
+    fmt = request.args.get('format', 'csv')
+    compress = request.args.get('gzip', '') in ('1', 'true', 'on')
+    try:
+        since, until = parse_export_date('since'), parse_export_date('until')
+        statuses = [status for status in request.args.getlist('status') if status]
+        chunks = export_chunks(kind, fmt, club.id, since, until, statuses, gzip=compress)
+    except ExportError as e:
+        abort(400, str(e))
+
+    filename = export_filename(kind, fmt, club.slug, since, until, compress)
+    return Response(stream_with_context(chunks),
+                    mimetype='application/gzip' if compress else MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'Cache-Control': 'no-store'})
+
+@admin_bp.route('/profiles')
+@admin_required
+def profiles():
+    """The club's profiled requests, newest first (admin only)"""
+    records = (ProfiledRequest.query
+               .options(defer(ProfiledRequest.data), defer(ProfiledRequest.sql_summary))
+               .filter_by(club_id=current_club().id)
+               .order_by(ProfiledRequest.id.desc())
+               .all())
+    sharpener_names = dict(db.session.query(Sharpener.id, Sharpener.name).filter_by(club_id=current_club().id))
+    return render_template('profiles.html', profiles=records, sharpener_names=sharpener_names)
+
+@admin_bp.route('/profiles/<int:profile_id>')
+@admin_required
+def profile(profile_id):
+    """One profiled request: SQL summary and the top of the profile (admin only)"""
+    record = ProfiledRequest.query.filter_by(id=profile_id, club_id=current_club().id).first_or_404()
+    return render_template('profile.html', profile=record, sql_summary=json.loads(record.sql_summary),
+                           report=profile_report(record))
+
+@admin_bp.route('/profiles/<int:profile_id>/download')
+@admin_required
+def download_profile(profile_id):
+    """The pstats file (cProfile) or folded stacks (sampling) of a profiled request (admin only)"""
+    record = ProfiledRequest.query.filter_by(id=profile_id, club_id=current_club().id).first_or_404()
+    extension, mimetype = DOWNLOADS[record.mode]
+    return Response(profile_data(record), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="profile-{record.id}.{extension}"',
+                             'Cache-Control': 'no-store'})
+
 @admin_bp.route('/invitation/<token>', methods=['GET', 'POST'])
 def accept_invitation(token):
     """Accept invitation and create sharpener account"""
@@ -109,6 +199,7 @@ def accept_invitation(token):
         else:
             # Create sharpener account
             sharpener = Sharpener(
+                club_id=invitation.club_id,
                 name=name,
                 email=email,
                 phone=phone,
@@ -0,0 +1,36 @@
+import mimetypes
+import os
+from flask import Blueprint, request, send_file, abort
+from werkzeug.security import safe_join
+from utils.assets import DIST_DIR, MANIFEST_NAME
+
+assets_bp = Blueprint('assets', __name__)
+
+# Fingerprinted files never change under the same name
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Precompressed variants written by flask build-assets, in order of preference
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+@assets_bp.route('/assets/<path:filename>')
+def asset(filename):
+    """Serve a built asset, precompressed if the client accepts it"""
+    path = safe_join(str(DIST_DIR), filename)
+    if path is None or filename == MANIFEST_NAME or filename.endswith(('.gz', '.br')) or not os.path.isfile(path):
+        abort(404)
+
+    encoding = None
+    for name, suffix in PRECOMPRESSED:
+        if request.accept_encodings[name] and os.path.isfile(path + suffix):
+            path, encoding = path + suffix, name
+            break
+
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                         max_age=ASSET_MAX_AGE, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
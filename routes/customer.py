@@ -1,49 +1,62 @@
 import os
+import logging
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
 import stripe
-from models import db, Ticket, Feedback
-from services import send_sms, render_sms_template, create_stripe_payment_intent
+from models import db, Ticket, Sharpener, Feedback
+from services import send_sms, render_sms_template, create_stripe_payment_intent, confirm_ticket_payment, queue_estimate
+from services.queue import ticket_enqueued
+from services.dispatch import dispatch
+from services.clubs import LEGACY_CLUB_ID, club_url, current_club
 from utils import generate_ticket_code, normalize_phone_number, t
 from utils.notifications import notify_sharpeners_new_ticket
+from utils.metrics import observe_outbound
+from utils.log import bind_ticket
+from utils.page_cache import render_cached
 from flask import send_from_directory
 
 customer_bp = Blueprint('customer', __name__)
+logger = logging.getLogger(__name__)
 
 # Configuration
-BASE_URL = os.environ.get('BASE_URL', 'http://localhost:5000')
-SHARPENING_PRICE_DKK = int(os.environ.get('SHARPENING_PRICE_DKK', '80'))
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', 'your-stripe-publishable-key')
-RECAPTCHA_SECRET_KEY = os.environ.get('RECAPTCHA_SECRET_KEY', '')
+
+# The favicon URL can't be fingerprinted, so let browsers keep it for a day
+FAVICON_MAX_AGE = 24 * 3600
+
+# Intake form choices: brands and colors as (translation key, value) tuples
+INTAKE_BRANDS = [
+    ('jackson', 'Jackson'),
+    ('edea', 'EDEA'),
+    ('risport', 'Risport'),
+    ('riedell', 'Riedell'),
+    ('graf', 'Graf'),
+    ('other', 'Other')
+]
+INTAKE_COLORS = [
+    ('white', 'White'),
+    ('black', 'Black'),
+    ('other', 'Other')
+]
+# Standard EU sizes (24-46)
+INTAKE_SIZES = list(range(24, 47))
+# EDEA sizes (185-310 in steps of 5)
+INTAKE_EDEA_SIZES = list(range(185, 315, 5))
+
+
+def club_ticket_or_404(ticket_code):
+    """The ticket with this code in the request's club (codes are unique per club)"""
+    return Ticket.query.filter_by(club_id=current_club().id, code=ticket_code).first_or_404()
+
 
 @customer_bp.route('/')
 def index():
-    # Brands as tuples (key, value) for translation
-    brands = [
-        ('jackson', 'Jackson'),
-        ('edea', 'EDEA'),
-        ('risport', 'Risport'),
-        ('riedell', 'Riedell'),
-        ('graf', 'Graf'),
-        ('other', 'Other')
-    ]
-    # Colors as tuples (key, value) for translation
-    colors = [
-        ('white', 'White'),
-        ('black', 'Black'),
-        ('other', 'Other')
-    ]
-    # Standard EU sizes (24-46)
-    sizes = list(range(24, 47))
-
-    # EDEA sizes (185-310 in steps of 5)
-    edea_sizes = list(range(185, 315, 5))
-
-    return render_template('customer.html',
-                         brands=brands,
-                         colors=colors,
-                         sizes=sizes,
-                         edea_sizes=edea_sizes)
+    # Same for every visitor per language and price, so served from the page cache
+    return render_cached('customer.html',
+                         brands=INTAKE_BRANDS,
+                         colors=INTAKE_COLORS,
+                         sizes=INTAKE_SIZES,
+                         edea_sizes=INTAKE_EDEA_SIZES)
 
 @customer_bp.route('/request_ticket', methods=['POST'])
 def request_ticket():
@@ -72,35 +85,47 @@ def request_ticket():
     # Normalize phone
     phone = normalize_phone_number(phone)
 
-    # Generate unique ticket code
+    # Rate limits and reCAPTCHA, before anything is written or texted
+    rejection = current_app.extensions['admission'].check(
+        request.remote_addr, phone, request.form.get('g-recaptcha-response')
+    )
+    if rejection:
+        flash(t('error_recaptcha_failed' if rejection == 'recaptcha_failed' else 'error_too_many_requests'), 'error')
+        return redirect(url_for('customer.index'))
+
+    # Generate a ticket code unique within the club
+    club = current_club()
     while True:
         code = generate_ticket_code()
-        if not Ticket.query.filter_by(code=code).first():
+        if not Ticket.query.filter_by(club_id=club.id, code=code).first():
             break
 
     # Create new ticket
     ticket = Ticket(
+        club_id=club.id,
         code=code,
         customer_name=name,
         customer_phone=phone,
         brand=brand,
         color=color,
         size=size,
-        price=SHARPENING_PRICE_DKK  # Stamp current price
+        price=club.price  # Stamp the club's current price
     )
 
     db.session.add(ticket)
     db.session.commit()
+    bind_ticket(ticket.code)
+    logger.info("Ticket created")
 
     # Send SMS based on ticket price
     if ticket.price > 0:
         # Paid mode: send payment link
-        payment_url = f"{BASE_URL}/pay/{ticket.code}"
+        payment_url = club_url(club, f"/pay/{ticket.code}")
         sms_message = render_sms_template('ticket_created', ticket=ticket, payment_url=payment_url)
         confirm_url = None
     else:
         # Free mode: send confirmation link
-        confirm_url = f"{BASE_URL}/confirm/{ticket.code}"
+        confirm_url = club_url(club, f"/confirm/{ticket.code}")
         sms_message = render_sms_template('ticket_created', ticket=ticket, confirm_url=confirm_url)
         payment_url = None
 
@@ -130,12 +155,15 @@ def request_ticket():
 @customer_bp.route('/pay/<ticket_code>')
 def payment_page(ticket_code):
     """Payment page for tickets"""
-    ticket = Ticket.query.filter_by(code=ticket_code).first_or_404()
+    ticket = club_ticket_or_404(ticket_code)
 
     # Redirect free tickets to confirmation page
     if ticket.price == 0:
         return redirect(url_for('customer.confirm_ticket', ticket_code=ticket_code))
 
+    if ticket.status == 'expired':
+        return render_template('ticket_expired.html', ticket=ticket)
+
     if ticket.status != 'unpaid':
         return render_template('already_paid.html', ticket=ticket)
 
@@ -146,32 +174,34 @@ def payment_page(ticket_code):
     if ticket.payment_id and not ticket.payment_id.startswith('pi_simulation_'):
         try:
             # Try to retrieve the existing payment intent
-            payment_intent = stripe.PaymentIntent.retrieve(ticket.payment_id)
+            with observe_outbound('stripe', 'payment_intent.retrieve'):
+                payment_intent = stripe.PaymentIntent.retrieve(ticket.payment_id)
             # Check if the intent is still usable (not expired/canceled)
             if payment_intent.status in ['requires_confirmation', 'requires_action']:
                 client_secret = payment_intent.client_secret
-                print(f"[Stripe] Reusing existing payment intent {ticket.payment_id} for ticket {ticket.code}")
+                logger.info("Reusing existing payment intent %s", ticket.payment_id)
             else:
                 # Intent is no longer usable, create a new one
-                print(f"[Stripe] Payment intent {ticket.payment_id} status is {payment_intent.status}, creating new one")
+                logger.info("Payment intent %s status is %s, creating new one", ticket.payment_id, payment_intent.status)
                 ticket.payment_id = None
         except Exception as e:
-            print(f"[Stripe] Error retrieving payment intent: {e}")
+            logger.warning("Error retrieving payment intent %s: %s", ticket.payment_id, e)
             ticket.payment_id = None
 
     # Create a new payment intent if needed
     if not ticket.payment_id:
-        payment_id = create_stripe_payment_intent(SHARPENING_PRICE_DKK, ticket)
+        payment_id = create_stripe_payment_intent(ticket.price, ticket)
         ticket.payment_id = payment_id
         db.session.commit()
-        print(f"[Stripe] Created new payment intent {payment_id} for ticket {ticket.code}")
+        logger.info("Created new payment intent %s", payment_id)
 
         if not payment_id.startswith('pi_simulation_'):
             try:
-                payment_intent = stripe.PaymentIntent.retrieve(payment_id)
+                with observe_outbound('stripe', 'payment_intent.retrieve'):
+                    payment_intent = stripe.PaymentIntent.retrieve(payment_id)
                 client_secret = payment_intent.client_secret
             except Exception as e:
-                print(f"[Stripe] Error retrieving new payment intent: {e}")
+                logger.warning("Error retrieving new payment intent %s: %s", payment_id, e)
 
     return render_template('payment.html',
                          ticket=ticket,
@@ -217,27 +247,13 @@ def ticket_created():
 @customer_bp.route('/payment_process/<ticket_code>', methods=['POST'])
 def payment_process(ticket_code):
     """Process payment confirmation (should be called by payment provider webhook)"""
-    ticket = Ticket.query.filter_by(code=ticket_code).first_or_404()
+    ticket = club_ticket_or_404(ticket_code)
 
     # Only process payment if ticket is still unpaid
     if ticket.status == 'unpaid':
         # In real implementation, verify payment with Stripe webhook
         # For now, simulate successful payment
-        ticket.status = 'paid'
-        ticket.paid_at = datetime.utcnow()
-        db.session.commit()
-
-        # Notify all sharpeners about new ticket
-        notify_sharpeners_new_ticket(ticket)
-
-        # Send confirmation SMS only if configured
-        send_payment_confirmation_sms = os.environ.get('SEND_PAYMENT_CONFIRMATION_SMS', 'false').lower() == 'true'
-        if send_payment_confirmation_sms:
-            sms_message = render_sms_template(
-                'payment_confirmed',
-                ticket=ticket
-            )
-            send_sms(ticket.customer_phone, sms_message)
+        confirm_ticket_payment(ticket)
 
     # Redirect to return page after processing
     return redirect(url_for('customer.payment_return', ticket_code=ticket_code))
@@ -245,7 +261,7 @@ def payment_process(ticket_code):
 @customer_bp.route('/payment_return/<ticket_code>')
 def payment_return(ticket_code):
     """Handle payment return - displays success or failure based on payment status"""
-    ticket = Ticket.query.filter_by(code=ticket_code).first_or_404()
+    ticket = club_ticket_or_404(ticket_code)
 
     # Check payment status from query parameters (Stripe typically adds payment_intent parameters)
     payment_intent = request.args.get('payment_intent')
@@ -267,7 +283,8 @@ def payment_return(ticket_code):
         stripe_secret_key = os.environ.get('STRIPE_SECRET_KEY', 'your-stripe-secret-key')
         if payment_intent and stripe_secret_key != 'your-stripe-secret-key':
             try:
-                intent = stripe.PaymentIntent.retrieve(payment_intent)
+                with observe_outbound('stripe', 'payment_intent.retrieve'):
+                    intent = stripe.PaymentIntent.retrieve(payment_intent)
                 if intent.status == 'succeeded':
                     payment_successful = True
                 elif intent.status == 'canceled':
@@ -275,11 +292,11 @@ def payment_return(ticket_code):
                 else:
                     error_message = t('payment_failed')
             except Exception as e:
-                print(f"[Payment Return] Error checking payment status: {e}")
+                logger.warning("Error checking payment status of %s: %s", payment_intent, e)
                 error_message = t('payment_status_unknown')
 
     if payment_successful:
-        return render_template('payment_success.html', ticket=ticket)
+        return render_template('payment_success.html', ticket=ticket, estimate=queue_estimate(ticket))
     else:
         return render_template('payment_failed.html',
                              ticket=ticket,
@@ -296,11 +313,11 @@ def stripe_webhook():
 
     # Skip webhook verification in development if secret not configured
     if stripe_webhook_secret == 'your-stripe-webhook-secret':
-        print("[Stripe Webhook] Development mode - skipping signature verification")
+        logger.debug("Webhook signature verification skipped (development mode)")
         try:
             event = stripe.Event.construct_from(request.get_json(), stripe.api_key)
         except Exception as e:
-            print(f"[Stripe Webhook] Error parsing webhook: {e}")
+            logger.warning("Error parsing webhook: %s", e)
             return 'Invalid payload', 400
     else:
         # Verify webhook signature in production
@@ -309,87 +326,85 @@ def stripe_webhook():
                 payload, sig_header, stripe_webhook_secret
             )
         except ValueError:
-            print("[Stripe Webhook] Invalid payload")
+            logger.warning("Webhook with invalid payload")
             return 'Invalid payload', 400
         except stripe.error.SignatureVerificationError:
-            print("[Stripe Webhook] Invalid signature")
+            logger.warning("Webhook with invalid signature")
             return 'Invalid signature', 400
 
     # Handle payment success event
     if event['type'] == 'payment_intent.succeeded':
         payment_intent = event['data']['object']
 
-        # Get ticket code from payment metadata
-        ticket_code = payment_intent.get('metadata', {}).get('ticket_code')
+        # Get ticket code and club from payment metadata (intents from before clubs have no club)
+        metadata = payment_intent.get('metadata', {})
+        ticket_code = metadata.get('ticket_code')
+        club_id = int(metadata.get('club_id') or LEGACY_CLUB_ID)
+        bind_ticket(ticket_code)
 
         if ticket_code:
-            ticket = Ticket.query.filter_by(code=ticket_code).first()
-            if ticket and ticket.status == 'unpaid':
-                # Update ticket status to paid
-                ticket.status = 'paid'
-                ticket.paid_at = datetime.utcnow()
-                db.session.commit()
-
-                print(f"[Stripe Webhook] Payment confirmed for ticket {ticket_code}")
-
-                # Notify all sharpeners about new ticket
-                notify_sharpeners_new_ticket(ticket)
-
-                # Send confirmation SMS only if configured
-                send_payment_confirmation_sms = os.environ.get('SEND_PAYMENT_CONFIRMATION_SMS', 'false').lower() == 'true'
-                if send_payment_confirmation_sms:
-                    sms_message = render_sms_template(
-                        'payment_confirmed',
-                        ticket=ticket
-                    )
-                    send_sms(ticket.customer_phone, sms_message)
+            ticket = Ticket.query.filter_by(club_id=club_id, code=ticket_code).first()
+            # An expired ticket is reinstated - the money has been taken
+            if ticket and confirm_ticket_payment(ticket):
+                logger.info("Payment confirmed by webhook")
             else:
-                print(f"[Stripe Webhook] Ticket {ticket_code} not found or already paid")
+                logger.info("Webhook for ticket not found or already paid")
         else:
-            print("[Stripe Webhook] No ticket_code in payment metadata")
+            logger.warning("Webhook without ticket_code in payment metadata")
 
     return '', 200
 
 @customer_bp.route('/confirm/<ticket_code>')
 def confirm_ticket(ticket_code):
     """Confirmation page for free tickets (no payment required)"""
-    ticket = Ticket.query.filter_by(code=ticket_code).first_or_404()
+    ticket = club_ticket_or_404(ticket_code)
 
     # Redirect paid tickets to payment page
     if ticket.price > 0:
         return redirect(url_for('customer.payment_page', ticket_code=ticket_code))
 
+    if ticket.status == 'expired':
+        return render_template('ticket_expired.html', ticket=ticket)
+
     # Check if already confirmed
     if ticket.status != 'unpaid':
-        return render_template('ticket_confirmed.html', ticket=ticket)
+        return render_template('ticket_confirmed.html', ticket=ticket, estimate=queue_estimate(ticket))
 
     return render_template('confirm_free_ticket.html', ticket=ticket)
 
 @customer_bp.route('/confirm/<ticket_code>/process', methods=['POST'])
 def confirm_ticket_process(ticket_code):
     """Process free ticket confirmation"""
-    ticket = Ticket.query.filter_by(code=ticket_code).first_or_404()
+    ticket = club_ticket_or_404(ticket_code)
 
     # Verify this is a free ticket
     if ticket.price > 0:
         flash(t('error_not_free_ticket'), 'error')
         return redirect(url_for('customer.payment_page', ticket_code=ticket_code))
 
-    if ticket.status == 'unpaid':
-        # Mark as 'paid' (ready for sharpening)
-        ticket.status = 'paid'
-        ticket.paid_at = datetime.utcnow()
-        db.session.commit()
+    if ticket.status == 'expired':
+        return render_template('ticket_expired.html', ticket=ticket)
 
+    # Mark as 'paid' (ready for sharpening). A conditional update, as in confirm_ticket_payment,
+    # so a double submit queues and announces the ticket once
+    updated = Ticket.query.filter(
+        Ticket.id == ticket.id, Ticket.status.in_(('unpaid', 'expired'))
+    ).update({Ticket.status: 'paid', Ticket.paid_at: datetime.utcnow()}, synchronize_session=False)
+    if updated:
+        ticket_enqueued(ticket)
+    db.session.commit()
+    if updated:
+        db.session.refresh(ticket)
         # Notify all sharpeners about new ticket
         notify_sharpeners_new_ticket(ticket)
+        dispatch(ticket.club_id)
 
-    return render_template('ticket_confirmed.html', ticket=ticket)
+    return render_template('ticket_confirmed.html', ticket=ticket, estimate=queue_estimate(ticket))
 
 @customer_bp.route('/feedback/<ticket_code>', methods=['GET', 'POST'])
 def feedback(ticket_code):
     """Customer feedback form for completed tickets"""
-    ticket = Ticket.query.filter_by(code=ticket_code).first_or_404()
+    ticket = club_ticket_or_404(ticket_code)
 
     # Only allow feedback for completed tickets
     if ticket.status != 'completed':
@@ -403,6 +418,10 @@ def feedback(ticket_code):
         rating = int(request.form['rating'])
         comment = request.form.get('comment', '').strip()
 
+        if rating < 1 or rating > 5:
+            flash(t('error_invalid_rating'), 'error')
+            return render_template('feedback_form.html', ticket=ticket)
+
         # Create feedback record
         feedback_record = Feedback(
             ticket_id=ticket.id,
@@ -411,6 +430,11 @@ def feedback(ticket_code):
         )
 
         db.session.add(feedback_record)
+
+        # Update the sharpener's running rating aggregates in the same transaction
+        if ticket.sharpened_by_id:
+            Sharpener.record_rating(ticket.sharpened_by_id, rating)
+
         db.session.commit()
 
         return render_template('feedback_thanks.html', ticket=ticket, feedback=feedback_record)
@@ -419,5 +443,5 @@ def feedback(ticket_code):
 
 @customer_bp.route('/favicon.ico')
 def favicon():
-    """Serve favicon"""
-    return send_from_directory('static', 'favicon.ico')
+    """Serve favicon (pages link the fingerprinted copy; this is for browsers that guess the URL)"""
+    return send_from_directory('static', 'favicon.ico', max_age=FAVICON_MAX_AGE)
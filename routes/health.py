@@ -0,0 +1,20 @@
+from flask import Blueprint, Response, jsonify
+from services.health import cached_readiness
+
+health_bp = Blueprint('health', __name__)
+
+
+@health_bp.route('/healthz')
+def healthz():
+    """Liveness: the worker serves requests (no database or template work)"""
+    return Response('ok\n', mimetype='text/plain', headers={'Cache-Control': 'no-store'})
+
+
+@health_bp.route('/readyz')
+def readyz():
+    """Readiness: database reachable, with sidecar lag and provider errors (cached a few seconds)"""
+    result = cached_readiness()
+    response = jsonify(result)
+    response.status_code = 503 if result['status'] == 'fail' else 200
+    response.headers['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,22 @@
+import hmac
+from flask import Blueprint, Response, current_app, request, abort
+from utils.metrics import generate_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    # Bearer token required; without one the endpoint is off unless METRICS_PUBLIC
+    # says it is only reachable internally
+    metrics_token = current_app.config.get('METRICS_TOKEN')
+    if metrics_token:
+        # Bytes: compare_digest rejects non-ASCII str. WSGI headers are latin-1 decoded raw bytes
+        authorization = request.headers.get('Authorization', '').encode('latin-1', 'replace')
+        if not hmac.compare_digest(authorization, f'Bearer {metrics_token}'.encode()):
+            abort(401)
+    elif not current_app.config.get('METRICS_PUBLIC'):
+        abort(404)
+
+    output, content_type = generate_metrics(current_app)
+    return Response(output, content_type=content_type)
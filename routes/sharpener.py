@@ -1,12 +1,72 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from sqlalchemy import func, or_
 from werkzeug.security import check_password_hash
-from models import db, Ticket, Sharpener, Feedback
+from models import db, Ticket, Sharpener
 from services import send_sms, render_sms_template, login_required, admin_required
+from services import queue, dispatch
+from services.clubs import club_url, current_club
 from utils import t
+from utils.cache import TTLCache
+from utils.log import bind_ticket
+from utils.metrics import DISPATCH_EVENTS
+from utils.pagination import keyset_page
 
 sharpener_bp = Blueprint('sharpener', __name__, url_prefix='/sharpener')
 
+UNPAID_PAGE_SIZE = 50
+UNPAID_MAX_PAGE_SIZE = 200
+
+# Age filter -> (minimum age, maximum age) in hours
+UNPAID_AGE_FILTERS = {
+    'hour': (None, 1),
+    'day': (None, 24),
+    'older_day': (24, None),
+    'older_week': (24 * 7, None),
+}
+
+# Unpaid counts may lag by up to this many seconds
+_unpaid_counts = TTLCache(ttl=30)
+
+
+def unpaid_tickets_query(club_id, search='', age=''):
+    """A club's unpaid tickets, optionally filtered by age and a name/phone/code prefix"""
+    query = Ticket.query.filter(Ticket.club_id == club_id, Ticket.status == 'unpaid')
+
+    min_hours, max_hours = UNPAID_AGE_FILTERS.get(age, (None, None))
+    now = datetime.utcnow()
+    if max_hours is not None:
+        query = query.filter(Ticket.created_at >= now - timedelta(hours=max_hours))
+    if min_hours is not None:
+        query = query.filter(Ticket.created_at < now - timedelta(hours=min_hours))
+
+    search = search.strip()
+    if search:
+        conditions = [
+            Ticket.customer_name.istartswith(search, autoescape=True),
+            Ticket.code.startswith(search.upper(), autoescape=True),
+        ]
+        digits = ''.join(filter(str.isdigit, search))
+        if digits and len(digits) == len(search.replace(' ', '').lstrip('+')):
+            # Phones are stored normalized with the 45 country code
+            conditions.append(Ticket.customer_phone.startswith(digits))
+            conditions.append(Ticket.customer_phone.startswith('45' + digits))
+        query = query.filter(or_(*conditions))
+    return query
+
+
+def count_unpaid(club_id, search='', age=''):
+    """Number of a club's unpaid tickets matching the filters, cached briefly per worker"""
+    return _unpaid_counts.get_or_set(
+        (club_id, search.strip().lower(), age),
+        lambda: unpaid_tickets_query(club_id, search, age).with_entities(func.count(Ticket.id)).scalar()
+    )
+
+
+def club_ticket_or_404(ticket_id):
+    """A ticket of the request's club"""
+    return Ticket.query.filter_by(id=ticket_id, club_id=current_club().id).first_or_404()
+
 @sharpener_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Sharpener login page"""
@@ -14,12 +74,15 @@ def login():
         username = request.form['username']
         password = request.form['password']
 
-        sharpener = Sharpener.query.filter_by(username=username).first()
+        sharpener = Sharpener.query.filter_by(club_id=current_club().id, username=username).first()
 
         if sharpener and check_password_hash(sharpener.password_hash, password):
+            if sharpener.is_active is False:
+                flash(t('account_inactive'))
+                return render_template('sharpener_login.html')
+            # Name and admin status are looked up per request (services/auth.py),
+            # so they can't go stale in the session cookie
             session['sharpener_id'] = sharpener.id
-            session['sharpener_name'] = sharpener.name
-            session['sharpener_is_admin'] = sharpener.is_admin or False
             return redirect(url_for('sharpener.dashboard'))
         else:
             flash(t('invalid_login'))
@@ -29,18 +92,29 @@ def login():
 @sharpener_bp.route('/logout')
 def logout():
     """Logout sharpener"""
+    sharpener_id = session.get('sharpener_id')
+    # Manual mode has no availability or offers to hand back
+    if sharpener_id is not None and dispatch.dispatch_enabled():
+        _set_available(sharpener_id, False)
     session.pop('sharpener_id', None)
+    # Left over from sessions created before identities were looked up per request
     session.pop('sharpener_name', None)
+    session.pop('sharpener_is_admin', None)
     return redirect(url_for('sharpener.login'))
 
 @sharpener_bp.route('/')
 @login_required
 def dashboard():
     """Sharpener dashboard"""
-    unpaid_tickets = Ticket.query.filter_by(status='unpaid').all()
-    ready_tickets = Ticket.query.filter_by(status='paid').all()
-    in_progress_tickets = Ticket.query.filter_by(status='in_progress').all()
+    club = current_club()
+    # Also takes back offers that timed out
+    dispatch.dispatch(club.id)
+    now = datetime.utcnow()
+    ready_tickets = sorted(Ticket.query.filter_by(club_id=club.id, status='paid').all(),
+                           key=lambda ticket: dispatch.priority(ticket, now))
+    in_progress_tickets = Ticket.query.filter_by(club_id=club.id, status='in_progress').all()
     completed_today = Ticket.query.filter(
+        Ticket.club_id == club.id,
         Ticket.status == 'completed',
         Ticket.completed_at >= datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     ).all()
@@ -52,46 +126,83 @@ def dashboard():
         status='completed'
     ).order_by(Ticket.completed_at.desc()).limit(5).all()
 
-    # Calculate average rating
-    feedbacks = db.session.query(Feedback).join(Ticket).filter(
-        Ticket.sharpened_by_id == sharpener_id
-    ).all()
-    avg_rating = sum(f.rating for f in feedbacks) / len(feedbacks) if feedbacks else 0
+    # Rating aggregates are kept up to date on each feedback insert
+    sharpener = db.session.get(Sharpener, sharpener_id)
+    avg_rating = sharpener.avg_rating if sharpener else 0
+    feedback_count = sharpener.rating_count if sharpener else 0
+
+    # Tickets the dispatcher is holding for this sharpener
+    my_offers = [ticket for ticket in ready_tickets if ticket.assigned_to_id == sharpener_id]
 
     return render_template('sharpener_dashboard.html',
-                         unpaid_count=len(unpaid_tickets),
+                         unpaid_count=count_unpaid(club.id),
                          ready_tickets=ready_tickets,
+                         my_offers=my_offers,
+                         dispatch_mode=dispatch.dispatch_mode(),
+                         available=bool(sharpener and sharpener.available_since),
+                         urgent_ids={ticket.id for ticket in ready_tickets if dispatch.is_urgent(ticket, now)},
                          in_progress_tickets=in_progress_tickets,
                          completed_today=len(completed_today),
                          my_recent_tickets=my_recent_tickets,
                          avg_rating=round(avg_rating, 1),
-                         feedback_count=len(feedbacks))
+                         feedback_count=feedback_count)
 
 @sharpener_bp.route('/unpaid')
 @login_required
 def unpaid_tickets():
-    """View all unpaid tickets"""
-    unpaid_tickets = Ticket.query.filter_by(status='unpaid').order_by(Ticket.created_at.desc()).all()
-    return render_template('unpaid_tickets.html', unpaid_tickets=unpaid_tickets, now=datetime.utcnow())
+    """View unpaid tickets, newest first, one keyset page at a time"""
+    search = request.args.get('q', '')[:100]
+    age = request.args.get('age', '')
+    if age not in UNPAID_AGE_FILTERS:
+        age = ''
+    page_size = min(max(request.args.get('per_page', UNPAID_PAGE_SIZE, type=int), 1), UNPAID_MAX_PAGE_SIZE)
+    club_id = current_club().id
+
+    page = keyset_page(
+        unpaid_tickets_query(club_id, search, age), Ticket.created_at, Ticket.id, page_size,
+        after=request.args.get('after'), before=request.args.get('before')
+    )
+    filters = {key: value for key, value in (('q', search), ('age', age)) if value}
+    if page_size != UNPAID_PAGE_SIZE:
+        filters['per_page'] = page_size
+
+    return render_template('unpaid_tickets.html',
+                         unpaid_tickets=page.items,
+                         page=page,
+                         filters=filters,
+                         search=search,
+                         age=age,
+                         age_filters=UNPAID_AGE_FILTERS,
+                         total_unpaid=count_unpaid(club_id),
+                         matching_count=count_unpaid(club_id, search, age) if filters.keys() - {'per_page'} else None,
+                         now=datetime.utcnow())
 
 @sharpener_bp.route('/claim/<int:ticket_id>')
 @login_required
 def claim_ticket(ticket_id):
     """Claim a ticket for sharpening"""
-    ticket = Ticket.query.get_or_404(ticket_id)
+    ticket = club_ticket_or_404(ticket_id)
 
     if ticket.status == 'unpaid':
         # Promote unpaid ticket to paid status (claimed for processing)
         ticket.status = 'paid'
+        queue.ticket_enqueued(ticket)
         db.session.commit()
+        _unpaid_counts.clear()
+        dispatch.dispatch(ticket.club_id)
         flash(t('unpaid_ticket_claimed', ticket.code))
         return redirect(request.referrer or url_for('sharpener.dashboard'))
     elif ticket.status == 'paid':
-        # Normal claim: move to in_progress
-        ticket.status = 'in_progress'
-        ticket.started_at = datetime.utcnow()
-        ticket.sharpened_by_id = session['sharpener_id']
+        # Normal claim or accepting an offer: move to in_progress, unless another
+        # sharpener got there first or the dispatcher is holding it for someone else
+        accepting = ticket.assigned_to_id == session['sharpener_id']
+        if not dispatch.claim(ticket, session['sharpener_id']):
+            db.session.rollback()
+            flash(t('ticket_not_available'))
+            return redirect(url_for('sharpener.dashboard'))
         db.session.commit()
+        if accepting:
+            DISPATCH_EVENTS.labels('accepted').inc()
         flash(t('ticket_claimed', ticket.code))
         return redirect(url_for('sharpener.dashboard'))
     else:
@@ -102,19 +213,23 @@ def claim_ticket(ticket_id):
 @login_required
 def unclaim_ticket(ticket_id):
     """Unclaim a ticket and return it to previous status"""
-    ticket = Ticket.query.get_or_404(ticket_id)
+    ticket = club_ticket_or_404(ticket_id)
 
     if ticket.status == 'in_progress' and ticket.sharpened_by_id == session['sharpener_id']:
         # Return in_progress ticket to paid status
         ticket.status = 'paid'
         ticket.started_at = None
         ticket.sharpened_by_id = None
+        # It kept its queue_seq, so it goes back to its old place in the queue
         db.session.commit()
+        dispatch.dispatch(ticket.club_id)
         flash(t('ticket_unclaimed', ticket.code))
     elif ticket.status == 'paid' and not ticket.sharpened_by_id:
         # Return claimed unpaid ticket back to unpaid status
         ticket.status = 'unpaid'
+        queue.ticket_dequeued(ticket, back_to_unpaid=True)
         db.session.commit()
+        _unpaid_counts.clear()
         flash(t('ticket_unclaimed', ticket.code))
     else:
         flash(t('cannot_unclaim'))
@@ -125,7 +240,7 @@ def unclaim_ticket(ticket_id):
 @login_required
 def complete_ticket(ticket_id):
     """Mark a ticket as completed"""
-    ticket = Ticket.query.get_or_404(ticket_id)
+    ticket = club_ticket_or_404(ticket_id)
 
     if ticket.status != 'in_progress' or ticket.sharpened_by_id != session['sharpener_id']:
         flash(t('ticket_not_available'))
@@ -133,12 +248,13 @@ def complete_ticket(ticket_id):
 
     ticket.status = 'completed'
     ticket.completed_at = datetime.utcnow()
+    queue.ticket_completed(ticket, session['sharpener_id'])
     db.session.commit()
+    dispatch.record_completion()
+    bind_ticket(ticket.code)
 
     # Send pickup SMS with feedback link
-    import os
-    base_url = os.environ.get('BASE_URL', 'http://localhost:5000')
-    feedback_url = f"{base_url}/feedback/{ticket.code}"
+    feedback_url = club_url(current_club(), f"/feedback/{ticket.code}")
 
     sms_message = render_sms_template(
         'pickup_ready',
@@ -147,6 +263,9 @@ def complete_ticket(ticket_id):
     )
     send_sms(ticket.customer_phone, sms_message)
 
+    # The sharpener is free for the next ticket
+    dispatch.dispatch(ticket.club_id)
+
     flash(t('ticket_completed', ticket.code))
     return redirect(url_for('sharpener.dashboard'))
 
@@ -154,7 +273,7 @@ def complete_ticket(ticket_id):
 @admin_required
 def cancel_ticket(ticket_id):
     """Cancel a ticket (admin only)"""
-    ticket = Ticket.query.get_or_404(ticket_id)
+    ticket = club_ticket_or_404(ticket_id)
 
     if ticket.status == 'completed':
         flash(t('cannot_cancel_completed'))
@@ -164,10 +283,57 @@ def cancel_ticket(ticket_id):
         flash(t('ticket_already_cancelled'))
         return redirect(request.referrer or url_for('sharpener.dashboard'))
 
+    if ticket.status == 'paid':
+        queue.ticket_dequeued(ticket)
+    freed_sharpener = ticket.status == 'in_progress' or ticket.assigned_to_id is not None
     ticket.status = 'cancelled'
     ticket.cancelled_at = datetime.utcnow()
     ticket.cancelled_by_id = session['sharpener_id']
+    ticket.assigned_to_id = None
+    ticket.assigned_at = None
     db.session.commit()
+    _unpaid_counts.clear()
+    if freed_sharpener:
+        dispatch.dispatch(ticket.club_id)
 
     flash(t('ticket_cancelled', ticket.code))
-    return redirect(request.referrer or url_for('sharpener.dashboard'))
\ No newline at end of file
+    return redirect(request.referrer or url_for('sharpener.dashboard'))
+
+@sharpener_bp.route('/skip/<int:ticket_id>')
+@login_required
+def skip_ticket(ticket_id):
+    """Turn down a ticket the dispatcher offered; it goes to the next available sharpener"""
+    ticket = club_ticket_or_404(ticket_id)
+
+    if ticket.status != 'paid' or ticket.assigned_to_id != session['sharpener_id']:
+        flash(t('ticket_not_available'))
+        return redirect(url_for('sharpener.dashboard'))
+
+    dispatch.release(ticket, skipped_by_id=session['sharpener_id'])
+    db.session.commit()
+    DISPATCH_EVENTS.labels('skipped').inc()
+    dispatch.dispatch(ticket.club_id)
+
+    flash(t('ticket_skipped', ticket.code))
+    return redirect(url_for('sharpener.dashboard'))
+
+@sharpener_bp.route('/availability/<any(on, off):state>')
+@login_required
+def set_availability(state):
+    """Start or stop taking tickets from the dispatcher"""
+    _set_available(session['sharpener_id'], state == 'on')
+    flash(t('availability_on' if state == 'on' else 'availability_off'))
+    return redirect(url_for('sharpener.dashboard'))
+
+def _set_available(sharpener_id, available):
+    """Mark a sharpener (un)available; going off duty hands their open offers to others"""
+    sharpener = db.session.get(Sharpener, sharpener_id)
+    if sharpener is None:
+        return
+    if available:
+        sharpener.available_since = sharpener.available_since or datetime.utcnow()
+    else:
+        sharpener.available_since = None
+        dispatch.release_all(sharpener_id)
+    db.session.commit()
+    dispatch.dispatch(sharpener.club_id)
\ No newline at end of file
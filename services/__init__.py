@@ -1,5 +1,6 @@
 from .sms import send_sms, render_sms_template
-from .payment import create_stripe_payment_intent
-from .auth import login_required, admin_required
+from .payment import create_stripe_payment_intent, confirm_ticket_payment
+from .auth import login_required, admin_required, current_sharpener
+from .queue import queue_estimate
 
-__all__ = ['send_sms', 'render_sms_template', 'create_stripe_payment_intent', 'login_required', 'admin_required']
\ No newline at end of file
+__all__ = ['send_sms', 'render_sms_template', 'create_stripe_payment_intent', 'confirm_ticket_payment', 'login_required', 'admin_required', 'current_sharpener', 'queue_estimate']
\ No newline at end of file
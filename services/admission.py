@@ -0,0 +1,211 @@
+"""
+Admission control for public ticket requests.
+
+Every accepted POST /request_ticket costs a database write and a paid SMS, so
+requests are screened before any of that happens:
+
+1. a token bucket per client IP,
+2. reCAPTCHA v3 verification (when RECAPTCHA_SECRET_KEY is set),
+3. a token bucket per phone number.
+
+Buckets live in a small SQLite file in the instance folder, so all gunicorn
+workers (and the development server's reloader) share the same limits. Each
+check is one short IMMEDIATE transaction on that file, which is separate
+from the application database and never contends with it.
+
+Configuration (environment):
+    RATE_LIMIT_IP       Bucket per client IP, e.g. "60/hour" (off to disable)
+    RATE_LIMIT_PHONE    Bucket per phone number, e.g. "6/hour" (off to disable)
+    RECAPTCHA_MIN_SCORE Lowest accepted reCAPTCHA v3 score (default 0.5)
+    RECAPTCHA_TIMEOUT   Seconds to wait for Google's verify endpoint (default 3)
+    RECAPTCHA_FAIL_OPEN Admit requests when verification is unavailable (default true)
+"""
+import hashlib
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import requests
+from utils.cache import TTLCache
+from utils.metrics import observe_outbound, ADMISSION_REJECTIONS
+
+logger = logging.getLogger(__name__)
+
+RECAPTCHA_VERIFY_URL = 'https://www.google.com/recaptcha/api/siteverify'
+RECAPTCHA_ACTION = 'ticket_request'
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(value):
+    """
+    Parse "N/period" into (capacity, tokens per second).
+
+    Returns None for an empty value or "off". The bucket holds up to N tokens
+    and refills completely over one period.
+    """
+    value = (value or '').strip().lower()
+    if not value or value == 'off':
+        return None
+    count, _, period = value.partition('/')
+    capacity = float(count)
+    seconds = PERIODS[period.strip() or 'hour']
+    return capacity, capacity / seconds
+
+
+class TokenBucketStore:
+    """Token buckets in a SQLite file shared by all processes on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread and process; never reuse one across a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Losing the last few bucket updates in a power cut is harmless
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS bucket '
+                         '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, capacity, refill_rate, cost=1.0):
+        """Take `cost` tokens from the bucket; returns False (taking nothing) if there aren't enough"""
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * refill_rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute('INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            # Occasionally drop buckets that have been idle for a day (they would be full again anyway)
+            if random.random() < 0.001:
+                conn.execute('DELETE FROM bucket WHERE updated < ?', (now - 86400,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed
+
+
+class RecaptchaVerifier:
+    """reCAPTCHA v3 verification over a keep-alive connection, with recent results cached"""
+
+    def __init__(self, secret_key, min_score=0.5, timeout=3.0, fail_open=True, verify_url=RECAPTCHA_VERIFY_URL):
+        self.secret_key = secret_key
+        self.min_score = min_score
+        self.timeout = timeout
+        self.fail_open = fail_open
+        self.verify_url = verify_url
+        # Tokens are single use at Google; a resubmitted form (double click,
+        # browser retry) reuses the verdict instead of failing as a duplicate
+        self.results = TTLCache(ttl=120)
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None or self._local.pid != os.getpid():
+            session = requests.Session()
+            self._local.session, self._local.pid = session, os.getpid()
+        return session
+
+    def verify(self, token, remote_ip=None):
+        """Return True if the token is valid, for our action, and scores high enough"""
+        if not token:
+            return False
+        cache_key = hashlib.sha256(token.encode()).hexdigest()
+        cached = self.results.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            with observe_outbound('recaptcha', 'siteverify'):
+                response = self._session().post(self.verify_url, data={
+                    'secret': self.secret_key,
+                    'response': token,
+                    'remoteip': remote_ip,
+                }, timeout=self.timeout)
+                response.raise_for_status()
+                result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning("reCAPTCHA verification unavailable (%s), %s", e,
+                           'admitting' if self.fail_open else 'rejecting')
+            # Not cached: the next attempt should try Google again
+            return self.fail_open
+
+        passed = (bool(result.get('success'))
+                  and result.get('action') == RECAPTCHA_ACTION
+                  and float(result.get('score', 0)) >= self.min_score)
+        if not passed:
+            logger.info("reCAPTCHA rejected", extra={
+                'score': result.get('score'),
+                'recaptcha_action': result.get('action'),
+                'error_codes': result.get('error-codes'),
+            })
+        self.results.set(cache_key, passed)
+        return passed
+
+
+class AdmissionController:
+    """Decides whether a ticket request may proceed"""
+
+    def __init__(self, store, ip_rate=None, phone_rate=None, recaptcha=None):
+        self.store = store
+        self.ip_rate = ip_rate
+        self.phone_rate = phone_rate
+        self.recaptcha = recaptcha
+
+    def check(self, remote_ip, phone, recaptcha_token):
+        """
+        Screen a ticket request.
+
+        Returns:
+            None if admitted, otherwise the rejection reason
+            ('rate_limited_ip', 'recaptcha_failed' or 'rate_limited_phone')
+        """
+        reason = None
+        if self.ip_rate and not self.store.take(f'ip:{remote_ip}', *self.ip_rate):
+            reason = 'rate_limited_ip'
+        elif self.recaptcha and not self.recaptcha.verify(recaptcha_token, remote_ip):
+            reason = 'recaptcha_failed'
+        elif self.phone_rate and phone and not self.store.take(f'phone:{phone}', *self.phone_rate):
+            reason = 'rate_limited_phone'
+
+        if reason:
+            ADMISSION_REJECTIONS.labels(reason).inc()
+            logger.warning("Ticket request rejected: %s", reason, extra={'remote_ip': remote_ip})
+        return reason
+
+
+def init_admission(app):
+    """Build the admission controller from app config (stored as app.extensions['admission'])"""
+    secret_key = app.config.get('RECAPTCHA_SECRET_KEY')
+    site_key = app.config.get('RECAPTCHA_SITE_KEY')
+    recaptcha = None
+    # Without a site key the form never sends a token, so verifying would reject everyone
+    if secret_key and site_key and 'your-recaptcha' not in secret_key + site_key:
+        recaptcha = RecaptchaVerifier(
+            secret_key,
+            min_score=app.config.get('RECAPTCHA_MIN_SCORE', 0.5),
+            timeout=app.config.get('RECAPTCHA_TIMEOUT', 3.0),
+            fail_open=app.config.get('RECAPTCHA_FAIL_OPEN', True),
+            verify_url=app.config.get('RECAPTCHA_VERIFY_URL', RECAPTCHA_VERIFY_URL),
+        )
+
+    app.extensions['admission'] = AdmissionController(
+        TokenBucketStore(app.config.get('ADMISSION_DB') or os.path.join(app.instance_path, 'admission.sqlite')),
+        ip_rate=parse_rate(app.config.get('RATE_LIMIT_IP')),
+        phone_rate=parse_rate(app.config.get('RATE_LIMIT_PHONE')),
+        recaptcha=recaptcha,
+    )
@@ -1,5 +1,122 @@
+import os
+import threading
+import time
 from functools import wraps
-from flask import session, redirect, url_for, flash
+from flask import session, redirect, url_for, flash, g, current_app, has_request_context
+from sqlalchemy import event
+
+# Cross-request identity cache: sharpener_id -> SharpenerIdentity.
+# Entries are dropped as soon as the account version changes (deactivation,
+# admin status), in this worker directly and in the other workers on the same
+# host through the generation file; the TTL is a backstop for multi-node setups.
+_identity_cache = {}
+_identity_lock = threading.Lock()
+_cache_generation = None
+# Lowest version we may still cache per sharpener, guards against a slow load
+# of an old row being cached after an invalidation
+_min_versions = {}
+
+
+class SharpenerIdentity:
+    """Immutable snapshot of the fields needed to authorize a request"""
+    __slots__ = ('id', 'club_id', 'name', 'is_active', 'is_admin', 'account_version', 'loaded_at')
+
+    def __init__(self, sharpener):
+        self.id = sharpener.id
+        self.club_id = sharpener.club_id
+        self.name = sharpener.name
+        self.is_active = sharpener.is_active is not False
+        self.is_admin = bool(sharpener.is_admin)
+        self.account_version = sharpener.account_version or 1
+        self.loaded_at = time.monotonic()
+
+
+def _generation_file():
+    return current_app.config['IDENTITY_GENERATION_FILE']
+
+
+def _read_generation():
+    try:
+        return os.stat(_generation_file()).st_mtime_ns
+    except (OSError, KeyError, RuntimeError):
+        return None
+
+
+def _check_generation():
+    """Clear the cache if another worker has invalidated an identity"""
+    global _cache_generation
+    generation = _read_generation()
+    if generation != _cache_generation:
+        with _identity_lock:
+            _identity_cache.clear()
+            _cache_generation = generation
+
+
+def invalidate_identity(sharpener_id, new_version=None):
+    """Drop a cached identity here and signal the other workers to drop theirs"""
+    global _cache_generation
+    with _identity_lock:
+        _identity_cache.pop(sharpener_id, None)
+        if new_version is not None:
+            _min_versions[sharpener_id] = max(new_version, _min_versions.get(sharpener_id, 0))
+
+    try:
+        path = _generation_file()
+    except (KeyError, RuntimeError):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a'):
+        os.utime(path, ns=(time.time_ns(), time.time_ns()))
+    # Our own cache is already up to date; don't clear it again on the next request
+    _cache_generation = _read_generation()
+
+
+def load_identity(sharpener_id):
+    """Return the SharpenerIdentity for an id, from cache or with one primary-key query"""
+    _check_generation()
+    ttl = current_app.config.get('IDENTITY_CACHE_TTL', 60)
+
+    identity = _identity_cache.get(sharpener_id)
+    if identity is not None and time.monotonic() - identity.loaded_at < ttl:
+        return identity
+
+    from models import db, Sharpener
+    sharpener = db.session.get(Sharpener, sharpener_id)
+    if sharpener is None:
+        with _identity_lock:
+            _identity_cache.pop(sharpener_id, None)
+        return None
+
+    identity = SharpenerIdentity(sharpener)
+    with _identity_lock:
+        if identity.account_version >= _min_versions.get(sharpener_id, 0):
+            _identity_cache[sharpener_id] = identity
+    return identity
+
+
+def current_sharpener():
+    """Identity of the logged-in sharpener for this request (loaded at most once), or None"""
+    if not has_request_context():
+        return None
+    if 'sharpener' not in g:
+        sharpener_id = session.get('sharpener_id')
+        g.sharpener = load_identity(sharpener_id) if sharpener_id else None
+    return g.sharpener
+
+
+def _reject_inactive():
+    """Log out a session whose account is gone or deactivated"""
+    from utils.i18n import t
+    session.pop('sharpener_id', None)
+    flash(t('account_inactive'))
+    return redirect(url_for('sharpener.login'))
+
+
+def _other_club(sharpener):
+    """A login only counts on the sharpener's own club's site"""
+    from services.clubs import current_club
+    return sharpener.club_id != current_club().id
+
 
 def login_required(f):
     """Decorator to require sharpener login"""
@@ -7,6 +124,11 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         if 'sharpener_id' not in session:
             return redirect(url_for('sharpener.login'))
+        sharpener = current_sharpener()
+        if not sharpener or not sharpener.is_active:
+            return _reject_inactive()
+        if _other_club(sharpener):
+            return redirect(url_for('sharpener.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -16,10 +138,51 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'sharpener_id' not in session:
             return redirect(url_for('sharpener.login'))
-        from models import Sharpener
-        sharpener = Sharpener.query.get(session['sharpener_id'])
-        if not sharpener or not sharpener.is_admin:
+        sharpener = current_sharpener()
+        if not sharpener or not sharpener.is_active:
+            return _reject_inactive()
+        if _other_club(sharpener):
+            return redirect(url_for('sharpener.login'))
+        if not sharpener.is_admin:
             flash('Admin access required')
             return redirect(url_for('sharpener.dashboard'))
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+
+def _bump_account_version(target, value, oldvalue, initiator):
+    """Attribute listener: changing is_active/is_admin bumps the account version"""
+    if target.id is None or value == oldvalue:
+        return value
+    target.account_version = (target.account_version or 1) + 1
+    from models import db
+    db.session.info.setdefault('identity_invalidations', {})[target.id] = target.account_version
+    return value
+
+
+def _invalidate_after_commit(session):
+    for sharpener_id, version in session.info.pop('identity_invalidations', {}).items():
+        invalidate_identity(sharpener_id, version)
+
+
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop('identity_invalidations', None)
+
+
+def init_identity(app):
+    """Wire account-version bumps to cache invalidation and expose the identity to templates"""
+    from models import db, Sharpener
+
+    app.config.setdefault('IDENTITY_CACHE_TTL', 60)
+    app.config.setdefault('IDENTITY_GENERATION_FILE', os.path.join(app.instance_path, 'identity_generation'))
+
+    for attribute in (Sharpener.is_active, Sharpener.is_admin):
+        if not event.contains(attribute, 'set', _bump_account_version):
+            event.listen(attribute, 'set', _bump_account_version, retval=True)
+    if not event.contains(db.session, 'after_commit', _invalidate_after_commit):
+        event.listen(db.session, 'after_commit', _invalidate_after_commit)
+        event.listen(db.session, 'after_soft_rollback', _discard_after_rollback)
+
+    @app.context_processor
+    def inject_current_sharpener():
+        return {'current_sharpener': current_sharpener()}
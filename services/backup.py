@@ -0,0 +1,234 @@
+"""
+Online backups of the SQLite database.
+
+Copying the live file (cp, shutil.copy2) can catch a write halfway, and in
+WAL mode misses whatever is still in the -wal file. SQLite's backup API
+copies through a connection instead.
+
+In rollback-journal mode a reader blocks writers, so the copy is made
+`pages` pages per step. Each step holds the read lock only while it copies,
+and `pause` between steps gives writers a window. A write by another
+connection restarts the backup at the next step, though; on a busy database
+that could go on forever, so after `max_restarts` restarts the rest is
+copied in a single step, blocking writers once for the length of the copy.
+
+In WAL mode readers never block writers, so the copy is made in one step
+(one read transaction), which also can't be restarted.
+
+The copy is written next to the other backups as a .partial file, switched
+to rollback-journal mode (so it is one self-contained file), checked with
+PRAGMA integrity_check, optionally gzipped and then renamed into place.
+Only then are backups beyond the newest `keep` deleted, so a failed run
+never costs an old backup.
+"""
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+BUSY_CODES = (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+# SQLite's sleep between retries when a step finds the database locked
+BUSY_SLEEP = 0.01
+TIMESTAMP_FORMAT = '%Y%m%d-%H%M%S'
+
+
+class BackupError(Exception):
+    """The backup failed or did not pass the integrity check"""
+
+
+class _Restarted(Exception):
+    """Raised from the progress callback to give up on stepping"""
+
+
+class BackupReport:
+    """What one backup run did"""
+
+    def __init__(self):
+        self.path = None
+        self.size = 0  # bytes on disk, after compression
+        self.journal_mode = None
+        self.pages = 0
+        self.steps = 0
+        self.restarts = 0
+        self.single_step = False  # copied in one step: WAL mode, or gave up stepping after max_restarts
+        self.duration = 0.0  # seconds, copy through integrity check and compression
+        self.lock_wait = 0.0  # seconds spent retrying steps that found the database locked
+        self.longest_step = 0.0  # seconds the backup held its read lock at most
+        self.deleted = []  # rotated out
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def sqlite_database_path(url):
+    """File name of an SQLAlchemy URL's SQLite database, or None if it isn't one"""
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    return url.database
+
+
+def backup_name(source_path, when):
+    """e.g. skate_tickets-20261019-031500.db"""
+    stem, ext = os.path.splitext(os.path.basename(source_path))
+    return f"{stem}-{when.strftime(TIMESTAMP_FORMAT)}{ext or '.db'}"
+
+
+def list_backups(source_path, directory):
+    """Backups of source_path in directory, oldest first"""
+    stem, ext = os.path.splitext(os.path.basename(source_path))
+    prefix, suffixes = f"{stem}-", (ext or '.db', (ext or '.db') + '.gz')
+    if not os.path.isdir(directory):
+        return []
+    names = []
+    for name in os.listdir(directory):
+        timestamp = name[len(prefix):].split('.', 1)[0]
+        if name.startswith(prefix) and name.endswith(suffixes) and len(timestamp) == 15:
+            try:
+                datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+            except ValueError:
+                continue
+            names.append(name)
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+
+def _copy(source_path, target_path, pages, pause, max_restarts, report):
+    """Run the backup API from source_path into target_path, filling in the report's timings"""
+    # timeout=0: no busy handler, so a locked step returns at once and counts as lock wait
+    source = sqlite3.connect(source_path, timeout=0)
+    target = sqlite3.connect(target_path)
+    # The last step commits the copy while still holding the source's read lock; don't fsync
+    # there (backup_database syncs the finished file before renaming it into place)
+    target.execute('PRAGMA synchronous = OFF')
+    state = {'last': time.perf_counter(), 'status': sqlite3.SQLITE_OK, 'remaining': None}
+
+    def progress(status, remaining, total):
+        # Time since the last callback: SQLite's sleep if the last step was busy, then this step
+        slept = BUSY_SLEEP if state['status'] in BUSY_CODES else 0
+        step = max(time.perf_counter() - state['last'] - slept, 0)
+        report.steps += 1
+        report.pages = total
+        report.lock_wait += slept
+        if status in BUSY_CODES:
+            report.lock_wait += step
+        else:
+            report.longest_step = max(report.longest_step, step)
+        if state['remaining'] is not None and remaining > state['remaining']:
+            report.restarts += 1
+            if report.restarts > max_restarts:
+                raise _Restarted()
+        state.update(status=status, remaining=remaining)
+        if remaining and pause and status not in BUSY_CODES:
+            # Let writers in between steps (SQLite itself only sleeps after a busy step)
+            time.sleep(pause)
+        state['last'] = time.perf_counter()
+
+    try:
+        report.journal_mode = source.execute('PRAGMA journal_mode').fetchone()[0].lower()
+        if report.journal_mode == 'wal':
+            pages = -1
+            report.single_step = True
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=BUSY_SLEEP)
+        except _Restarted:
+            report.single_step = True
+            started = time.perf_counter()
+            # Busy handler back on: wait for a writer rather than fail the run
+            source.execute('PRAGMA busy_timeout = 5000')
+            source.backup(target, pages=-1)
+            report.longest_step = max(report.longest_step, time.perf_counter() - started)
+        # A WAL-mode copy would need its -wal and -shm files next to it
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        source.close()
+        target.close()
+
+
+def _check_integrity(path):
+    connection = sqlite3.connect(path)
+    try:
+        rows = connection.execute('PRAGMA integrity_check').fetchall()
+    finally:
+        connection.close()
+    problems = [row[0] for row in rows if row[0] != 'ok']
+    if problems:
+        raise BackupError(f"Integrity check failed: {'; '.join(problems[:5])}")
+
+
+def _fsync(path):
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+def _gzip(path, target_path, level):
+    with open(path, 'rb') as source, gzip.open(target_path, 'wb', compresslevel=level) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
+
+def rotate_backups(source_path, directory, keep):
+    """Delete all but the newest `keep` backups; returns the deleted paths"""
+    backups = list_backups(source_path, directory)
+    deleted = backups[:-keep] if keep > 0 else []
+    for path in deleted:
+        os.remove(path)
+    return deleted
+
+
+def backup_database(source_path, directory, keep=14, compress=True, pages=256, pause=0.005,
+                    max_restarts=10, gzip_level=6, now=None):
+    """
+    Back up the SQLite database at source_path into directory.
+
+    Args:
+        keep: backups to keep, newest first (0 keeps all)
+        compress: gzip the backup
+        pages: pages copied per step in rollback-journal mode (-1 copies everything in one step)
+        pause: seconds to sleep between steps
+        max_restarts: restarts caused by concurrent writes before copying the rest in one step
+
+    Returns:
+        BackupReport
+
+    Raises:
+        BackupError: if the source is missing or the copy fails its integrity check
+    """
+    if not os.path.exists(source_path):
+        raise BackupError(f"No database at {source_path}")
+    os.makedirs(directory, exist_ok=True)
+    report = BackupReport()
+    name = backup_name(source_path, now or datetime.utcnow())
+    final_path = os.path.join(directory, name + ('.gz' if compress else ''))
+    partial = os.path.join(directory, name + '.partial')
+    started = time.perf_counter()
+    try:
+        _copy(source_path, partial, pages, pause, max_restarts, report)
+        _check_integrity(partial)
+        if compress:
+            _gzip(partial, final_path + '.partial', gzip_level)
+            _fsync(final_path + '.partial')
+            os.replace(final_path + '.partial', final_path)
+            os.remove(partial)
+        else:
+            _fsync(partial)
+            os.replace(partial, final_path)
+    except sqlite3.Error as e:
+        raise BackupError(f"Backup of {source_path} failed: {e}") from e
+    finally:
+        for leftover in (partial, final_path + '.partial'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    report.duration = time.perf_counter() - started
+    report.path = final_path
+    report.size = os.path.getsize(final_path)
+    report.deleted = rotate_backups(source_path, directory, keep)
+
+    logger.info("Database backed up to %s", final_path, extra={
+        'backup_seconds': round(report.duration, 3), 'lock_wait_seconds': round(report.lock_wait, 3),
+        'longest_step_ms': round(report.longest_step * 1000, 1), 'pages': report.pages,
+        'restarts': report.restarts, 'bytes': report.size,
+    })
+    return report
@@ -0,0 +1,211 @@
+"""
+Staffing planner: how many sharpeners to schedule for a season.
+
+fit_history() turns the ticket history into two distributions:
+
+- arrivals into the sharpening queue (paid_at) as a Poisson process whose
+  rate depends on weekday and hour, averaged over the days the rink had any
+  tickets on that weekday,
+- sharpening time (completed_at - started_at) as a lognormal, clamped like
+  the queue estimates (services/queue.py), or resampled as observed.
+
+simulate_season() then runs a season of a first-come-first-served queue with
+a fixed number of sharpeners. Sharpeners only start tickets during opening
+hours (the hours with arrivals on that weekday); tickets still waiting at
+closing time wait until the next opening. Sampling is vectorised with NumPy
+and the event loop is a heap of sharpener free times, so a season of tens of
+thousands of tickets runs in well under a second.
+
+Hours are UTC, as the timestamps are stored.
+"""
+import heapq
+from bisect import bisect_right
+from datetime import datetime
+from models import db, Ticket
+from services.queue import MIN_SERVICE_SECONDS, MAX_SERVICE_SECONDS
+
+try:
+    import numpy as np
+except ImportError:  # optional: only flask simulate-capacity needs it
+    np = None
+
+DAY = 86400
+HOUR = 3600
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+class CapacityError(Exception):
+    """Not enough history to fit the model"""
+
+
+class HistoryFit:
+    """Fitted arrival rates and sharpening-time distribution"""
+
+    def __init__(self, hourly_rates, service_seconds, observed_waits, first, last):
+        self.hourly_rates = hourly_rates  # (7, 24) tickets per hour, Monday first
+        self.service_seconds = service_seconds  # observed, clamped
+        self.log_mean = float(np.log(service_seconds).mean())
+        self.log_std = float(np.log(service_seconds).std())
+        self.observed_waits = observed_waits  # seconds from paid to started
+        self.first = first
+        self.last = last
+
+    @property
+    def tickets_per_day(self):
+        """Average arrivals per open day, over the week"""
+        daily = self.hourly_rates.sum(axis=1)
+        open_days = daily > 0
+        return float(daily[open_days].mean()) if open_days.any() else 0.0
+
+    @property
+    def busiest_hour(self):
+        """(weekday index, hour, tickets per hour) of the busiest hour"""
+        weekday, hour = np.unravel_index(self.hourly_rates.argmax(), self.hourly_rates.shape)
+        return int(weekday), int(hour), float(self.hourly_rates[weekday, hour])
+
+    def opening_hours(self):
+        """(7, 2) array of opening and closing second of day; closed days have open == close"""
+        hours = np.zeros((7, 2), dtype=np.int64)
+        for weekday in range(7):
+            open_hours = np.flatnonzero(self.hourly_rates[weekday])
+            if open_hours.size:
+                hours[weekday] = (open_hours[0] * HOUR, (open_hours[-1] + 1) * HOUR)
+        return hours
+
+
+def _to_seconds(values):
+    """Seconds since the epoch for a list of naive UTC datetimes"""
+    return np.array(values, dtype='datetime64[us]').astype(np.int64) / 1e6
+
+
+def fit_history(since=None, until=None, club_id=None):
+    """
+    Fit arrival rates and sharpening times from paid tickets (of one club, or all).
+
+    Raises:
+        CapacityError: if there are no paid tickets or no completed ones in the range
+    """
+    query = (db.session.query(Ticket.paid_at, Ticket.started_at, Ticket.completed_at)
+             .filter(Ticket.paid_at.isnot(None)))
+    if club_id is not None:
+        query = query.filter(Ticket.club_id == club_id)
+    if since is not None:
+        query = query.filter(Ticket.paid_at >= since)
+    if until is not None:
+        query = query.filter(Ticket.paid_at < until)
+
+    paid, started, completed = [], [], []
+    for paid_at, started_at, completed_at in query.yield_per(50000):
+        paid.append(paid_at)
+        if started_at is not None and completed_at is not None:
+            started.append((paid_at, started_at, completed_at))
+    if not paid:
+        raise CapacityError('No paid tickets in the selected period')
+    if not started:
+        raise CapacityError('No completed tickets to fit sharpening times from')
+
+    arrivals = _to_seconds(paid)
+    days = (arrivals // DAY).astype(np.int64)
+    # 1970-01-01 was a Thursday
+    weekdays = (days + 3) % 7
+    hours = ((arrivals % DAY) // HOUR).astype(np.int64)
+    counts = np.bincount(weekdays * 24 + hours, minlength=7 * 24).reshape(7, 24)
+    active_days = np.bincount((np.unique(days) + 3) % 7, minlength=7)
+    rates = counts / np.maximum(active_days, 1)[:, None]
+
+    paid_at, started_at, completed_at = (_to_seconds(column) for column in zip(*started))
+    service = np.clip(completed_at - started_at, MIN_SERVICE_SECONDS, MAX_SERVICE_SECONDS)
+    waits = np.maximum(started_at - paid_at, 0)
+    return HistoryFit(rates, service, waits, min(paid), max(paid))
+
+
+class SeasonResult:
+    """Waits and utilisation of one simulated season"""
+
+    def __init__(self, sharpeners, waits, busy_seconds, staffed_seconds):
+        self.sharpeners = sharpeners
+        self.waits = waits  # seconds, per ticket
+        self.utilisation = busy_seconds / (sharpeners * staffed_seconds) if staffed_seconds else 0.0
+
+
+def sample_arrivals(fit, days, rng, demand=1.0, start_weekday=0):
+    """Sorted arrival times (seconds from the season start) for `days` days"""
+    weekday_of_day = (np.arange(days) + start_weekday) % 7
+    rates = fit.hourly_rates[weekday_of_day] * demand  # (days, 24)
+    counts = rng.poisson(rates).ravel()
+    hour_starts = np.repeat(np.arange(days * 24, dtype=np.int64) * HOUR, counts)
+    return np.sort(hour_starts + rng.uniform(0, HOUR, hour_starts.size))
+
+
+def sample_service(fit, size, rng, empirical=False):
+    """Sharpening times in seconds"""
+    if empirical:
+        return rng.choice(fit.service_seconds, size)
+    samples = rng.lognormal(fit.log_mean, fit.log_std, size)
+    return np.clip(samples, MIN_SERVICE_SECONDS, MAX_SERVICE_SECONDS)
+
+
+def simulate_season(fit, sharpeners, days, rng, demand=1.0, empirical=False, start_weekday=0):
+    """
+    First-come-first-served queue with `sharpeners` working in parallel during
+    opening hours.
+
+    Returns:
+        SeasonResult
+    """
+    arrivals = sample_arrivals(fit, days, rng, demand, start_weekday)
+    service = sample_service(fit, arrivals.size, rng, empirical)
+
+    opening = fit.opening_hours()[(np.arange(days) + start_weekday) % 7]
+    day_starts = np.arange(days, dtype=np.int64) * DAY
+    opens = day_starts + opening[:, 0]
+    closes = day_starts + opening[:, 1]
+    staffed = closes > opens
+    opens, closes = opens[staffed].tolist(), closes[staffed].tolist()
+    staffed_seconds = float(sum(close - start for start, close in zip(opens, closes)))
+
+    def next_start(moment):
+        """Earliest time at or after `moment` when a sharpener may start a ticket"""
+        index = bisect_right(opens, moment) - 1
+        if index >= 0 and moment < closes[index]:
+            return moment
+        index += 1
+        return opens[index] if index < len(opens) else moment
+
+    free_at = [0.0] * sharpeners
+    waits = np.empty(arrivals.size)
+    for index, (arrival, duration) in enumerate(zip(arrivals.tolist(), service.tolist())):
+        start = next_start(max(arrival, free_at[0]))
+        waits[index] = start - arrival
+        heapq.heapreplace(free_at, start + duration)
+    return SeasonResult(sharpeners, waits, float(service.sum()), staffed_seconds)
+
+
+def plan_capacity(fit, staffing, days=182, runs=10, seed=42, demand=1.0, empirical=False,
+                  target_minutes=30):
+    """
+    Simulate `runs` seasons per staffing level.
+
+    Returns:
+        list of dicts (one per staffing level) with wait percentiles in minutes,
+        the share of tickets waiting longer than target_minutes and utilisation
+    """
+    rng = np.random.default_rng(seed)
+    start_weekday = datetime(fit.last.year, 10, 1).weekday()
+    report = []
+    for sharpeners in staffing:
+        results = [simulate_season(fit, sharpeners, days, rng, demand, empirical, start_weekday)
+                   for _ in range(runs)]
+        waits = np.concatenate([result.waits for result in results]) / 60
+        p50, p90, p95, p99 = np.percentile(waits, [50, 90, 95, 99]) if waits.size else (0.0,) * 4
+        report.append({
+            'sharpeners': sharpeners,
+            'tickets_per_season': waits.size / runs,
+            'wait_p50': float(p50),
+            'wait_p90': float(p90),
+            'wait_p95': float(p95),
+            'wait_p99': float(p99),
+            'over_target': float((waits > target_minutes).mean()) if waits.size else 0.0,
+            'utilisation': float(np.mean([result.utilisation for result in results])),
+        })
+    return report
@@ -0,0 +1,146 @@
+"""
+Clubs sharing one deployment.
+
+Tickets, sharpeners and invitations belong to a club, and each request is
+served for one club, taken from
+
+1. the path, /c/<slug>/... (CLUB_PATH_PREFIX): ClubPathMiddleware moves the
+   prefix into SCRIPT_NAME, so url_for() and redirects stay inside the club,
+2. the Host header, for clubs with a hostname,
+3. otherwise DEFAULT_CLUB (a slug), or the first club.
+
+The club is looked up on first use in a request (current_club()), so
+/metrics and static files don't need one. Clubs are cached per worker as
+ClubContext snapshots for CLUB_CACHE_TTL seconds; they only change through
+`flask clubs`.
+
+Each club has its own price (SHARPENING_PRICE_DKK when not set), ticket code
+space and queue statistics row (QueueStats.id is the club id). Queries for a
+club filter on club_id first, matching the indexes that lead with it.
+"""
+import os
+from flask import abort, current_app, g, has_request_context, request
+from models import db, Club
+from utils.cache import TTLCache
+
+# Club that existing tickets and sharpeners were moved into when clubs were added
+LEGACY_CLUB_ID = 1
+
+SLUG_ENVIRON_KEY = 'skate.club_slug'
+
+_clubs = TTLCache(ttl=60)
+
+
+def default_price():
+    return int(os.environ.get('SHARPENING_PRICE_DKK', '80'))
+
+
+class ClubContext:
+    """Immutable snapshot of a club, shared between requests"""
+    __slots__ = ('id', 'slug', 'name', 'hostname', 'price')
+
+    def __init__(self, club):
+        self.id = club.id
+        self.slug = club.slug
+        self.name = club.name
+        self.hostname = club.hostname
+        self.price = club.price if club.price is not None else default_price()
+
+
+def _lookup(kind, value=None):
+    """ClubContext by 'id', 'slug', 'host' or the 'default' club, or None"""
+    def load():
+        if kind == 'id':
+            club = db.session.get(Club, value)
+        elif kind == 'slug':
+            club = Club.query.filter_by(slug=value).first()
+        elif kind == 'host':
+            club = Club.query.filter_by(hostname=value).first()
+        else:
+            slug = current_app.config.get('DEFAULT_CLUB')
+            club = (Club.query.filter_by(slug=slug) if slug else Club.query.order_by(Club.id)).first()
+        return ClubContext(club) if club is not None else None
+    return _clubs.get_or_set((kind, value), load)
+
+
+def get_club(club_id):
+    """ClubContext of a ticket's or sharpener's club"""
+    return _lookup('id', club_id)
+
+
+def default_club():
+    """The club served when neither the path nor the host names one"""
+    return _lookup('default')
+
+
+def clear_club_cache():
+    _clubs.clear()
+
+
+def resolve_club():
+    """Club named by the request path or host, or the default club"""
+    slug = request.environ.get(SLUG_ENVIRON_KEY)
+    if slug is not None:
+        return _lookup('slug', slug)
+    host = request.host.partition(':')[0].lower()
+    return _lookup('host', host) or default_club()
+
+
+def current_club(required=True):
+    """
+    Club of this request, resolved at most once.
+
+    Aborts with 404 if there is no such club, unless required is False
+    (then None; also outside requests).
+    """
+    if not has_request_context():
+        return None
+    if 'club' not in g:
+        g.club = resolve_club()
+    if g.club is None and required:
+        abort(404)
+    return g.club
+
+
+def club_url(club, path=''):
+    """Absolute URL of a page on the club's site, for SMS and email links"""
+    base_url = current_app.config.get('BASE_URL', 'http://localhost:5000').rstrip('/')
+    if club.hostname:
+        scheme = base_url.partition('://')[0]
+        return f"{scheme}://{club.hostname}{path}"
+    default = default_club()
+    if default is not None and default.id == club.id:
+        return f"{base_url}{path}"
+    return f"{base_url}{current_app.config.get('CLUB_PATH_PREFIX', '/c')}/{club.slug}{path}"
+
+
+class ClubPathMiddleware:
+    """Serve /<prefix>/<slug>/... as that club's site"""
+
+    def __init__(self, app, prefix):
+        self.app = app
+        self.prefix = prefix.rstrip('/') + '/'
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path.startswith(self.prefix):
+            slug, _, rest = path[len(self.prefix):].partition('/')
+            if slug:
+                environ[SLUG_ENVIRON_KEY] = slug
+                environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + self.prefix + slug
+                environ['PATH_INFO'] = '/' + rest
+        return self.app(environ, start_response)
+
+
+def init_clubs(app):
+    """Path-based club URLs, the club cache TTL, and the club and its price in templates"""
+    app.config.setdefault('CLUB_PATH_PREFIX', '/c')
+    app.config.setdefault('CLUB_CACHE_TTL', 60)
+    _clubs.ttl = app.config['CLUB_CACHE_TTL']
+    if app.config['CLUB_PATH_PREFIX']:
+        app.wsgi_app = ClubPathMiddleware(app.wsgi_app, app.config['CLUB_PATH_PREFIX'])
+
+    @app.context_processor
+    def inject_club():
+        club = current_club(required=False)
+        return {'club': club, 'sharpening_price': club.price if club else default_price()}
@@ -0,0 +1,217 @@
+"""
+Dispatcher for paid tickets (DISPATCH_MODE).
+
+With the default 'manual' every sharpener picks from the ready list. In the
+other modes sharpeners mark themselves available on the dashboard and the
+dispatcher hands out the paid queue:
+
+- 'offer' reserves the next ticket for a sharpener, who accepts or skips it;
+  offers not answered within DISPATCH_OFFER_TIMEOUT seconds go to the next
+  available sharpener,
+- 'auto' claims the next ticket for the sharpener straight away.
+
+Nobody gets more than DISPATCH_MAX_PER_SHARPENER tickets at a time, counting
+both tickets in progress and open offers; the least loaded sharpener is
+served first.
+
+The queue is ordered by when the ticket was paid. A ticket that was skipped
+or whose offer timed out goes SKIP_DELAY later in the order, and isn't offered
+to the sharpener who skipped it again; once a ticket has waited
+DISPATCH_URGENT_MINUTES it goes ahead of all others and to anyone.
+
+Each club's queue is dispatched to its own sharpeners. There is no
+background process: dispatch() runs for the club after each transition that
+frees a sharpener or adds a ticket, and on every dashboard load, which is also
+when timed-out offers are taken back. Reservations are conditional UPDATEs,
+so concurrent workers can't hand out the same ticket twice.
+"""
+import heapq
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from models import db, Ticket, Sharpener
+from services import queue
+from utils.metrics import DISPATCH_EVENTS, TICKET_WAIT, TICKETS_SHARPENED
+
+DISPATCH_MODES = ('manual', 'offer', 'auto')
+
+# How far back in the order a skipped or timed-out ticket goes, per miss
+SKIP_DELAY = timedelta(minutes=5)
+
+
+def dispatch_mode():
+    return current_app.config.get('DISPATCH_MODE', 'manual')
+
+
+def dispatch_enabled():
+    return dispatch_mode() != 'manual'
+
+
+def priority(ticket, now):
+    """Sort key of a paid ticket, smallest first"""
+    paid_at = ticket.paid_at or ticket.created_at or now
+    if now - paid_at >= timedelta(minutes=current_app.config.get('DISPATCH_URGENT_MINUTES', 30)):
+        return (0, paid_at, ticket.id)
+    return (1, paid_at + SKIP_DELAY * (ticket.offer_misses or 0), ticket.id)
+
+
+def is_urgent(ticket, now=None):
+    return priority(ticket, now or datetime.utcnow())[0] == 0
+
+
+def record_start(ticket, now):
+    """Observe the wait of a ticket that was just claimed"""
+    paid_at = ticket.paid_at or ticket.created_at
+    if paid_at is not None:
+        TICKET_WAIT.labels(dispatch_mode()).observe(max((now - paid_at).total_seconds(), 0))
+
+
+def record_completion():
+    TICKETS_SHARPENED.labels(dispatch_mode()).inc()
+
+
+def claim(ticket, sharpener_id, now=None):
+    """
+    Move a paid ticket to in progress for the sharpener, unless someone else
+    got it first or it is offered to another sharpener.
+
+    Returns:
+        bool: whether the ticket was claimed (not committed)
+    """
+    now = now or datetime.utcnow()
+    claimed = Ticket.query.filter(
+        Ticket.id == ticket.id,
+        Ticket.status == 'paid',
+        db.or_(Ticket.assigned_to_id.is_(None), Ticket.assigned_to_id == sharpener_id),
+    ).update({
+        Ticket.status: 'in_progress',
+        Ticket.started_at: now,
+        Ticket.sharpened_by_id: sharpener_id,
+        Ticket.assigned_to_id: None,
+        Ticket.assigned_at: None,
+    }, synchronize_session=False)
+    if not claimed:
+        return False
+    db.session.refresh(ticket)
+    queue.ticket_started(ticket, sharpener_id)
+    record_start(ticket, now)
+    return True
+
+
+def release(ticket, skipped_by_id=None):
+    """Take back an offer (not committed); a skip or timeout moves the ticket down the order"""
+    ticket.assigned_to_id = None
+    ticket.assigned_at = None
+    ticket.offer_misses = (ticket.offer_misses or 0) + 1
+    if skipped_by_id is not None:
+        ticket.skipped_by_id = skipped_by_id
+
+
+def release_all(sharpener_id):
+    """Take back the open offers of a sharpener going off duty (not committed)"""
+    for ticket in Ticket.query.filter(Ticket.status == 'paid', Ticket.assigned_to_id == sharpener_id):
+        ticket.assigned_to_id = None
+        ticket.assigned_at = None
+
+
+def expire_offers(club_id, now):
+    """Take back the club's offers older than DISPATCH_OFFER_TIMEOUT (not committed)"""
+    cutoff = now - timedelta(seconds=current_app.config.get('DISPATCH_OFFER_TIMEOUT', 120))
+    expired = Ticket.query.filter(Ticket.club_id == club_id, Ticket.status == 'paid',
+                                  Ticket.assigned_to_id.isnot(None), Ticket.assigned_at < cutoff).all()
+    for ticket in expired:
+        release(ticket)
+        DISPATCH_EVENTS.labels('expired').inc()
+    return len(expired)
+
+
+def sharpener_loads(club_id):
+    """{sharpener id: tickets in progress or offered} for the club's available sharpeners"""
+    available = [sharpener_id for (sharpener_id,) in db.session.query(Sharpener.id).filter(
+        Sharpener.club_id == club_id, Sharpener.available_since.isnot(None), Sharpener.is_active.isnot(False)
+    ).order_by(Sharpener.available_since)]
+    loads = dict.fromkeys(available, 0)
+    if not loads:
+        return loads
+    busy = db.session.query(func.coalesce(Ticket.assigned_to_id, Ticket.sharpened_by_id), func.count(Ticket.id)).filter(
+        db.or_(Ticket.status == 'in_progress', db.and_(Ticket.status == 'paid', Ticket.assigned_to_id.isnot(None))),
+        func.coalesce(Ticket.assigned_to_id, Ticket.sharpened_by_id).in_(available),
+    ).group_by(func.coalesce(Ticket.assigned_to_id, Ticket.sharpened_by_id))
+    for sharpener_id, count in busy:
+        loads[sharpener_id] = count
+    return loads
+
+
+def dispatch(club_id, now=None):
+    """
+    Take back the club's timed-out offers and hand out its waiting tickets to
+    its available sharpeners. Commits if anything changed.
+
+    Returns:
+        int: tickets offered or assigned
+    """
+    mode = dispatch_mode()
+    if mode == 'manual':
+        return 0
+    now = now or datetime.utcnow()
+    changed = expire_offers(club_id, now)
+
+    limit = current_app.config.get('DISPATCH_MAX_PER_SHARPENER', 1)
+    loads = sharpener_loads(club_id)
+    # (load, order of becoming available) -> least loaded, longest waiting sharpener first
+    free = [(load, order, sharpener_id) for order, (sharpener_id, load) in enumerate(loads.items())
+            if load < limit]
+    heapq.heapify(free)
+
+    handed_out = 0
+    if free:
+        waiting = Ticket.query.filter(Ticket.club_id == club_id, Ticket.status == 'paid',
+                                      Ticket.assigned_to_id.is_(None)).all()
+        tickets = [(priority(ticket, now), ticket) for ticket in waiting]
+        heapq.heapify(tickets)
+        while free and tickets:
+            load, order, sharpener_id = heapq.heappop(free)
+            # The first ticket this sharpener didn't skip (urgent ones go to anyone)
+            passed_over = []
+            while tickets:
+                key, ticket = heapq.heappop(tickets)
+                if ticket.skipped_by_id != sharpener_id or key[0] == 0:
+                    break
+                passed_over.append((key, ticket))
+            else:
+                ticket = None
+            for entry in passed_over:
+                heapq.heappush(tickets, entry)
+            if ticket is None:
+                continue
+            if _hand_out(ticket, sharpener_id, mode, now):
+                handed_out += 1
+                load += 1
+            if load < limit:
+                heapq.heappush(free, (load, order, sharpener_id))
+
+    if changed or handed_out:
+        db.session.commit()
+    return handed_out
+
+
+def _hand_out(ticket, sharpener_id, mode, now):
+    """Offer or assign one ticket (not committed)"""
+    if mode == 'auto':
+        if claim(ticket, sharpener_id, now):
+            DISPATCH_EVENTS.labels('assigned').inc()
+            return True
+        return False
+    reserved = Ticket.query.filter(
+        Ticket.id == ticket.id, Ticket.status == 'paid', Ticket.assigned_to_id.is_(None)
+    ).update({Ticket.assigned_to_id: sharpener_id, Ticket.assigned_at: now}, synchronize_session=False)
+    if reserved:
+        DISPATCH_EVENTS.labels('offered').inc()
+    return bool(reserved)
+
+
+def init_dispatch(app):
+    """Check DISPATCH_MODE at startup rather than on the first paid ticket"""
+    mode = app.config.get('DISPATCH_MODE', 'manual')
+    if mode not in DISPATCH_MODES:
+        raise ValueError(f"DISPATCH_MODE must be one of {', '.join(DISPATCH_MODES)}, not {mode!r}")
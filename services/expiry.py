@@ -0,0 +1,221 @@
+"""
+Expiry of stale unpaid tickets.
+
+Run periodically by `flask expire-tickets`. Each pass:
+
+1. sends an optional payment reminder SMS to tickets that have been unpaid
+   for a while,
+2. moves tickets unpaid for longer than the TTL to 'expired' and cancels
+   their open Stripe PaymentIntents,
+3. releases the ticket codes of tickets that expired long ago, so the
+   limited LL-NNN code space doesn't fill up with abandoned tickets.
+
+All three go through the clubs one at a time, so every batch query is served
+by an index that leads with club_id. They work in small batches, each
+committed on its own, and stop when the time budget is spent, so a run never
+holds the database (SQLite has a single writer) long enough to stall live
+requests. Whatever is left over is picked up by the next run.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app, g
+from models import db, Club, Ticket
+from services.clubs import club_url, get_club
+from services.payment import cancel_payment_intents, is_simulated_payment_id
+from services.sms import send_sms, render_sms_template
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = os.environ.get('BASE_URL', 'http://localhost:5000')
+
+# Released codes are replaced with '#<id>', which generate_ticket_code never produces
+RELEASED_CODE_PREFIX = '#'
+
+
+class ExpiryReport:
+    """What one expiry run did"""
+
+    def __init__(self):
+        self.reminded = 0
+        self.expired = 0
+        self.intents_cancelled = 0
+        self.intents_not_cancelled = 0
+        self.codes_released = 0
+        self.out_of_time = False
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class _Budget:
+    """Wall-clock budget shared by the steps of one run"""
+
+    def __init__(self, max_seconds, pause):
+        self.deadline = time.monotonic() + max_seconds
+        self.pause = pause
+
+    def exhausted(self):
+        return time.monotonic() >= self.deadline
+
+    def yield_to_traffic(self):
+        # Give request handlers waiting on the write lock a turn between batches
+        if self.pause:
+            time.sleep(self.pause)
+
+
+def _unpaid_batch(club_id, batch_size, *criteria):
+    """A club's oldest unpaid tickets matching criteria (served by ix_ticket_club_status_created_at)"""
+    return (Ticket.query
+            .filter(Ticket.club_id == club_id, Ticket.status == 'unpaid', *criteria)
+            .order_by(Ticket.created_at, Ticket.id)
+            .limit(batch_size)
+            .all())
+
+
+def send_payment_reminders(club_id, remind_before, expire_before, now, batch_size, budget, report, language):
+    """Remind customers of tickets created before remind_before (but not yet due to expire)"""
+    club = get_club(club_id)
+    while not budget.exhausted():
+        candidates = _unpaid_batch(club_id, batch_size,
+                                   Ticket.created_at < remind_before,
+                                   Ticket.created_at >= expire_before,
+                                   Ticket.reminder_sent_at.is_(None))
+        if not candidates:
+            return
+
+        # Claim the batch first so overlapping runs can't text anyone twice
+        ids = [ticket.id for ticket in candidates]
+        Ticket.query.filter(
+            Ticket.id.in_(ids), Ticket.status == 'unpaid', Ticket.reminder_sent_at.is_(None)
+        ).update({Ticket.reminder_sent_at: now}, synchronize_session=False)
+        db.session.commit()
+        claimed = Ticket.query.filter(Ticket.id.in_(ids), Ticket.reminder_sent_at == now).all()
+
+        # SMS templates pick their language from the request
+        with current_app.test_request_context(base_url=BASE_URL):
+            g.language = language
+            for ticket in claimed:
+                if ticket.price > 0:
+                    message = render_sms_template('payment_reminder', ticket=ticket,
+                                                  payment_url=club_url(club, f"/pay/{ticket.code}"))
+                else:
+                    message = render_sms_template('payment_reminder', ticket=ticket,
+                                                  confirm_url=club_url(club, f"/confirm/{ticket.code}"))
+                if send_sms(ticket.customer_phone, message):
+                    report.reminded += 1
+                else:
+                    logger.warning("Payment reminder SMS failed", extra={'ticket_code': ticket.code})
+
+        if len(candidates) < batch_size:
+            return
+        budget.yield_to_traffic()
+
+    report.out_of_time = True
+
+
+def expire_unpaid_tickets(club_id, expire_before, now, batch_size, budget, report, executor):
+    """Expire tickets created before expire_before and cancel their PaymentIntents"""
+    while not budget.exhausted():
+        candidates = _unpaid_batch(club_id, batch_size, Ticket.created_at < expire_before)
+        if not candidates:
+            return
+
+        # Conditional update: a ticket paid since the SELECT stays paid
+        ids = [ticket.id for ticket in candidates]
+        Ticket.query.filter(Ticket.id.in_(ids), Ticket.status == 'unpaid').update(
+            {Ticket.status: 'expired', Ticket.expired_at: now}, synchronize_session=False
+        )
+        db.session.commit()
+        expired = (db.session.query(Ticket.code, Ticket.payment_id)
+                   .filter(Ticket.id.in_(ids), Ticket.status == 'expired', Ticket.expired_at == now)
+                   .all())
+        report.expired += len(expired)
+        logger.info("Expired %d unpaid tickets", len(expired),
+                    extra={'ticket_codes': [code for code, _ in expired]})
+
+        # Stripe calls happen after the commit, outside any transaction. An intent
+        # that succeeded in the meantime refuses to cancel; its webhook revives the ticket.
+        payment_ids = [payment_id for _, payment_id in expired
+                       if payment_id and not is_simulated_payment_id(payment_id)]
+        for cancelled in cancel_payment_intents(payment_ids, executor=executor).values():
+            if cancelled:
+                report.intents_cancelled += 1
+            else:
+                report.intents_not_cancelled += 1
+
+        if len(candidates) < batch_size:
+            return
+        budget.yield_to_traffic()
+
+    report.out_of_time = True
+
+
+def release_expired_codes(club_id, expired_before, batch_size, budget, report):
+    """Free the ticket codes of tickets that expired before expired_before"""
+    while not budget.exhausted():
+        tickets = (Ticket.query
+                   .filter(Ticket.club_id == club_id,
+                           Ticket.status == 'expired',
+                           Ticket.expired_at < expired_before,
+                           ~Ticket.code.startswith(RELEASED_CODE_PREFIX))
+                   .limit(batch_size)
+                   .all())
+        if not tickets:
+            return
+
+        for ticket in tickets:
+            logger.info("Releasing ticket code of expired ticket %d", ticket.id, extra={'ticket_code': ticket.code})
+            ticket.code = f"{RELEASED_CODE_PREFIX}{ticket.id}"
+        db.session.commit()
+        report.codes_released += len(tickets)
+
+        if len(tickets) < batch_size:
+            return
+        budget.yield_to_traffic()
+
+    report.out_of_time = True
+
+
+def run_expiry(ttl_hours, reminder_hours=None, release_codes_after_days=30, batch_size=100,
+               max_seconds=30, pause=0.05, cancel_concurrency=4, language='da', now=None):
+    """
+    One expiry pass.
+
+    Args:
+        ttl_hours: unpaid tickets older than this are expired
+        reminder_hours: remind unpaid tickets older than this (None disables reminders)
+        release_codes_after_days: free codes of tickets expired this long ago (None disables)
+        batch_size: tickets per transaction
+        max_seconds: stop starting new batches after this long
+        pause: seconds to sleep between batches
+        cancel_concurrency: parallel PaymentIntent cancellations
+        language: language of the reminder SMS ('da' or 'en')
+
+    Returns:
+        ExpiryReport
+    """
+    now = now or datetime.utcnow()
+    report = ExpiryReport()
+    budget = _Budget(max_seconds, pause)
+    expire_before = now - timedelta(hours=ttl_hours)
+    club_ids = [club_id for (club_id,) in db.session.query(Club.id).order_by(Club.id)]
+
+    if reminder_hours is not None and reminder_hours < ttl_hours:
+        for club_id in club_ids:
+            send_payment_reminders(club_id, now - timedelta(hours=reminder_hours), expire_before, now,
+                                   batch_size, budget, report, language)
+
+    # One executor for the whole run, so its threads keep their Stripe connections
+    with ThreadPoolExecutor(max_workers=max(cancel_concurrency, 1)) as executor:
+        for club_id in club_ids:
+            expire_unpaid_tickets(club_id, expire_before, now, batch_size, budget, report, executor)
+
+    if release_codes_after_days is not None:
+        for club_id in club_ids:
+            release_expired_codes(club_id, now - timedelta(days=release_codes_after_days),
+                                  batch_size, budget, report)
+
+    return report
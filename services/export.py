@@ -0,0 +1,202 @@
+"""
+Season exports of tickets and feedback, as CSV or NDJSON.
+
+Rows are streamed, never collected: the query runs with yield_per (a
+server-side cursor on PostgreSQL; SQLite hands rows over as it steps), rows
+are selected as plain columns so nothing lands in the session's identity map,
+and the encoded lines are yielded in chunks of about CHUNK_SIZE bytes,
+optionally through an incremental gzip compressor. Memory stays flat however
+many rows match; benchmarks/export.py checks that.
+
+Tickets are filtered on created_at and status, feedback on its own
+created_at. `since` is inclusive and `until` exclusive.
+
+CSV files get opened in spreadsheets, and names and comments come from
+customers: a text cell starting with a formula character is prefixed with
+a quote so it is shown rather than evaluated. NDJSON is left as is.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from models import db, Club, Ticket, Sharpener, Feedback
+
+EXPORT_KINDS = ('tickets', 'feedback')
+EXPORT_FORMATS = ('csv', 'ndjson')
+TICKET_STATUSES = ('unpaid', 'paid', 'in_progress', 'completed', 'cancelled', 'expired')
+
+BATCH_SIZE = 2000
+# Bytes of encoded rows per yielded chunk
+CHUNK_SIZE = 64 * 1024
+
+MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+# Leading characters that make a spreadsheet read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class ExportError(Exception):
+    """Invalid export filters"""
+
+
+def _ticket_query(club_id, since, until, statuses):
+    sharpened_by = aliased(Sharpener)
+    query = (
+        select(Club.slug.label('club'), Ticket.id, Ticket.code, Ticket.status, Ticket.price, Ticket.payment_id,
+               Ticket.customer_name, Ticket.brand, Ticket.color, Ticket.size,
+               Ticket.created_at, Ticket.paid_at, Ticket.started_at, Ticket.completed_at,
+               Ticket.cancelled_at, Ticket.expired_at,
+               sharpened_by.name.label('sharpened_by'), Feedback.rating)
+        .join(Club, Club.id == Ticket.club_id)
+        .outerjoin(sharpened_by, sharpened_by.id == Ticket.sharpened_by_id)
+        .outerjoin(Feedback, Feedback.ticket_id == Ticket.id)
+        .order_by(Ticket.id)
+    )
+    if club_id is not None:
+        query = query.where(Ticket.club_id == club_id)
+    if since is not None:
+        query = query.where(Ticket.created_at >= since)
+    if until is not None:
+        query = query.where(Ticket.created_at < until)
+    if statuses:
+        query = query.where(Ticket.status.in_(statuses))
+    return query
+
+
+def _feedback_query(club_id, since, until, statuses):
+    if statuses:
+        raise ExportError('The status filter only applies to ticket exports')
+    sharpened_by = aliased(Sharpener)
+    query = (
+        select(Club.slug.label('club'), Feedback.id, Ticket.code.label('ticket_code'), Feedback.rating,
+               Feedback.comment, Feedback.created_at, sharpened_by.name.label('sharpened_by'))
+        .join(Ticket, Ticket.id == Feedback.ticket_id)
+        .join(Club, Club.id == Ticket.club_id)
+        .outerjoin(sharpened_by, sharpened_by.id == Ticket.sharpened_by_id)
+        .order_by(Feedback.id)
+    )
+    if club_id is not None:
+        query = query.where(Ticket.club_id == club_id)
+    if since is not None:
+        query = query.where(Feedback.created_at >= since)
+    if until is not None:
+        query = query.where(Feedback.created_at < until)
+    return query
+
+
+QUERIES = {'tickets': _ticket_query, 'feedback': _feedback_query}
+
+
+def export_query(kind, club_id=None, since=None, until=None, statuses=()):
+    """
+    SELECT for an export of one club (or all clubs when club_id is None).
+
+    Raises:
+        ExportError: on an unknown kind or status, or an empty date range
+    """
+    if kind not in QUERIES:
+        raise ExportError(f"Unknown export {kind!r}, expected one of {', '.join(EXPORT_KINDS)}")
+    unknown = set(statuses) - set(TICKET_STATUSES)
+    if unknown:
+        raise ExportError(f"Unknown status {', '.join(sorted(unknown))}, "
+                          f"expected some of {', '.join(TICKET_STATUSES)}")
+    if since is not None and until is not None and until <= since:
+        raise ExportError('The end date must be after the start date')
+    return QUERIES[kind](club_id, since, until, tuple(statuses))
+
+
+def stream_rows(query, batch_size=BATCH_SIZE):
+    """Yield the column names, then each row as a tuple, batch_size rows at a time"""
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    yield tuple(result.keys())
+    for partition in result.partitions():
+        yield from partition
+
+
+class _Echo:
+    """File-like object that hands back what csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def encode_csv(rows):
+    """CSV lines, header first"""
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def encode_ndjson(rows):
+    """One JSON object per line, keyed by the column names"""
+    rows = iter(rows)
+    columns = next(rows)
+    for row in rows:
+        yield json.dumps(dict(zip(columns, map(_json_value, row))), ensure_ascii=False) + '\n'
+
+
+ENCODERS = {'csv': encode_csv, 'ndjson': encode_ndjson}
+
+
+def chunked(lines, chunk_size=CHUNK_SIZE):
+    """Join lines into UTF-8 chunks of about chunk_size bytes"""
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def gzipped(chunks, level=6):
+    """Compress a stream of byte chunks into one gzip member, incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(kind, fmt, club_id=None, since=None, until=None, statuses=(), gzip=False,
+                  batch_size=BATCH_SIZE):
+    """
+    Byte chunks of an export. The query is validated up front, so ExportError is
+    raised here rather than halfway through a streamed response.
+    """
+    if fmt not in ENCODERS:
+        raise ExportError(f"Unknown format {fmt!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+    query = export_query(kind, club_id, since, until, statuses)
+
+    def generate():
+        chunks = chunked(ENCODERS[fmt](stream_rows(query, batch_size)))
+        yield from gzipped(chunks) if gzip else chunks
+    return generate()
+
+
+def export_filename(kind, fmt, club_slug=None, since=None, until=None, gzip=False):
+    """e.g. tickets-north-2025-10-01-2026-04-01.csv.gz"""
+    parts = [kind]
+    if club_slug:
+        parts.append(club_slug)
+    if since is not None or until is not None:
+        parts.append(f"{since:%Y-%m-%d}" if since else 'start')
+        parts.append(f"{until:%Y-%m-%d}" if until else 'now')
+    return '-'.join(parts) + f".{fmt}" + ('.gz' if gzip else '')
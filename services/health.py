@@ -0,0 +1,115 @@
+"""
+Liveness and readiness for container probes.
+
+/healthz answers as long as the worker can serve a request at all; it does
+no I/O, so a slow database never gets a healthy container restarted.
+
+/readyz checks what this instance needs to serve customers, and reports on
+the work around it:
+
+    database    SELECT 1 (fails readiness)
+    log_writer  the background log thread is alive and keeping up
+    expiry      how far `flask expire-tickets` is behind: the age of the
+                oldest unpaid ticket past UNPAID_TICKET_TTL_HOURS; 'skipped'
+                unless READY_CHECK_EXPIRY says the job runs
+    providers   calls to Stripe, GatewayAPI, SMTP and reCAPTCHA that failed
+                in this worker over the last few minutes
+
+Only a failing check makes the instance not ready (503); the others report
+'degraded' with a 200, since taking the web container out of rotation would
+not fix a stopped sidecar or a provider outage. The result is cached per
+worker for READY_CACHE_TTL seconds (default 5), so probes from several
+sources cost one round of checks.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, Club, Ticket
+from utils.cache import TTLCache
+from utils.log import log_writer_status
+from utils.metrics import recent_outbound
+
+logger = logging.getLogger(__name__)
+
+# Log records waiting for the writer thread before it counts as falling behind
+LOG_BACKLOG_LIMIT = 10000
+# Provider calls: window, and how many of them must fail (at least half) to report it
+PROVIDER_WINDOW_SECONDS = 300
+PROVIDER_MIN_CALLS = 5
+
+_readiness = TTLCache(ttl=5, max_entries=1)
+
+
+def check_database():
+    started = time.perf_counter()
+    try:
+        db.session.execute(db.text('SELECT 1'))
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Readiness: database unreachable: %s", e)
+        # The class only: the message can name hosts and users, and /readyz is public
+        return {'status': 'fail', 'error': type(e).__name__}
+    return {'status': 'ok', 'ms': round((time.perf_counter() - started) * 1000, 1)}
+
+
+def check_log_writer():
+    alive, backlog = log_writer_status()
+    status = 'ok' if alive and backlog < LOG_BACKLOG_LIMIT else 'degraded'
+    return {'status': status, 'alive': alive, 'backlog': backlog}
+
+
+def check_expiry(now=None):
+    """Seconds the oldest unpaid ticket is past its expiry, over all clubs"""
+    ttl_hours = current_app.config.get('UNPAID_TICKET_TTL_HOURS', 48)
+    max_lag = current_app.config.get('READY_EXPIRY_LAG_SECONDS', 3600)
+    expire_before = (now or datetime.utcnow()) - timedelta(hours=ttl_hours)
+    oldest = None
+    # One index seek per club on ix_ticket_club_status_created_at
+    for club_id in db.session.scalars(db.select(Club.id)):
+        created_at = db.session.scalar(
+            db.select(db.func.min(Ticket.created_at))
+            .where(Ticket.club_id == club_id, Ticket.status == 'unpaid'))
+        if created_at is not None and (oldest is None or created_at < oldest):
+            oldest = created_at
+    lag = max((expire_before - oldest).total_seconds(), 0) if oldest else 0
+    return {'status': 'ok' if lag <= max_lag else 'degraded', 'lag_seconds': round(lag)}
+
+
+def check_providers():
+    providers = {}
+    for provider, (calls, errors) in sorted(recent_outbound(PROVIDER_WINDOW_SECONDS).items()):
+        failing = calls >= PROVIDER_MIN_CALLS and errors * 2 >= calls
+        providers[provider] = {'status': 'degraded' if failing else 'ok', 'calls': calls, 'errors': errors}
+    return providers
+
+
+def readiness():
+    """Run the checks; {'status': 'ok' | 'degraded' | 'fail', 'checks': {...}}"""
+    checks = {'database': check_database()}
+    if not current_app.config.get('READY_CHECK_EXPIRY'):
+        # Without the job unpaid tickets are never expired, and the lag only grows
+        checks['expiry'] = {'status': 'skipped', 'reason': 'READY_CHECK_EXPIRY is off'}
+    elif checks['database']['status'] == 'ok':
+        checks['expiry'] = check_expiry()
+    checks['log_writer'] = check_log_writer()
+    checks['providers'] = check_providers()
+
+    statuses = [check['status'] for name, check in checks.items() if name != 'providers']
+    statuses += [check['status'] for check in checks['providers'].values()]
+    status = 'fail' if 'fail' in statuses else 'degraded' if 'degraded' in statuses else 'ok'
+    return {'status': status, 'checked_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'checks': checks}
+
+
+def cached_readiness():
+    """readiness(), at most once per READY_CACHE_TTL seconds per worker"""
+    return _readiness.get_or_set('readiness', readiness)
+
+
+def init_health(app):
+    app.config.setdefault('READY_CACHE_TTL', 5)
+    app.config.setdefault('READY_EXPIRY_LAG_SECONDS', 3600)
+    app.config.setdefault('READY_CHECK_EXPIRY', False)
+    app.config.setdefault('UNPAID_TICKET_TTL_HOURS', 48)
+    _readiness.ttl = app.config['READY_CACHE_TTL']
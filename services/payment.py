@@ -1,43 +1,135 @@
 import os
+import logging
+from datetime import datetime
 import stripe
+from models import db, Ticket
+from services.sms import send_sms, render_sms_template
+from services.queue import ticket_enqueued, queue_estimate
+from services.dispatch import dispatch
+from utils.metrics import observe_outbound
+from utils.notifications import notify_sharpeners_new_ticket
+
+logger = logging.getLogger(__name__)
 
 # Configuration
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', 'your-stripe-secret-key')
 
+def stripe_configured():
+    """False in simulation mode (no real Stripe secret key)"""
+    return bool(STRIPE_SECRET_KEY) and STRIPE_SECRET_KEY != 'your-stripe-secret-key'
+
 def create_stripe_payment_intent(amount, ticket):
     """Create Stripe payment intent for MobilePay"""
-    if not STRIPE_SECRET_KEY or STRIPE_SECRET_KEY == 'your-stripe-secret-key':
+    if not stripe_configured():
         # Simulation mode
-        print(f"[Stripe] Simulation mode - creating fake payment intent for ticket {ticket.code}")
+        logger.info("Simulation mode - creating fake payment intent", extra={'ticket_code': ticket.code})
         return f"pi_simulation_{ticket.code}"
 
     try:
         # Create real Stripe payment intent
-        print(f"[Stripe] Creating payment intent for ticket {ticket.code}, amount: {amount} DKK")
+        logger.info("Creating payment intent for %s DKK", amount, extra={'ticket_code': ticket.code})
 
         # Convert DKK to øre (smallest currency unit)
         amount_in_ore = int(amount * 100)
 
-        payment_intent = stripe.PaymentIntent.create(
-            amount=amount_in_ore,
-            currency='dkk',
-            payment_method_types=['mobilepay'],
-            payment_method_data={
-                'type': 'mobilepay'
-            },
-            metadata={
-                'ticket_code': ticket.code,
-                'customer_name': ticket.customer_name,
-                'customer_phone': ticket.customer_phone,
-                'skate_details': f"{ticket.brand} {ticket.color} {ticket.size}"
-            },
-            description=f"Skate sharpening - Ticket {ticket.code}"
-        )
-
-        print(f"[Stripe] Payment intent created: {payment_intent.id}")
+        with observe_outbound('stripe', 'payment_intent.create'):
+            payment_intent = stripe.PaymentIntent.create(
+                amount=amount_in_ore,
+                currency='dkk',
+                payment_method_types=['mobilepay'],
+                payment_method_data={
+                    'type': 'mobilepay'
+                },
+                metadata={
+                    'ticket_code': ticket.code,
+                    'club_id': ticket.club_id,
+                    'customer_name': ticket.customer_name,
+                    'customer_phone': ticket.customer_phone,
+                    'skate_details': f"{ticket.brand} {ticket.color} {ticket.size}"
+                },
+                description=f"Skate sharpening - Ticket {ticket.code}"
+            )
+
+        logger.info("Payment intent created: %s", payment_intent.id, extra={'ticket_code': ticket.code})
         return payment_intent.id
 
     except Exception as e:
-        print(f"[Stripe] Error creating payment intent: {e}")
+        logger.exception("Error creating payment intent", extra={'ticket_code': ticket.code})
         # Fallback to simulation mode on error
-        return f"pi_simulation_{ticket.code}"
\ No newline at end of file
+        return f"pi_simulation_{ticket.code}"
+
+def is_simulated_payment_id(payment_id):
+    """True for the fake ids handed out in simulation mode"""
+    return payment_id.startswith('pi_simulation_')
+
+def cancel_payment_intent(payment_id, reason='abandoned'):
+    """
+    Cancel an open PaymentIntent.
+
+    Returns True if it was cancelled (or never existed in Stripe), False if
+    Stripe refused, e.g. because it has already succeeded or been cancelled.
+    """
+    if is_simulated_payment_id(payment_id):
+        return True
+
+    try:
+        with observe_outbound('stripe', 'payment_intent.cancel'):
+            stripe.PaymentIntent.cancel(payment_id, cancellation_reason=reason)
+        logger.info("Payment intent %s cancelled (%s)", payment_id, reason)
+        return True
+    except stripe.error.InvalidRequestError as e:
+        logger.info("Payment intent %s not cancelled: %s", payment_id, e.user_message or e)
+        return False
+    except Exception:
+        logger.exception("Error cancelling payment intent %s", payment_id)
+        return False
+
+def cancel_payment_intents(payment_ids, reason='abandoned', executor=None):
+    """
+    Cancel several PaymentIntents.
+
+    Pass a ThreadPoolExecutor to cancel concurrently; reuse the same executor
+    across batches so each of its threads keeps its keep-alive connection to
+    Stripe (the RequestsClient session is per thread).
+
+    Returns:
+        dict: payment_id -> result of cancel_payment_intent
+    """
+    payment_ids = list(payment_ids)
+    if executor is None:
+        results = [cancel_payment_intent(payment_id, reason) for payment_id in payment_ids]
+    else:
+        results = executor.map(lambda payment_id: cancel_payment_intent(payment_id, reason), payment_ids)
+    return dict(zip(payment_ids, results))
+
+def confirm_ticket_payment(ticket):
+    """
+    Record a successful payment: mark the ticket paid, notify the sharpeners
+    and optionally text the customer.
+
+    Expired tickets are reinstated - the payment went through before the
+    PaymentIntent could be cancelled. The transition is a conditional update,
+    so when the webhook, the return page and the reconciliation job all see
+    the same payment, exactly one of them wins and notifies.
+
+    Returns:
+        bool: True if this call made the transition
+    """
+    updated = Ticket.query.filter(
+        Ticket.id == ticket.id, Ticket.status.in_(('unpaid', 'expired'))
+    ).update({Ticket.status: 'paid', Ticket.paid_at: datetime.utcnow()}, synchronize_session=False)
+    if updated:
+        ticket_enqueued(ticket)
+    db.session.commit()
+    if not updated:
+        return False
+    db.session.refresh(ticket)
+
+    notify_sharpeners_new_ticket(ticket)
+    dispatch(ticket.club_id)
+
+    # Send confirmation SMS only if configured
+    if os.environ.get('SEND_PAYMENT_CONFIRMATION_SMS', 'false').lower() == 'true':
+        sms_message = render_sms_template('payment_confirmed', ticket=ticket, estimate=queue_estimate(ticket))
+        send_sms(ticket.customer_phone, sms_message)
+    return True
@@ -0,0 +1,276 @@
+"""
+On-demand profiling of single requests, for admins.
+
+A logged-in admin adds `_profile=1` to a URL (or sends `X-Profile: 1`) and
+that one request is profiled with cProfile; `_profile=sample` (or
+`X-Profile: sample`) samples the request thread's stack every millisecond
+instead, which shows where the wall-clock time goes (waiting on the database
+or a provider included) as a flame graph. The profile is stored in the
+profiled_request table with the route, status, duration and a summary of the
+request's SQL (repeated statement shapes, the slowest statements), and
+listed at /admin/profiles, where the pstats file or the folded stacks can be
+downloaded (open them with snakeviz, or speedscope / flamegraph.pl).
+
+The flag is ignored for anyone but an active admin of the request's club.
+Neither the query string nor SQL parameters are stored: searches and
+statements carry customer names and phone numbers.
+Profiling starts in the last before_request hook and stops in the first
+after_request hook, so it covers the view and template rendering; a streamed
+body (exports) is produced after that and is not included.
+
+Without the flag, a request costs one lookup of the query string and
+headers, and each SQL statement one check of `g`. PROFILING=false removes
+even that. Each club keeps its newest PROFILE_KEEP profiles (default 50).
+"""
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from models import db, ProfiledRequest
+from services.auth import current_sharpener
+from services.clubs import current_club
+from utils.sql_profiler import PROJECT_ROOT, RequestProfile, calling_frame
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+MODES = {'1': 'cprofile', 'true': 'cprofile', 'cprofile': 'cprofile', 'sample': 'sample'}
+SAMPLE_INTERVAL = 0.001
+# Statement shapes kept in the SQL summary
+SQL_SUMMARY_ROWS = 10
+
+DOWNLOADS = {
+    'cprofile': ('prof', 'application/octet-stream'),
+    'sample': ('folded', 'text/plain; charset=utf-8'),
+}
+
+
+def _frame_label(code):
+    """'function (path:line)', paths relative to the project or site-packages"""
+    filename = code.co_filename
+    if filename.startswith(PROJECT_ROOT) and 'site-packages' not in filename:
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    else:
+        filename = filename.rpartition('site-packages/')[2]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """Count the stacks of one thread, sampled every `interval` seconds, as folded stacks"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True, name='request-profile-sampler')
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+    def folded(self):
+        """One 'frame;frame;frame count' line per distinct stack (flamegraph.pl and speedscope input)"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ActiveProfile:
+    """The profiler and SQL statements of the request being profiled"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.sql = RequestProfile()
+        self.duration = 0.0
+        self._profiler = cProfile.Profile() if mode == 'cprofile' else None
+        self._sampler = StackSampler(threading.get_ident()) if mode == 'sample' else None
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self._profiler is not None:
+            self._profiler.enable()
+        else:
+            self._sampler.start()
+
+    def stop(self):
+        """Stop profiling; returns the profile data (marshalled pstats or folded stacks)"""
+        if self._profiler is not None:
+            self._profiler.disable()
+        else:
+            self._sampler.stop()
+        self.duration = time.perf_counter() - self._started
+        if self._profiler is not None:
+            self._profiler.create_stats()
+            return marshal.dumps(self._profiler.stats)
+        return self._sampler.folded().encode()
+
+
+def requested_mode():
+    """Profiling mode asked for by this request, or None"""
+    value = request.args.get(PROFILE_PARAM) or request.headers.get(PROFILE_HEADER)
+    return MODES.get(value.lower()) if value else None
+
+
+def may_profile():
+    """Only active admins of the request's club can profile"""
+    sharpener = current_sharpener()
+    club = current_club(required=False)
+    return bool(sharpener and sharpener.is_active and sharpener.is_admin and club
+                and sharpener.club_id == club.id)
+
+
+def sql_summary(sql):
+    """Repeated statement shapes and the slowest statements (no parameters: they hold customer data)"""
+    slowest = sorted(sql.statements, key=lambda s: s['duration_ms'], reverse=True)[:SQL_SUMMARY_ROWS]
+    return {
+        'repeated': [{**dup, 'total_ms': round(dup['total_ms'], 2)} for dup in sql.duplicates()[:SQL_SUMMARY_ROWS]],
+        'slowest': [{'shape': s['shape'], 'ms': round(s['duration_ms'], 2), 'origin': s['origin']}
+                    for s in slowest],
+    }
+
+
+def save_profile(profile, data, response, keep):
+    """Store a finished profile on its own connection (the request's session is left alone); returns its id"""
+    club_id = current_club().id
+    sharpener = current_sharpener()
+    table = ProfiledRequest.__table__
+    with db.engine.begin() as connection:
+        result = connection.execute(table.insert().values(
+            club_id=club_id,
+            sharpener_id=sharpener.id if sharpener else None,
+            method=request.method,
+            path=request.path[:500],
+            endpoint=(request.endpoint or '')[:100] or None,
+            status_code=response.status_code,
+            mode=profile.mode,
+            duration_ms=round(profile.duration * 1000, 2),
+            sql_count=profile.sql.count,
+            sql_ms=round(profile.sql.total_ms, 2),
+            sql_summary=json.dumps(sql_summary(profile.sql)),
+            data=zlib.compress(data),
+            created_at=datetime.utcnow(),
+        ))
+        # Keep the club's newest profiles
+        newest = db.select(table.c.id).where(table.c.club_id == club_id).order_by(table.c.id.desc()).limit(keep)
+        connection.execute(table.delete().where(table.c.club_id == club_id, table.c.id.not_in(newest)))
+    return result.inserted_primary_key[0]
+
+
+class _LoadedStats:
+    """What pstats.Stats needs to read stats that are already in memory"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def profile_data(record):
+    """The stored profile as downloaded: marshalled pstats (a .prof file) or folded stacks"""
+    return zlib.decompress(record.data)
+
+
+def profile_report(record, limit=40):
+    """Text for the profile page: pstats by cumulative time, or the frames most often on top of the stack"""
+    data = profile_data(record)
+    if record.mode == 'cprofile':
+        output = io.StringIO()
+        stats = pstats.Stats(_LoadedStats(marshal.loads(data)), stream=output)
+        stats.sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+    on_top, total = Counter(), 0
+    for line in data.decode().splitlines():
+        stack, _, count = line.rpartition(' ')
+        on_top[stack.rpartition(';')[2]] += int(count)
+        total += int(count)
+    # The sampler needs the GIL, so a CPU-bound request gets fewer samples than one per interval
+    lines = [f"{total} samples in {record.duration_ms:.0f} ms; frames most often on top of the stack:", '']
+    lines += [f"{count:>7} {count / total:>6.1%}  {frame}" for frame, count in on_top.most_common(limit)]
+    return '\n'.join(lines)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'request_profile' in g:
+        context.profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Tolerates a statement that started before the profile did
+    started = getattr(context, 'profile_started', None)
+    if started is not None and has_request_context() and 'request_profile' in g:
+        g.request_profile.sql.add(statement, parameters, time.perf_counter() - started,
+                                  calling_frame(__file__))
+
+
+def init_profiling(app):
+    """Profile requests flagged by an admin. Call last in create_app, so the profile wraps the view closely."""
+    app.config.setdefault('PROFILING', True)
+    app.config.setdefault('PROFILE_KEEP', 50)
+    if not app.config['PROFILING']:
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_request_profile():
+        mode = requested_mode()
+        if mode is None or not may_profile():
+            return
+        profile = ActiveProfile(mode)
+        try:
+            profile.start()
+        except ValueError as e:
+            # Python 3.12+: one cProfile at a time per process
+            logger.warning("Request not profiled: %s", e)
+            return
+        g.request_profile = profile
+
+    @app.after_request
+    def save_request_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+        data = profile.stop()
+        try:
+            profile_id = save_profile(profile, data, response, current_app.config['PROFILE_KEEP'])
+        except Exception:
+            logger.exception("Could not store the profile of %s %s", request.method, request.path)
+            return response
+        logger.info("Profiled %s %s in %.1f ms", request.method, request.path, profile.duration * 1000,
+                    extra={'profile_id': profile_id, 'sql_queries': profile.sql.count})
+        response.headers['X-Profile-Id'] = str(profile_id)
+        response.headers['X-Profile-Ms'] = f"{profile.duration * 1000:.1f}"
+        return response
+
+    @app.teardown_request
+    def stop_request_profile(exc):
+        # The view raised and after_request never ran
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            profile.stop()
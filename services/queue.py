@@ -0,0 +1,191 @@
+"""
+Queue position and ready-time estimates for customers.
+
+Each club's statistics live in its QueueStats row (QueueStats.id is the club
+id) and are updated in the same transaction as each ticket transition, so
+looking up an estimate is one primary key read and one index range count:
+
+- a ticket joining the paid queue takes the next sequence number
+  (Ticket.queue_seq); its position is one plus the club's paid tickets with
+  a lower number, counted on ix_ticket_club_status_queue_seq, so tickets
+  that leave from anywhere in the queue (claimed out of turn, cancelled,
+  sent back to unpaid) only move the tickets behind them,
+- each completion folds its sharpening time into an exponentially weighted
+  moving average,
+- claims and completions record when each sharpener last worked; those
+  active within QUEUE_ACTIVE_WINDOW_MINUTES are taken to work in parallel.
+
+An unclaimed ticket keeps its number and so goes back to its old place. The
+dispatcher's reordering (skipped tickets moved back, urgent ones ahead) isn't
+reflected in the numbers: the positions shown are the order of payment.
+`flask rebuild-queue-stats` compacts the numbers and recomputes the average.
+
+None of these functions commit; callers commit together with the transition.
+"""
+import json
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from models import db, Ticket, QueueStats
+
+# Weight of the newest sharpening time in the moving average
+EWMA_ALPHA = 0.2
+# Tickets left in progress over a break (or claimed by mistake) shouldn't skew the average
+MIN_SERVICE_SECONDS = 60
+MAX_SERVICE_SECONDS = 3600
+
+DEFAULT_SERVICE_MINUTES = float(os.environ.get('QUEUE_DEFAULT_SERVICE_MINUTES', '10'))
+ACTIVE_WINDOW_MINUTES = float(os.environ.get('QUEUE_ACTIVE_WINDOW_MINUTES', '30'))
+
+# Estimates are shown rounded up to this many minutes
+ROUND_MINUTES = 5
+
+
+class QueueEstimate:
+    """Where a ticket is in the queue and when it should be ready"""
+
+    def __init__(self, position, ready_at, now):
+        self.position = position  # 0 while being sharpened
+        self.ready_at = ready_at  # None while nobody is sharpening
+        self.wait_minutes = None
+        if ready_at is not None:
+            minutes = max((ready_at - now).total_seconds() / 60, 1)
+            self.wait_minutes = int(math.ceil(minutes / ROUND_MINUTES) * ROUND_MINUTES)
+
+    @property
+    def in_progress(self):
+        return self.position == 0
+
+
+def _update(club_id, values):
+    """
+    Update the club's stats row with SQL expressions (atomic, and holding the
+    row's write lock until commit), creating the row if needed.
+    """
+    updated = QueueStats.query.filter(QueueStats.id == club_id).update(values, synchronize_session=False)
+    if not updated:
+        # New clubs, and databases made with create_all(), start without the row
+        db.session.add(QueueStats(id=club_id, enqueued=0, service_samples=0, sharpener_activity='{}'))
+        db.session.flush()
+        QueueStats.query.filter(QueueStats.id == club_id).update(values, synchronize_session=False)
+
+
+def _bump(club_id, **deltas):
+    """Atomically add to counters of the club's stats row"""
+    _update(club_id, {getattr(QueueStats, name): getattr(QueueStats, name) + delta
+                      for name, delta in deltas.items()})
+
+
+def _record_activity(club_id, sharpener_id):
+    """Note that a sharpener is working; called after _update, which holds the row's write lock"""
+    stats = db.session.get(QueueStats, club_id, populate_existing=True)
+    now = time.time()
+    activity = {key: last for key, last in json.loads(stats.sharpener_activity or '{}').items()
+                if last >= now - 86400}
+    activity[str(sharpener_id)] = now
+    stats.sharpener_activity = json.dumps(activity)
+
+
+def ticket_enqueued(ticket):
+    """The ticket joined the paid queue (paid, confirmed or promoted from unpaid)"""
+    _bump(ticket.club_id, enqueued=1)
+    ticket.queue_seq = db.session.query(QueueStats.enqueued).filter(QueueStats.id == ticket.club_id).scalar()
+
+
+def ticket_dequeued(ticket, back_to_unpaid=False):
+    """The ticket left the paid queue without being claimed (cancelled or sent back to unpaid)"""
+    if back_to_unpaid:
+        # Paying again queues it at the back
+        ticket.queue_seq = None
+
+
+def ticket_started(ticket, sharpener_id):
+    """A sharpener claimed the ticket"""
+    _bump(ticket.club_id, enqueued=0)
+    _record_activity(ticket.club_id, sharpener_id)
+
+
+def ticket_completed(ticket, sharpener_id):
+    """Fold the ticket's sharpening time into the moving average"""
+    if ticket.started_at is None:
+        _bump(ticket.club_id, service_samples=0)
+    else:
+        seconds = (ticket.completed_at - ticket.started_at).total_seconds()
+        seconds = min(max(seconds, MIN_SERVICE_SECONDS), MAX_SERVICE_SECONDS)
+        average = QueueStats.avg_service_seconds
+        # Both right-hand sides see the old values, so the first sample seeds the average
+        _update(ticket.club_id, {
+            QueueStats.avg_service_seconds: db.case((QueueStats.service_samples == 0, seconds),
+                                                    else_=average + EWMA_ALPHA * (seconds - average)),
+            QueueStats.service_samples: QueueStats.service_samples + 1,
+        })
+    _record_activity(ticket.club_id, sharpener_id)
+
+
+def queue_estimate(ticket, now=None):
+    """
+    Queue position and expected ready time for a paid or in-progress ticket.
+
+    Returns:
+        QueueEstimate, or None for tickets not in the queue
+    """
+    if ticket.status not in ('paid', 'in_progress'):
+        return None
+    stats = db.session.get(QueueStats, ticket.club_id)
+    if stats is None:
+        return None
+
+    now = now or datetime.utcnow()
+    service = timedelta(seconds=stats.avg_service_seconds if stats.service_samples
+                        else DEFAULT_SERVICE_MINUTES * 60)
+    if ticket.status == 'in_progress':
+        return QueueEstimate(0, max((ticket.started_at or now) + service, now), now)
+
+    if ticket.queue_seq is None:
+        return None
+    ahead = db.session.scalar(
+        db.select(db.func.count()).select_from(Ticket)
+        .where(Ticket.club_id == ticket.club_id, Ticket.status == 'paid', Ticket.queue_seq < ticket.queue_seq))
+    position = ahead + 1
+    sharpeners = stats.active_sharpeners(time.time() - ACTIVE_WINDOW_MINUTES * 60)
+    if not sharpeners:
+        return QueueEstimate(position, None, now)
+    # Sharpeners work the queue in parallel, one ticket each per round
+    return QueueEstimate(position, now + service * math.ceil(position / sharpeners), now)
+
+
+def rebuild_queue_stats(club_id, samples=50):
+    """
+    Renumber a club's queued tickets and recompute the average from its recent work.
+
+    Tickets in progress are numbered first, so one that is unclaimed goes back
+    to the front. Commits.
+
+    Returns:
+        (waiting tickets, sharpening time samples)
+    """
+    queued = (Ticket.query.filter(Ticket.club_id == club_id, Ticket.status.in_(('in_progress', 'paid')))
+              .order_by(Ticket.status != 'in_progress', db.func.coalesce(Ticket.paid_at, Ticket.created_at),
+                        Ticket.id)
+              .all())
+    for seq, ticket in enumerate(queued, start=1):
+        ticket.queue_seq = seq
+    waiting = sum(1 for ticket in queued if ticket.status == 'paid')
+
+    recent = (db.session.query(Ticket.started_at, Ticket.completed_at)
+              .filter(Ticket.club_id == club_id, Ticket.status == 'completed',
+                      Ticket.started_at.isnot(None), Ticket.completed_at.isnot(None))
+              .order_by(Ticket.completed_at.desc())
+              .limit(samples)
+              .all())
+    durations = [min(max((completed - started).total_seconds(), MIN_SERVICE_SECONDS), MAX_SERVICE_SECONDS)
+                 for started, completed in recent]
+
+    _bump(club_id, enqueued=0)
+    stats = db.session.get(QueueStats, club_id, populate_existing=True)
+    stats.enqueued = len(queued)
+    stats.avg_service_seconds = sum(durations) / len(durations) if durations else None
+    stats.service_samples = len(durations)
+    db.session.commit()
+    return waiting, len(durations)
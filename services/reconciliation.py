@@ -0,0 +1,126 @@
+"""
+Reconciliation of ticket payment state against Stripe.
+
+The webhook is the primary way a ticket learns it has been paid; if a webhook
+is lost (downtime, misconfigured endpoint, Stripe giving up on retries) the
+ticket would stay unpaid. `flask reconcile-payments` pages through
+PaymentIntent.list for intents created since a stored checkpoint, matches them
+to tickets through metadata.club_id and metadata.ticket_code and applies any
+missed transition.
+
+The checkpoint is the creation time of the oldest intent that was still open
+(could yet succeed) at the last run, so an intent keeps being looked at until
+it reaches a final state, but never further back than the lookback window.
+"""
+import logging
+import time
+import stripe
+from flask import current_app, g
+from models import db, Ticket, JobCheckpoint
+from services.clubs import LEGACY_CLUB_ID
+from services.payment import confirm_ticket_payment
+from utils.metrics import observe_outbound
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = 'stripe_reconciliation'
+
+# Intent states that can still turn into 'succeeded'
+OPEN_STATUSES = {'requires_payment_method', 'requires_confirmation', 'requires_action',
+                 'processing', 'requires_capture'}
+
+# Ticket codes per IN (...) query
+CODE_CHUNK_SIZE = 500
+
+
+class ReconciliationReport:
+    """What one reconciliation run found and did"""
+
+    def __init__(self, since):
+        self.since = since
+        self.pages = 0
+        self.intents = 0
+        self.succeeded = 0
+        self.tickets_paid = []
+        self.complete = False
+        self.checkpoint = None
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def list_payment_intents(since, page_size, max_pages, report):
+    """Yield PaymentIntents created at or after `since` (unix time), newest first"""
+    params = {'created': {'gte': since}, 'limit': page_size}
+    for _ in range(max_pages):
+        with observe_outbound('stripe', 'payment_intent.list'):
+            page = stripe.PaymentIntent.list(**params)
+        report.pages += 1
+        yield from page.data
+        if not page.has_more or not page.data:
+            report.complete = True
+            return
+        params['starting_after'] = page.data[-1].id
+
+
+def reconcile_payments(lookback_hours=72, overlap_seconds=300, page_size=100, max_pages=50, dry_run=False,
+                       language='da'):
+    """
+    One reconciliation pass.
+
+    Args:
+        lookback_hours: never look at intents older than this
+        overlap_seconds: re-read this much before the checkpoint to cover clock skew
+        page_size: intents per list call (Stripe allows up to 100)
+        max_pages: list calls per run; if the window holds more, the checkpoint
+            is left where it was and the newest intents are handled this run
+        dry_run: report the tickets that would be marked paid without changing them
+        language: language of the payment confirmation SMS, if those are enabled
+
+    Returns:
+        ReconciliationReport
+    """
+    started = int(time.time())
+    floor = started - int(lookback_hours * 3600)
+    checkpoint = JobCheckpoint.get(CHECKPOINT_NAME)
+    since = max(int(checkpoint) - overlap_seconds, floor) if checkpoint else floor
+    report = ReconciliationReport(since)
+
+    succeeded_codes = {}  # club id -> ticket codes
+    oldest_open = None
+    for intent in list_payment_intents(since, page_size, max_pages, report):
+        report.intents += 1
+        metadata = intent.get('metadata') or {}
+        code = metadata.get('ticket_code')
+        if intent.status == 'succeeded' and code:
+            report.succeeded += 1
+            # Intents from before clubs have no club_id
+            succeeded_codes.setdefault(int(metadata.get('club_id') or LEGACY_CLUB_ID), set()).add(code)
+        elif intent.status in OPEN_STATUSES:
+            oldest_open = intent.created if oldest_open is None else min(oldest_open, intent.created)
+
+    # One query per club and chunk of codes instead of a lookup per intent
+    # SMS templates pick their language from the request
+    with current_app.test_request_context():
+        g.language = language
+        for club_id, club_codes in sorted(succeeded_codes.items()):
+            codes = sorted(club_codes)
+            for offset in range(0, len(codes), CODE_CHUNK_SIZE):
+                tickets = Ticket.query.filter(
+                    Ticket.club_id == club_id,
+                    Ticket.code.in_(codes[offset:offset + CODE_CHUNK_SIZE]),
+                    Ticket.status.in_(('unpaid', 'expired'))
+                ).all()
+                for ticket in tickets:
+                    if dry_run:
+                        report.tickets_paid.append(ticket.code)
+                    elif confirm_ticket_payment(ticket):
+                        logger.warning("Payment confirmed by reconciliation (webhook missed)",
+                                       extra={'ticket_code': ticket.code})
+                        report.tickets_paid.append(ticket.code)
+
+    if report.complete and not dry_run:
+        report.checkpoint = oldest_open if oldest_open is not None else started
+        JobCheckpoint.set(CHECKPOINT_NAME, report.checkpoint)
+        db.session.commit()
+    return report
@@ -1,11 +1,18 @@
 import os
+import logging
 import requests
 from flask import render_template
 from utils.helpers import normalize_phone_number
 from utils.i18n import get_language
+from utils.metrics import observe_outbound
+
+logger = logging.getLogger(__name__)
 
 # Configuration
 GATEWAYAPI_TOKEN = os.environ.get('GATEWAYAPI_TOKEN', 'your-gatewayapi-token')
+# GATEWAYAPI_BASE_URL can point at a local stand-in (python -m standins.gatewayapi)
+GATEWAYAPI_BASE_URL = os.environ.get('GATEWAYAPI_BASE_URL', 'https://gatewayapi.eu').rstrip('/')
+GATEWAYAPI_TIMEOUT = float(os.environ.get('GATEWAYAPI_TIMEOUT', '30'))
 
 def render_sms_template(template_name, **context):
     """Render SMS template with language detection"""
@@ -15,13 +22,13 @@ def render_sms_template(template_name, **context):
     try:
         return render_template(template_path, **context)
     except Exception as e:
-        print(f"Warning: SMS template error for {template_path}: {e}")
+        logger.warning("SMS template error for %s: %s", template_path, e)
         # Fallback to English if language-specific template fails
         if lang != 'en':
             try:
                 return render_template(f"sms/en/{template_name}.j2", **context)
             except Exception as e2:
-                print(f"Error: English SMS template fallback failed: {e2}")
+                logger.error("English SMS template fallback failed: %s", e2)
                 return f"SMS template error: {template_name}"
         return f"SMS template error: {template_name}"
 
@@ -48,11 +55,13 @@ def send_sms(phone, message):
     if not GATEWAYAPI_TOKEN or GATEWAYAPI_TOKEN == 'your-gatewayapi-token':
         # Simulation mode for development
         encoding = detect_optimal_encoding(message)
-        print(f"[SMS SIMULATION] To: {phone}")
-        print(f"[SMS SIMULATION] Encoding: {encoding}")
-        print(f"[SMS SIMULATION] Length: {len(message)} chars")
-        print(f"[SMS SIMULATION] Message: {message}")
-        print("-" * 50)
+        logger.info("SMS simulation", extra={
+            'sample': 'sms_simulation',
+            'phone': phone,
+            'encoding': encoding,
+            'length': len(message),
+            'sms_text': message,
+        })
         return True
 
     # Normalize phone number
@@ -71,25 +80,23 @@ def send_sms(phone, message):
     if encoding == "UCS2":
         data["encoding"] = "UCS2"
 
-    print(f"[SMS] Using {encoding} encoding for {len(message)} chars")
-
     try:
-        print(f"[SMS] Sending to {msisdn}...")
-        response = requests.post(
-            "https://gatewayapi.eu/rest/mtsms",
-            json=data,
-            auth=(GATEWAYAPI_TOKEN, ''),
-            timeout=30
-        )
+        logger.debug("Sending SMS to %s using %s encoding for %d chars", msisdn, encoding, len(message))
+        with observe_outbound('gatewayapi', 'mtsms'):
+            response = requests.post(
+                f"{GATEWAYAPI_BASE_URL}/rest/mtsms",
+                json=data,
+                auth=(GATEWAYAPI_TOKEN, ''),
+                timeout=GATEWAYAPI_TIMEOUT
+            )
 
         if response.status_code == 200:
-            print(f"[SMS] Successfully sent to {msisdn}")
+            logger.info("SMS sent to %s", msisdn)
             return True
         else:
-            print(f"[SMS] Failed to send. Status: {response.status_code}")
-            print(f"[SMS] Response: {response.text}")
+            logger.error("SMS to %s failed with status %s: %s", msisdn, response.status_code, response.text)
             return False
 
     except Exception as e:
-        print(f"[SMS] Error sending SMS: {str(e)}")
+        logger.exception("Error sending SMS to %s", msisdn)
         return False
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Shared plumbing for the local provider stand-in servers.
+
+Each stand-in is a small threaded HTTP server that speaks just enough of a
+provider's API for this app, with configurable latency, error rate and
+timeouts so load tests can reproduce provider slowdowns without a network.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+class LatencyModel:
+    """
+    Response delay distribution, parsed from a spec string:
+
+        fixed:50              always 50 ms
+        uniform:20,200        uniformly between 20 and 200 ms
+        exponential:80        exponential with mean 80 ms
+        lognormal:80,0.6      lognormal with median 80 ms and sigma 0.6
+    """
+
+    def __init__(self, spec='fixed:0', rng=None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        kind, _, params = spec.partition(':')
+        self.kind = kind
+        self.params = [float(p) for p in params.split(',') if p]
+        if kind not in ('fixed', 'uniform', 'exponential', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample_ms(self):
+        if self.kind == 'fixed':
+            return self.params[0] if self.params else 0
+        if self.kind == 'uniform':
+            return self.rng.uniform(self.params[0], self.params[1])
+        if self.kind == 'exponential':
+            return self.rng.expovariate(1 / self.params[0])
+        median, sigma = self.params
+        return self.rng.lognormvariate(0, sigma) * median
+
+
+class FaultInjector:
+    """Decide per request whether to delay, fail or hang"""
+
+    def __init__(self, latency='fixed:0', error_rate=0.0, timeout_rate=0.0, timeout_seconds=60.0, seed=None):
+        self.rng = random.Random(seed)
+        self.latency = LatencyModel(latency, self.rng)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.lock = threading.Lock()
+
+    def apply(self):
+        """
+        Sleep according to the latency model.
+
+        Returns 'timeout' (after hanging for timeout_seconds), 'error' or 'ok'.
+        """
+        with self.lock:
+            roll = self.rng.random()
+            delay_ms = self.latency.sample_ms()
+
+        if roll < self.timeout_rate:
+            time.sleep(self.timeout_seconds)
+            return 'timeout'
+        time.sleep(delay_ms / 1000)
+        if roll < self.timeout_rate + self.error_rate:
+            return 'error'
+        return 'ok'
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Base request handler with JSON helpers; subclasses implement route()"""
+
+    server_version = 'StandIn/1.0'
+    faults = None  # set on the subclass by serve()
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, method):
+        # Control endpoints (/_standin/...) bypass fault injection
+        if not self.path.startswith('/_standin/'):
+            outcome = self.faults.apply()
+            if outcome == 'timeout':
+                self.close_connection = True
+                return
+            if outcome == 'error':
+                self.send_error_response()
+                return
+        self.route(method)
+
+    def send_error_response(self):
+        self.send_json(500, {'error': 'injected failure'})
+
+    def route(self, method):
+        """Answer the request; subclasses route their API's paths here"""
+        self.send_json(404, {'error': f'no route for {method} {urlparse(self.path).path}'})
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+
+def add_fault_arguments(parser):
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--latency', default='fixed:0',
+                        help='Latency distribution, e.g. fixed:50, uniform:20,200, lognormal:80,0.6')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 5xx')
+    parser.add_argument('--timeout-rate', type=float, default=0.0,
+                        help='Fraction of requests that hang and then drop the connection')
+    parser.add_argument('--timeout-seconds', type=float, default=60.0, help='How long a timed-out request hangs')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs')
+    parser.add_argument('--quiet', action='store_true', help="Don't log each request")
+
+
+def serve(handler_class, args):
+    """Run a stand-in server until interrupted"""
+    handler_class.faults = FaultInjector(args.latency, args.error_rate, args.timeout_rate,
+                                         args.timeout_seconds, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), handler_class)
+    server.daemon_threads = True
+    server.quiet = args.quiet
+    print(f"{handler_class.__name__} listening on http://{args.host}:{args.port} "
+          f"(latency={args.latency}, error_rate={args.error_rate}, timeout_rate={args.timeout_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def base_parser(description, default_port):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--port', type=int, default=default_port)
+    add_fault_arguments(parser)
+    return parser
@@ -0,0 +1,78 @@
+"""
+Local stand-in for the GatewayAPI SMS REST API.
+
+Accepts POST /rest/mtsms the way services/sms.py sends it (JSON body, token
+as basic-auth username) and records the messages instead of sending them.
+
+    python -m standins.gatewayapi --port 12112 --latency uniform:50,400 --error-rate 0.02
+
+Point the app at it with:
+
+    GATEWAYAPI_TOKEN=standin GATEWAYAPI_BASE_URL=http://localhost:12112
+
+Control endpoint (no fault injection):
+    GET /_standin/messages    all received messages as JSON
+"""
+import base64
+import itertools
+import json
+import threading
+from urllib.parse import urlparse
+from standins.common import StandinHandler, base_parser, serve
+
+_ids = itertools.count(1)
+_lock = threading.Lock()
+messages = []
+
+
+class GatewayAPIHandler(StandinHandler):
+
+    def send_error_response(self):
+        self.send_json(500, {'code': '0x0000', 'message': 'Injected stand-in failure'})
+
+    def authorized(self):
+        header = self.headers.get('Authorization', '')
+        if not header.startswith('Basic '):
+            return False
+        try:
+            username = base64.b64decode(header[6:]).decode().split(':', 1)[0]
+        except Exception:
+            return False
+        return bool(username)
+
+    def route(self, method):
+        path = urlparse(self.path).path.rstrip('/')
+
+        if path == '/_standin/messages' and method == 'GET':
+            with _lock:
+                return self.send_json(200, list(messages))
+
+        if path != '/rest/mtsms' or method != 'POST':
+            return self.send_json(404, {'code': '0x0404', 'message': 'Not found'})
+
+        if not self.authorized():
+            return self.send_json(401, {'code': '0x0101', 'message': 'Unauthorized'})
+
+        try:
+            data = json.loads(self.read_body() or b'{}')
+        except ValueError:
+            return self.send_json(400, {'code': '0x0201', 'message': 'Invalid JSON'})
+
+        recipients = data.get('recipients') or []
+        if not data.get('message') or not recipients or not all(r.get('msisdn') for r in recipients):
+            return self.send_json(422, {'code': '0x0202', 'message': 'message and recipients are required'})
+
+        message_id = next(_ids)
+        with _lock:
+            messages.append({'id': message_id, **data})
+        self.send_json(200, {'ids': [message_id], 'usage': {'total_cost': 0.0, 'currency': 'DKK',
+                                                             'countries': {'DK': len(recipients)}}})
+
+
+def main(argv=None):
+    args = base_parser('Local GatewayAPI stand-in', default_port=12112).parse_args(argv)
+    serve(GatewayAPIHandler, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Local stand-in for the Stripe API.
+
+Implements the PaymentIntent calls the app makes (create, retrieve, list and cancel) and
+can deliver signed payment_intent.succeeded webhooks back to the app, either
+on demand or automatically a while after each intent is created.
+
+    python -m standins.stripe_api --port 12111 --latency lognormal:120,0.5 \\
+        --webhook-url http://localhost:5000/stripe/webhook --auto-succeed-after 5
+
+Point the app at it with:
+
+    STRIPE_SECRET_KEY=sk_test_standin STRIPE_API_BASE=http://localhost:12111
+
+Control endpoints (no fault injection):
+    POST /_standin/payment_intents/<id>/succeed   mark paid and send the webhook
+    GET  /_standin/payment_intents                all intents as JSON
+"""
+import hashlib
+import hmac
+import itertools
+import json
+import re
+import threading
+import time
+import urllib.request
+from urllib.parse import parse_qsl, urlparse
+from standins.common import StandinHandler, base_parser, serve
+
+_ids = itertools.count(1)
+_lock = threading.Lock()
+payment_intents = {}
+
+
+def unflatten(pairs):
+    """Turn Stripe's form encoding (metadata[key]=v, items[0]=v) into nested dicts/lists"""
+    result = {}
+    for key, value in pairs:
+        parts = re.findall(r'[^\[\]]+', key)
+        target = result
+        for part, next_part in zip(parts, parts[1:]):
+            target = target.setdefault(part, [] if next_part.isdigit() else {})
+            if isinstance(target, list):
+                index = int(next_part)
+                while len(target) <= index:
+                    target.append(None)
+        last = parts[-1]
+        if isinstance(target, list):
+            target[int(last)] = value
+        else:
+            target[last] = value
+    return result
+
+
+def new_payment_intent(params):
+    number = next(_ids)
+    intent_id = f"pi_standin_{number:08d}"
+    intent = {
+        'id': intent_id,
+        'object': 'payment_intent',
+        'amount': int(params.get('amount', 0)),
+        'currency': params.get('currency', 'dkk'),
+        'client_secret': f"{intent_id}_secret_standin",
+        'created': int(time.time()),
+        'description': params.get('description'),
+        'livemode': False,
+        'metadata': params.get('metadata', {}),
+        'payment_method_types': params.get('payment_method_types', ['card']),
+        'status': 'requires_action',
+    }
+    with _lock:
+        payment_intents[intent_id] = intent
+    return intent
+
+
+def list_payment_intents(query):
+    """Stripe list semantics: newest first, created[gte/gt/lte/lt] filters, starting_after cursor"""
+    limit = min(int(query.get('limit', 10)), 100)
+    bounds = {op: int(query[f'created[{op}]']) for op in ('gte', 'gt', 'lte', 'lt') if f'created[{op}]' in query}
+    checks = {'gte': lambda c, v: c >= v, 'gt': lambda c, v: c > v, 'lte': lambda c, v: c <= v, 'lt': lambda c, v: c < v}
+
+    with _lock:
+        # Ids are sequential, so id order breaks ties between intents created in the same second
+        intents = sorted(payment_intents.values(), key=lambda i: (i['created'], i['id']), reverse=True)
+    intents = [i for i in intents if all(checks[op](i['created'], value) for op, value in bounds.items())]
+
+    starting_after = query.get('starting_after')
+    if starting_after:
+        ids = [i['id'] for i in intents]
+        intents = intents[ids.index(starting_after) + 1:] if starting_after in ids else []
+
+    return {
+        'object': 'list',
+        'url': '/v1/payment_intents',
+        'has_more': len(intents) > limit,
+        'data': intents[:limit],
+    }
+
+
+def sign_payload(payload, secret, timestamp):
+    signed = f"{timestamp}.{payload}".encode()
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def deliver_webhook(intent, webhook_url, webhook_secret):
+    """POST a payment_intent.succeeded event to the app"""
+    event = {
+        'id': f"evt_standin_{next(_ids):08d}",
+        'object': 'event',
+        'api_version': '2023-10-16',
+        'created': int(time.time()),
+        'livemode': False,
+        'type': 'payment_intent.succeeded',
+        'data': {'object': intent},
+    }
+    payload = json.dumps(event)
+    headers = {'Content-Type': 'application/json'}
+    if webhook_secret:
+        headers['Stripe-Signature'] = sign_payload(payload, webhook_secret, int(time.time()))
+    request = urllib.request.Request(webhook_url, data=payload.encode(), headers=headers, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            print(f"[Stripe stand-in] Webhook for {intent['id']} -> {response.status}")
+    except Exception as e:
+        print(f"[Stripe stand-in] Webhook for {intent['id']} failed: {e}")
+
+
+class StripeHandler(StandinHandler):
+    webhook_url = None
+    webhook_secret = None
+    auto_succeed_after = None
+
+    def send_error_response(self):
+        self.send_json(500, {'error': {'type': 'api_error', 'message': 'Injected stand-in failure'}})
+
+    def stripe_error(self, status, message, error_type='invalid_request_error'):
+        self.send_json(status, {'error': {'type': error_type, 'message': message}})
+
+    def succeed(self, intent):
+        if intent['status'] == 'canceled':
+            return
+        intent['status'] = 'succeeded'
+        if self.webhook_url:
+            threading.Thread(target=deliver_webhook, daemon=True,
+                             args=(intent, self.webhook_url, self.webhook_secret)).start()
+
+    def route(self, method):
+        path = urlparse(self.path).path.rstrip('/')
+
+        if path == '/_standin/payment_intents' and method == 'GET':
+            with _lock:
+                return self.send_json(200, list(payment_intents.values()))
+
+        match = re.fullmatch(r'/_standin/payment_intents/(\w+)/succeed', path)
+        if match and method == 'POST':
+            intent = payment_intents.get(match.group(1))
+            if not intent:
+                return self.stripe_error(404, f"No such payment_intent: '{match.group(1)}'")
+            self.succeed(intent)
+            return self.send_json(200, intent)
+
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            return self.stripe_error(401, 'You did not provide an API key.', 'authentication_error')
+
+        if path == '/v1/payment_intents' and method == 'POST':
+            params = unflatten(parse_qsl(self.read_body().decode()))
+            if 'amount' not in params or 'currency' not in params:
+                return self.stripe_error(400, 'Missing required param: amount or currency.')
+            intent = new_payment_intent(params)
+            if self.auto_succeed_after is not None:
+                threading.Timer(self.auto_succeed_after, self.succeed, args=(intent,)).start()
+            return self.send_json(200, intent)
+
+        if path == '/v1/payment_intents' and method == 'GET':
+            return self.send_json(200, list_payment_intents(dict(parse_qsl(urlparse(self.path).query))))
+
+        match = re.fullmatch(r'/v1/payment_intents/(\w+)', path)
+        if match and method == 'GET':
+            intent = payment_intents.get(match.group(1))
+            if not intent:
+                return self.stripe_error(404, f"No such payment_intent: '{match.group(1)}'")
+            return self.send_json(200, intent)
+
+        match = re.fullmatch(r'/v1/payment_intents/(\w+)/cancel', path)
+        if match and method == 'POST':
+            params = dict(parse_qsl(self.read_body().decode()))
+            with _lock:
+                intent = payment_intents.get(match.group(1))
+                if not intent:
+                    return self.stripe_error(404, f"No such payment_intent: '{match.group(1)}'")
+                if intent['status'] in ('succeeded', 'canceled'):
+                    return self.stripe_error(
+                        400, f"You cannot cancel this PaymentIntent because it has a status of {intent['status']}."
+                    )
+                intent['status'] = 'canceled'
+                intent['canceled_at'] = int(time.time())
+                intent['cancellation_reason'] = params.get('cancellation_reason')
+            return self.send_json(200, intent)
+
+        self.stripe_error(404, f"Unrecognized request URL ({method}: {path}).")
+
+
+def main(argv=None):
+    parser = base_parser('Local Stripe API stand-in', default_port=12111)
+    parser.add_argument('--webhook-url', help='App URL to deliver payment_intent.succeeded events to')
+    parser.add_argument('--webhook-secret', help='Sign webhooks with this secret (STRIPE_WEBHOOK_SECRET)')
+    parser.add_argument('--auto-succeed-after', type=float, default=None,
+                        help='Mark each intent succeeded this many seconds after creation')
+    args = parser.parse_args(argv)
+
+    StripeHandler.webhook_url = args.webhook_url
+    StripeHandler.webhook_secret = args.webhook_secret
+    StripeHandler.auto_succeed_after = args.auto_succeed_after
+    serve(StripeHandler, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Static asset pipeline.
+
+`flask build-assets` writes fingerprinted files to static/dist/:
+
+- app.<hash>.css: Tailwind purged down to the classes our templates use,
+  plus the component classes from assets/app.css
+- favicon.<hash>.ico
+
+each with precompressed .gz and .br siblings (brotli only if the Brotli
+package is installed), and a manifest.json mapping logical names to the
+fingerprinted ones.
+
+Templates call asset_url('app.css'). Since a changed file gets a new name,
+routes/assets.py can serve them as immutable for a year. Without a build
+(development) asset_url returns None and base.html falls back to the full
+Tailwind CDN stylesheet.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import requests
+from flask import current_app, url_for
+from utils import css
+
+try:
+    import brotli
+except ImportError:  # optional: only .gz variants are written without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent
+SOURCE_DIR = ROOT / 'assets'
+TEMPLATE_DIR = ROOT / 'templates'
+STATIC_DIR = ROOT / 'static'
+DIST_DIR = STATIC_DIR / 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+TAILWIND_CSS_URL = 'https://cdnjs.cloudflare.com/ajax/libs/tailwindcss/2.2.19/tailwind.min.css'
+
+# Smaller files aren't worth a compressed variant
+MIN_COMPRESS_SIZE = 256
+HASH_LENGTH = 10
+
+
+def read_source(source):
+    """Text of a local file or URL"""
+    if source.startswith(('http://', 'https://')):
+        response = requests.get(source, timeout=30)
+        response.raise_for_status()
+        return response.text
+    return Path(source).read_text(encoding='utf-8')
+
+
+def template_classes(template_dir=TEMPLATE_DIR):
+    """Every token in the templates that could be a CSS class"""
+    found = set()
+    for path in sorted(template_dir.rglob('*')):
+        if path.is_file() and path.suffix in ('.html', '.j2'):
+            found |= css.extract_candidates(path.read_text(encoding='utf-8'))
+    return found
+
+
+def build_stylesheet(tailwind_css, components_css, classes):
+    """Purged Tailwind plus our components with their @apply directives resolved"""
+    tailwind = css.parse(tailwind_css)
+    components = css.resolve_apply(css.parse(components_css), css.utility_index(tailwind))
+    purged = css.purge(tailwind, classes)
+    licenses = [node for node in purged if isinstance(node, css.Comment)]
+    rules = [node for node in purged if not isinstance(node, css.Comment)]
+    # Components go before the utilities, so a utility on the same element wins
+    return css.serialize(licenses + components + rules)
+
+
+def fingerprint(name, content):
+    """'app.css' -> 'app.<content hash>.css'"""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def write_asset(dist_dir, filename, content):
+    """Write a file and its compressed variants; returns {variant: (filename, size)}"""
+    written = {'identity': (filename, len(content))}
+    (dist_dir / filename).write_bytes(content)
+    if len(content) < MIN_COMPRESS_SIZE:
+        return written
+
+    variants = {'gzip': ('.gz', gzip.compress(content, compresslevel=9, mtime=0))}
+    if brotli is not None:
+        variants['br'] = ('.br', brotli.compress(content, quality=11))
+    for encoding, (suffix, compressed) in variants.items():
+        # Already-compressed data (PNG icons) barely shrinks; not worth a variant
+        if len(compressed) < len(content) * 0.9:
+            (dist_dir / (filename + suffix)).write_bytes(compressed)
+            written[encoding] = (filename + suffix, len(compressed))
+    return written
+
+
+def build_assets(tailwind_source=TAILWIND_CSS_URL, dist_dir=DIST_DIR):
+    """
+    Build all assets into dist_dir.
+
+    The new manifest replaces the old one atomically and files it no longer
+    references are removed afterwards, so a running app never points at a
+    missing file.
+
+    Returns:
+        list of (name, fingerprinted filename, {variant: size})
+    """
+    stylesheet = build_stylesheet(
+        read_source(tailwind_source),
+        (SOURCE_DIR / 'app.css').read_text(encoding='utf-8'),
+        template_classes(),
+    )
+    sources = {
+        'app.css': stylesheet.encode('utf-8'),
+        'favicon.ico': (STATIC_DIR / 'favicon.ico').read_bytes(),
+    }
+
+    dist_dir.mkdir(parents=True, exist_ok=True)
+    built, manifest, keep = [], {}, {MANIFEST_NAME}
+    for name, content in sources.items():
+        filename = fingerprint(name, content)
+        written = write_asset(dist_dir, filename, content)
+        built.append((name, filename, {encoding: size for encoding, (_, size) in written.items()}))
+        manifest[name] = filename
+        keep.update(path for path, _ in written.values())
+
+    tmp = dist_dir / (MANIFEST_NAME + '.tmp')
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+    os.replace(tmp, dist_dir / MANIFEST_NAME)
+
+    for path in dist_dir.iterdir():
+        if path.name not in keep:
+            path.unlink()
+    return built
+
+
+class AssetManifest:
+    """Logical name -> fingerprinted filename, read from the build's manifest.json"""
+
+    def __init__(self, path, reload=False):
+        self.path = Path(path)
+        # In development, pick up rebuilds without restarting
+        self.reload = reload
+        self._entries = None
+        self._mtime = None
+
+    def _load(self):
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._entries, self._mtime = {}, None
+            return
+        if mtime != self._mtime:
+            self._entries = json.loads(self.path.read_text(encoding='utf-8'))
+            self._mtime = mtime
+
+    def get(self, name):
+        if self._entries is None or self.reload:
+            self._load()
+        return self._entries.get(name)
+
+    @property
+    def version(self):
+        """Changes with every build (None if assets aren't built)"""
+        if self._entries is None or self.reload:
+            self._load()
+        return self._mtime
+
+
+def asset_url(name):
+    """URL of the built asset, or None if assets haven't been built"""
+    filename = current_app.extensions['assets'].get(name)
+    return url_for('assets.asset', filename=filename) if filename else None
+
+
+def init_assets(app):
+    """Load the asset manifest and expose asset_url() to templates"""
+    manifest = AssetManifest(DIST_DIR / MANIFEST_NAME, reload=app.debug)
+    if manifest.get('app.css') is None:
+        logger.info("Static assets not built (flask build-assets), using the Tailwind CDN")
+    app.extensions['assets'] = manifest
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.jinja_env.globals['tailwind_cdn_url'] = TAILWIND_CSS_URL
@@ -0,0 +1,159 @@
+"""
+Batched, resumable data backfills for Alembic revisions.
+
+A revision that fills a new column with one `UPDATE ticket SET ...` holds the
+write lock (SQLite) or the row locks of the whole table (PostgreSQL) until the
+statement finishes, and on PostgreSQL it runs into DB_STATEMENT_TIMEOUT_MS on
+a big table. `backfill()` walks the table's id range instead, one bounded
+range per statement, committing after each:
+
+    from utils.backfill import backfill
+
+    def upgrade():
+        if not column_exists('ticket', 'price'):
+            op.add_column('ticket', sa.Column('price', sa.Integer(), nullable=True))
+        backfill('ticket', 'price = :price', where='price IS NULL', params={'price': 80},
+                 name='ticket.price')
+        if column_nullable('ticket', 'price'):
+            with op.batch_alter_table('ticket') as batch_op:
+                batch_op.alter_column('price', existing_type=sa.Integer(), nullable=False)
+
+Each batch is sized towards BACKFILL_BATCH_SECONDS and followed by a
+BACKFILL_PAUSE sleep, so writers wait at most about one batch. The last id
+done is stored in the job_checkpoint table (created here if an older revision
+runs before the table's own revision); a run that is interrupted, or stops at
+BACKFILL_MAX_SECONDS, continues from there on the next `flask db upgrade`.
+
+Settings (environment):
+
+    BACKFILL_BATCH_SIZE     Ids per statement to start with (default 5000)
+    BACKFILL_BATCH_SECONDS  Batch duration to aim for; the id range shrinks
+                            or grows to match (default 0.25)
+    BACKFILL_PAUSE          Seconds to sleep after each batch (default 0.05)
+    BACKFILL_MAX_SECONDS    Stop with BackfillInterrupted after this long,
+                            to finish in a later run (default 0 = no limit)
+
+Batches commit as they go, so the work before the backfill in the revision
+(typically the add_column) is committed too. Write such revisions so they
+can run again from the top: guard each schema step, and make the update
+idempotent with a `where` that only matches rows still to do. Constraint
+changes that SQLite can only make by copying the table (batch_alter_table)
+still copy it in one statement; do them after the backfill, in one batch.
+
+In offline mode (`flask db upgrade --sql`) the update is emitted as a single
+statement.
+"""
+import logging
+import os
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+logger = logging.getLogger('alembic.backfill')
+
+MIN_BATCH_SIZE = 100
+# Progress is logged at most this often
+LOG_INTERVAL = 10
+
+checkpoints = sa.Table(
+    'job_checkpoint', sa.MetaData(),
+    sa.Column('name', sa.String(length=50), primary_key=True),
+    sa.Column('value', sa.String(length=255), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+)
+
+
+class BackfillInterrupted(Exception):
+    """BACKFILL_MAX_SECONDS ran out; the next run continues from the checkpoint"""
+
+
+def _read_checkpoint(connection, name):
+    return connection.execute(sa.select(checkpoints.c.value).where(checkpoints.c.name == name)).scalar()
+
+
+def _write_checkpoint(connection, name, value):
+    values = {'value': str(value), 'updated_at': datetime.utcnow()}
+    updated = connection.execute(checkpoints.update().where(checkpoints.c.name == name).values(**values))
+    if not updated.rowcount:
+        connection.execute(checkpoints.insert().values(name=name, **values))
+
+
+def backfill(table, assignments, where=None, params=None, name=None, key='id',
+             batch_size=None, batch_seconds=None, pause=None, max_seconds=None, environ=os.environ):
+    """
+    Run `UPDATE table SET assignments WHERE where` in id ranges, committing after each.
+
+    Args:
+        table: table name
+        assignments: SQL for the SET clause, e.g. 'price = :price'
+        where: SQL condition matching the rows still to update, e.g. 'price IS NULL'
+        params: bind parameters used in assignments and where
+        name: checkpoint name, unique among backfills (e.g. 'ticket.price'); defaults to the table name
+        key: integer primary key column to walk
+        batch_size, batch_seconds, pause, max_seconds: override the BACKFILL_* settings
+
+    Returns:
+        Number of rows updated in this run
+
+    Raises:
+        BackfillInterrupted: if max_seconds ran out before the end of the table
+    """
+    params = dict(params or {})
+    statement = f"UPDATE {table} SET {assignments}"
+    context = op.get_context()
+    if context.as_sql:
+        op.execute(sa.text(statement + (f" WHERE {where}" if where else "")).bindparams(**params))
+        return 0
+
+    batch_size = batch_size or int(environ.get('BACKFILL_BATCH_SIZE', '5000'))
+    batch_seconds = batch_seconds or float(environ.get('BACKFILL_BATCH_SECONDS', '0.25'))
+    pause = float(environ.get('BACKFILL_PAUSE', '0.05')) if pause is None else pause
+    max_seconds = float(environ.get('BACKFILL_MAX_SECONDS', '0')) if max_seconds is None else max_seconds
+    checkpoint = f"backfill:{name or table}"
+    if len(checkpoint) > checkpoints.c.name.type.length:
+        raise ValueError(f"Backfill name too long for a checkpoint: {name!r}")
+    batch = sa.text(f"{statement} WHERE {f'({where}) AND ' if where else ''}"
+                    f"{key} > :backfill_low AND {key} <= :backfill_high")
+
+    started = time.monotonic()
+    logged = started
+    updated = 0
+    # Commit what the revision did so far; from here every statement commits on its own
+    with context.autocommit_block():
+        connection = op.get_bind()
+        checkpoints.create(connection, checkfirst=True)
+        low = int(_read_checkpoint(connection, checkpoint) or 0)
+        if low:
+            logger.info("Resuming backfill of %s after %s %d", table, key, low)
+        size = batch_size
+        while True:
+            # Rows inserted while the backfill runs move the end; stop once a pass reaches it
+            high_end = connection.execute(sa.text(f"SELECT MAX({key}) FROM {table}")).scalar() or 0
+            if low >= high_end:
+                break
+            while low < high_end:
+                if max_seconds and time.monotonic() - started > max_seconds:
+                    raise BackfillInterrupted(
+                        f"Backfill of {table} stopped after {max_seconds:g}s at {key} {low} of {high_end}; "
+                        f"run the upgrade again to continue")
+                high = min(low + size, high_end)
+                batch_started = time.perf_counter()
+                updated += connection.execute(batch, {**params, 'backfill_low': low, 'backfill_high': high}).rowcount
+                elapsed = time.perf_counter() - batch_started
+                _write_checkpoint(connection, checkpoint, high)
+                low = high
+
+                # Aim the next range at batch_seconds, changing it by at most a factor of two
+                ratio = min(max(batch_seconds / max(elapsed, 1e-6), 0.5), 2.0)
+                size = min(max(int(size * ratio), MIN_BATCH_SIZE), batch_size * 20)
+                if time.monotonic() - logged > LOG_INTERVAL:
+                    logged = time.monotonic()
+                    logger.info("Backfilling %s: %s %d of %d, %d rows updated", table, key, low, high_end, updated)
+                if pause:
+                    time.sleep(pause)
+        connection.execute(checkpoints.delete().where(checkpoints.c.name == checkpoint))
+
+    logger.info("Backfilled %s: %d rows in %.1fs", table, updated, time.monotonic() - started)
+    return updated
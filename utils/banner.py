@@ -1,5 +1,6 @@
 import os
 import subprocess
+import sys
 from datetime import datetime
 
 # Global flag to ensure banner is only shown once
@@ -33,7 +34,7 @@ def get_build_info():
     return build_time, git_hash_env
 
 def print_startup_banner():
-    """Print a nice startup banner with application info"""
+    """Print a nice startup banner with application info (to stderr, so CLI output stays clean)"""
     global _banner_shown
 
     # Only show banner once
@@ -56,13 +57,13 @@ def print_startup_banner():
 |___/_| |_| |_|___/      \__|_|\___|_|\_\___|\__|___/
     """
 
-    print("\033[96m" + banner + "\033[0m")  # Cyan color
-    print("\033[94m" + "="*70 + "\033[0m")  # Blue separator
-    print(f"\033[92m🛠️  Build Info:\033[0m")
-    print(f"   📅 Build Time: {build_time}")
-    print(f"   🔗 Git Hash:   {display_hash}")
+    print("\033[96m" + banner + "\033[0m", file=sys.stderr)  # Cyan color
+    print("\033[94m" + "="*70 + "\033[0m", file=sys.stderr)  # Blue separator
+    print(f"\033[92m🛠️  Build Info:\033[0m", file=sys.stderr)
+    print(f"   📅 Build Time: {build_time}", file=sys.stderr)
+    print(f"   🔗 Git Hash:   {display_hash}", file=sys.stderr)
     if git_date != "unknown":
-        print(f"   📝 Git Date:   {git_date}")
-    print("\033[94m" + "="*70 + "\033[0m")
-    print(f"\033[93m🚀 Starting Skate Sharpening Ticket System...\033[0m")
-    print()
+        print(f"   📝 Git Date:   {git_date}", file=sys.stderr)
+    print("\033[94m" + "="*70 + "\033[0m", file=sys.stderr)
+    print(f"\033[93m🚀 Starting Skate Sharpening Ticket System...\033[0m", file=sys.stderr)
+    print(file=sys.stderr)
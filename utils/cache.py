@@ -0,0 +1,54 @@
+"""
+Small in-process caches.
+
+Each gunicorn worker keeps its own copy, so values can differ between workers
+by up to the TTL - only use this for data where that staleness is acceptable
+(counts, rendered fragments), never for anything that decides access.
+"""
+import threading
+import time
+
+
+class TTLCache:
+    """Thread-safe dict whose entries expire `ttl` seconds after being set"""
+
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return default
+        return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict()
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_set(self, key, compute):
+        """Return the cached value for key, calling compute() to fill it on a miss"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] >= time.monotonic():
+            return entry[1]
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self):
+        """Drop expired entries, or the oldest half if everything is still fresh"""
+        now = time.monotonic()
+        expired = [key for key, (expires, _) in self._entries.items() if expires < now]
+        if not expired:
+            by_age = sorted(self._entries, key=lambda key: self._entries[key][0])
+            expired = by_age[:len(by_age) // 2 or 1]
+        for key in expired:
+            del self._entries[key]
@@ -0,0 +1,151 @@
+"""
+Response compression for dynamic pages.
+
+The sharpener dashboard and unpaid tickets list are tens of KB of repetitive
+HTML, and rink-side mobile coverage is poor, so text responses are compressed
+on the way out: brotli if the client accepts it and the Brotli package is
+installed, otherwise gzip.
+
+Only complete responses are compressed. A response is skipped if it has no
+Content-Length (a streamed body), is already encoded (the precompressed
+/assets files), is an event stream, carries Cache-Control: no-transform, or
+is smaller than the threshold, where the saving wouldn't pay for the CPU.
+
+Configuration (environment):
+    COMPRESSION                 Enable the middleware (default true)
+    COMPRESSION_MIN_SIZE        Smallest body in bytes worth compressing (default 500)
+    COMPRESSION_GZIP_LEVEL      1-9 (default 6)
+    COMPRESSION_BROTLI_QUALITY  0-11 (default 4; high qualities are for static files)
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/xml', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+}
+
+
+def parse_accept_encoding(header):
+    """{coding: quality} from an Accept-Encoding header"""
+    accepted = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header, available):
+    """Best coding in `available` (in order of preference) that the client accepts, or None"""
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """WSGI middleware that gzip/brotli-compresses complete text responses"""
+
+    def __init__(self, app, min_size=500, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def compressible(self, environ, status, headers):
+        """Whether this response could be compressed for some client"""
+        if environ.get('REQUEST_METHOD') == 'HEAD' or status[:3] in ('204', '206', '304'):
+            return False
+        values = {name.lower(): value for name, value in headers}
+        content_type = values.get('content-type', '').split(';')[0].strip().lower()
+        length = values.get('content-length')
+        return (content_type in COMPRESSIBLE_TYPES
+                and 'content-encoding' not in values
+                and 'no-transform' not in values.get('cache-control', '').lower()
+                and length is not None and length.isdigit() and int(length) >= self.min_size)
+
+    def __call__(self, environ, start_response):
+        encoding = choose_encoding(environ.get('HTTP_ACCEPT_ENCODING'), self.encodings)
+        captured = {}
+        buffer = []
+
+        def capture_start_response(status, headers, exc_info=None):
+            if exc_info is not None or not self.compressible(environ, status, headers):
+                captured.clear()
+                return start_response(status, headers, exc_info)
+            if encoding is None:
+                # Caches must still know that other clients get a compressed body
+                return start_response(status, _add_vary(headers), exc_info)
+            captured.update(status=status, headers=headers)
+            return buffer.append
+
+        # Flask calls start_response before returning its iterable
+        app_iter = self.app(environ, capture_start_response)
+        if not captured:
+            return app_iter
+
+        try:
+            buffer.extend(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+        body = self.compress(b''.join(buffer), encoding)
+        headers = [(name, value) for name, value in _add_vary(captured['headers'])
+                   if name.lower() != 'content-length']
+        headers.append(('Content-Encoding', encoding))
+        headers.append(('Content-Length', str(len(body))))
+        # A strong ETag names exact bytes; the compressed body is a different representation
+        headers = [(name, 'W/' + value if name.lower() == 'etag' and not value.startswith('W/') else value)
+                   for name, value in headers]
+        start_response(captured['status'], headers)
+        return [body]
+
+
+def _add_vary(headers):
+    """Headers with Accept-Encoding added to Vary"""
+    headers = list(headers)
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == 'vary':
+            tokens = [token.strip().lower() for token in value.split(',')]
+            if 'accept-encoding' not in tokens and '*' not in tokens:
+                headers[i] = (name, f"{value}, Accept-Encoding")
+            return headers
+    headers.append(('Vary', 'Accept-Encoding'))
+    return headers
+
+
+def init_compression(app):
+    """Wrap the WSGI app in the compression middleware if enabled"""
+    if not app.config.get('COMPRESSION', True):
+        return
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config.get('COMPRESSION_MIN_SIZE', 500),
+        gzip_level=app.config.get('COMPRESSION_GZIP_LEVEL', 6),
+        brotli_quality=app.config.get('COMPRESSION_BROTLI_QUALITY', 4),
+    )
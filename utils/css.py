@@ -0,0 +1,252 @@
+"""
+Just enough CSS handling to build our stylesheet without a Node toolchain.
+
+Tailwind's prebuilt CSS contains every utility class (about 3 MB). `purge`
+keeps only the rules whose classes appear somewhere in our templates, and
+`resolve_apply` expands the `@apply` directives of our own component classes
+(.btn-primary, .card-wrapper, ...) from the utilities' declarations, the way
+the Tailwind CLI would.
+
+The parser understands rules, nested at-rules (@media, @supports), opaque
+at-rule blocks (@keyframes, @font-face) and statement at-rules (@charset).
+It is written for Tailwind's output and our own small stylesheet, not as a
+general CSS parser.
+"""
+import re
+
+# At-rules whose block contains further rules (everything else is kept verbatim)
+NESTING_AT_RULES = ('@media', '@supports', '@document', '@layer')
+
+# Same idea as Tailwind's default extractor: anything that could be a class name
+CANDIDATE_PATTERN = re.compile(r'[^<>"\'`\s{}=]*[^<>"\'`\s{}=:.]')
+
+_CLASS_PATTERN = re.compile(r'\.((?:\\.|[\w-])+)')
+_ESCAPE_PATTERN = re.compile(r'\\(.)')
+# A prelude runs up to the first '{' or ';' outside of quotes
+_PRELUDE_PATTERN = re.compile(r'''(?:[^{};"']|"[^"]*"|'[^']*')*''')
+
+
+class CSSError(ValueError):
+    """Raised for input the parser or @apply can't handle"""
+
+
+class Rule:
+    """A qualified rule: selector prelude plus declaration body"""
+
+    def __init__(self, selector, body):
+        self.selector = selector
+        self.body = body
+
+    def selectors(self):
+        return split_top_level(self.selector, ',')
+
+    def __str__(self):
+        return f"{self.selector}{{{self.body}}}"
+
+
+class AtRule:
+    """An at-rule; `rules` is a list for nesting at-rules, `body` a string for opaque ones"""
+
+    def __init__(self, prelude, rules=None, body=None):
+        self.prelude = prelude
+        self.rules = rules
+        self.body = body
+
+    def __str__(self):
+        if self.rules is not None:
+            return f"{self.prelude}{{{''.join(str(rule) for rule in self.rules)}}}"
+        if self.body is not None:
+            return f"{self.prelude}{{{self.body}}}"
+        return f"{self.prelude};"
+
+
+class Comment:
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+
+def split_top_level(text, separator):
+    """Split on separator outside of (), [] and quotes"""
+    parts, depth, quote, start = [], 0, None, 0
+    for i, char in enumerate(text):
+        if quote:
+            if char == quote and text[i - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+    return [part for part in parts if part]
+
+
+def _find_block_end(css, start):
+    """Index of the '}' closing the block whose '{' is at start - 1"""
+    depth, quote, i = 1, None, start
+    while i < len(css):
+        char = css[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif css.startswith('/*', i):
+            i = css.index('*/', i + 2) + 1
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise CSSError("Unbalanced braces")
+
+
+def parse(css):
+    """Parse a stylesheet into a list of Rule, AtRule and Comment nodes"""
+    nodes, i = [], 0
+    while i < len(css):
+        if css[i].isspace():
+            i += 1
+            continue
+        if css.startswith('/*', i):
+            end = css.index('*/', i + 2) + 2
+            # Only license comments (/*! ... */) survive minification
+            if css.startswith('/*!', i):
+                nodes.append(Comment(css[i:end]))
+            i = end
+            continue
+
+        end = _PRELUDE_PATTERN.match(css, i).end()
+        prelude = ' '.join(css[i:end].split())
+        if end >= len(css) or css[end] == '}':
+            raise CSSError(f"Unexpected end of rule near {prelude[:40]!r}")
+        if css[end] == ';':
+            nodes.append(AtRule(prelude))
+            i = end + 1
+            continue
+
+        close = _find_block_end(css, end + 1)
+        inner = css[end + 1:close]
+        if not prelude.startswith('@'):
+            nodes.append(Rule(prelude, _minify_body(inner)))
+        elif prelude.split()[0].lower() in NESTING_AT_RULES:
+            nodes.append(AtRule(prelude, rules=parse(inner)))
+        else:
+            nodes.append(AtRule(prelude, body=inner.strip()))
+        i = close + 1
+    return nodes
+
+
+def _minify_body(body):
+    declarations = split_top_level(re.sub(r'/\*.*?\*/', '', body, flags=re.S), ';')
+    return ';'.join(declarations)
+
+
+def serialize(nodes):
+    return ''.join(str(node) for node in nodes)
+
+
+def class_names(selector):
+    """Class names referenced by a selector, unescaped (e.g. 'hover:bg-blue-600')"""
+    return [_ESCAPE_PATTERN.sub(r'\1', name) for name in _CLASS_PATTERN.findall(selector)]
+
+
+def extract_candidates(text):
+    """Every token in text that could be a class name"""
+    return set(CANDIDATE_PATTERN.findall(text))
+
+
+def purge(nodes, used_classes):
+    """
+    Drop the selectors that reference a class not in used_classes.
+
+    Rules without class selectors (element resets, :root variables) and opaque
+    at-rules such as @keyframes are always kept; nesting at-rules are dropped
+    once they are empty.
+    """
+    kept = []
+    for node in nodes:
+        if isinstance(node, Rule):
+            selectors = [selector for selector in node.selectors()
+                         if all(name in used_classes for name in class_names(selector))]
+            if selectors:
+                kept.append(Rule(','.join(selectors), node.body))
+        elif isinstance(node, AtRule) and node.rules is not None:
+            rules = purge(node.rules, used_classes)
+            if rules:
+                kept.append(AtRule(node.prelude, rules=rules))
+        else:
+            kept.append(node)
+    return kept
+
+
+def utility_index(nodes, media=()):
+    """
+    Map each class name to the rules that style it.
+
+    Values are lists of (media preludes, selector suffix, body); the suffix is
+    whatever follows the class in the selector (':hover', '>:not([hidden])~:not([hidden])').
+    """
+    index = {}
+    for node in nodes:
+        if isinstance(node, AtRule) and node.rules is not None:
+            for name, entries in utility_index(node.rules, media + (node.prelude,)).items():
+                index.setdefault(name, []).extend(entries)
+        elif isinstance(node, Rule):
+            for selector in node.selectors():
+                match = _CLASS_PATTERN.match(selector)
+                # Only selectors led by the class and referencing no other class
+                if match and len(class_names(selector)) == 1:
+                    name = _ESCAPE_PATTERN.sub(r'\1', match.group(1))
+                    index.setdefault(name, []).append((media, selector[match.end():], node.body))
+    return index
+
+
+def resolve_apply(nodes, index):
+    """
+    Expand @apply directives using utility_index().
+
+    `.btn { @apply bg-blue-500 hover:bg-blue-600; }` becomes `.btn{...}` plus
+    `.btn:hover{...}`. Raises CSSError for utilities that aren't in the index.
+    """
+    resolved = []
+    for node in nodes:
+        if isinstance(node, AtRule) and node.rules is not None:
+            resolved.append(AtRule(node.prelude, rules=resolve_apply(node.rules, index)))
+            continue
+        if not isinstance(node, Rule) or '@apply' not in node.body:
+            resolved.append(node)
+            continue
+
+        own, variants = [], {}
+        for declaration in split_top_level(node.body, ';'):
+            if not declaration.startswith('@apply'):
+                own.append(declaration)
+                continue
+            for name in declaration.split()[1:]:
+                name = name.rstrip('!')
+                if name not in index:
+                    raise CSSError(f"@apply: unknown utility {name!r} in {node.selector}")
+                for utility_media, suffix, body in index[name]:
+                    variants.setdefault((utility_media, suffix), []).append(body)
+
+        base = variants.pop(((), ''), [])
+        resolved.append(Rule(node.selector, ';'.join(base + own)))
+        for (utility_media, suffix), bodies in variants.items():
+            selector = ','.join(selector + suffix for selector in node.selectors())
+            rule = Rule(selector, ';'.join(bodies))
+            for prelude in reversed(utility_media):
+                rule = AtRule(prelude, rules=[rule])
+            resolved.append(rule)
+    return resolved
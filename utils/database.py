@@ -0,0 +1,69 @@
+"""
+Database URL and engine settings.
+
+SQLite (the default) needs no tuning. On PostgreSQL several app nodes share
+one server, so each worker keeps a small connection pool and bounds how long
+a statement may run:
+
+    DB_POOL_SIZE            Connections kept open per worker (default 5)
+    DB_MAX_OVERFLOW         Extra connections allowed under load (default 10)
+    DB_POOL_TIMEOUT         Seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE         Reconnect connections older than this, seconds (default 1800)
+    DB_POOL_PRE_PING        Test connections before use, survives server restarts (default true)
+    DB_STATEMENT_TIMEOUT_MS Cancel statements running longer than this (default 30000, 0 = off)
+
+Keep workers x nodes x (pool size + overflow) below the server's max_connections.
+"""
+import os
+from sqlalchemy import text
+
+
+def database_uri(url):
+    """
+    Normalise a DATABASE_URL for SQLAlchemy.
+
+    Heroku-style postgres:// URLs are not accepted by SQLAlchemy 2, and a bare
+    postgresql:// means psycopg 3 from SQLAlchemy 2.1 on; requirements.txt
+    pins psycopg2.
+    """
+    for prefix in ('postgres://', 'postgresql://'):
+        if url.startswith(prefix):
+            return 'postgresql+psycopg2://' + url[len(prefix):]
+    return url
+
+
+def is_postgres(uri):
+    return uri.startswith('postgresql')
+
+
+def engine_options(uri, environ=os.environ):
+    """SQLALCHEMY_ENGINE_OPTIONS for the database at uri"""
+    if not is_postgres(uri):
+        return {}
+    options = {
+        'pool_size': int(environ.get('DB_POOL_SIZE', '5')),
+        'max_overflow': int(environ.get('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': int(environ.get('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    }
+    statement_timeout = int(environ.get('DB_STATEMENT_TIMEOUT_MS', '30000'))
+    if statement_timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
+
+def reset_sequences(session, tables):
+    """
+    Move PostgreSQL id sequences past the largest id, after rows were inserted
+    with explicit ids (flask seed, flask copy-database). No-op elsewhere.
+    """
+    if session.get_bind().dialect.name != 'postgresql':
+        return
+    for table in tables:
+        if 'id' not in table.c or not table.c.id.autoincrement:
+            continue
+        session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+        ))
@@ -5,10 +5,12 @@ from flask import request, g, current_app
 # Cache for translations
 _translations_cache = {}
 _translation_file_times = {}
+# Bumped on every (re)load, so caches of rendered text can tell they are stale
+_translations_version = 0
 
 def load_translations():
     """Load translations from YAML files with hot-reloading in debug mode"""
-    global _translations_cache
+    global _translations_cache, _translations_version
 
     # In production, use cached translations
     if not current_app.debug and _translations_cache:
@@ -39,6 +41,7 @@ def load_translations():
                 print(f"Warning: Translation file translations/{lang}.yaml not found")
                 translations[lang] = {}
         _translations_cache = translations
+        _translations_version += 1
 
     return _translations_cache
 
@@ -46,6 +49,11 @@ def get_translations():
     """Get current translations (with hot-reloading in debug mode)"""
     return load_translations()
 
+def translations_version():
+    """Changes whenever the translations are reloaded"""
+    load_translations()
+    return _translations_version
+
 def get_language():
     """Detect language from Accept-Language header"""
     if hasattr(g, 'language'):
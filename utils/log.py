@@ -0,0 +1,202 @@
+"""
+Structured, non-blocking logging.
+
+Records are formatted as one JSON object per line (or plain text with
+LOG_FORMAT=text) and handed to a queue in the calling thread; a background
+QueueListener thread does the actual write to stdout, so a slow or blocked
+stdout never stalls a request.
+
+Each record carries the request id (X-Request-ID, generated if missing) and the
+ticket code being worked on, so all events for one request or ticket can be
+correlated.
+
+Configuration (environment):
+    LOG_LEVEL          Root level for the application loggers (default INFO)
+    LOG_LEVELS         Per-module overrides, e.g. "services.sms=DEBUG,routes=WARNING"
+    LOG_FORMAT         json (default) or text
+    LOG_SAMPLE_RATES   Sampling for chatty events, e.g. "sms_simulation=0.1"
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+
+# Top-level packages whose loggers are configured by init_logging
+APP_LOGGERS = ['routes', 'services', 'utils', 'models', 'commands']
+
+# Attributes every LogRecord has; anything else was passed via `extra`
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+def parse_key_values(value):
+    """Parse "a=1,b=2" into {'a': '1', 'b': '2'}, ignoring blank or malformed entries"""
+    result = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            key, val = item.split('=', 1)
+            result[key.strip()] = val.strip()
+    return result
+
+
+def bind_ticket(ticket_code):
+    """Attach a ticket code to all log records for the rest of this request"""
+    if has_request_context():
+        g.log_ticket_code = ticket_code
+
+
+def current_request_id():
+    """Request id of the current request, or None outside a request"""
+    if has_request_context():
+        return g.get('request_id')
+    return None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON including any `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_') and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable format for development, with request/ticket context appended"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        context = ' '.join(
+            f'{key}={value}' for key, value in record.__dict__.items()
+            if key not in _STANDARD_ATTRS and not key.startswith('_') and value is not None
+        )
+        return f'{line} [{context}]' if context else line
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drop a fraction of chatty records.
+
+    Records opt in with extra={'sample': '<key>'}; they are kept with the
+    probability configured for that key (1.0 if not configured).
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        key = getattr(record, 'sample', None)
+        if key is None or key not in self.rates:
+            return True
+        return random.random() < self.rates[key]
+
+
+class ContextQueueHandler(QueueHandler):
+    """QueueHandler that captures request context before handing off to the writer thread"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        if has_request_context():
+            if getattr(record, 'request_id', None) is None:
+                record.request_id = g.get('request_id')
+            if getattr(record, 'ticket_code', None) is None:
+                record.ticket_code = g.get('log_ticket_code') or (request.view_args or {}).get('ticket_code')
+        return record
+
+
+def configure_logging(level='INFO', module_levels=None, log_format='json', sample_rates=None, stream=None):
+    """Install the queue handler on the application loggers and start the writer thread"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if log_format == 'json' else TextFormatter())
+
+    handler = ContextQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rates or {}))
+
+    for name in APP_LOGGERS:
+        logger = logging.getLogger(name)
+        logger.handlers = [handler]
+        logger.setLevel(level.upper())
+        logger.propagate = False
+
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(module_level.upper())
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def log_writer_status():
+    """(writer thread alive, records waiting in the queue) for /readyz"""
+    listener = _listener
+    if listener is None:
+        return False, 0
+    thread = listener._thread
+    return thread is not None and thread.is_alive(), listener.queue.qsize()
+
+
+def init_logging(app):
+    """Configure logging from app config and tag every request with an id"""
+    sample_rates = {
+        key: float(rate) for key, rate in parse_key_values(app.config.get('LOG_SAMPLE_RATES')).items()
+    }
+    configure_logging(
+        level=app.config.get('LOG_LEVEL', 'INFO'),
+        module_levels=parse_key_values(app.config.get('LOG_LEVELS')),
+        log_format=app.config.get('LOG_FORMAT', 'json'),
+        sample_rates=sample_rates,
+    )
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = (request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16])[:64]
+
+    @app.after_request
+    def add_request_id_header(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
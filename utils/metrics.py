@@ -0,0 +1,192 @@
+"""
+Prometheus metrics for requests, SQL statements and outbound provider calls.
+
+Under gunicorn each worker is a separate process, so metrics are written to
+PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py) and merged when /metrics is
+scraped. Without that variable (development server) the in-process default
+registry is used.
+"""
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from flask import g, request, has_app_context
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client import multiprocess
+
+# Latency buckets tuned for a small web app: 5 ms .. 10 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REQUEST_COUNT = Counter(
+    'skate_http_requests_total',
+    'HTTP requests by endpoint, method and status code',
+    ['endpoint', 'method', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'skate_http_request_duration_seconds',
+    'HTTP request latency by endpoint',
+    ['endpoint', 'method'],
+    buckets=LATENCY_BUCKETS
+)
+DB_STATEMENTS = Histogram(
+    'skate_db_statements_per_request',
+    'Number of SQL statements executed per request',
+    ['endpoint'],
+    buckets=QUERY_COUNT_BUCKETS
+)
+DB_TIME = Histogram(
+    'skate_db_seconds_per_request',
+    'Total SQL statement time per request',
+    ['endpoint'],
+    buckets=LATENCY_BUCKETS
+)
+ADMISSION_REJECTIONS = Counter(
+    'skate_admission_rejections_total',
+    'Ticket requests rejected by admission control, by reason',
+    ['reason']
+)
+PAGE_CACHE_LOOKUPS = Counter(
+    'skate_page_cache_lookups_total',
+    'Rendered-page cache lookups by template and result (hit or miss)',
+    ['template', 'result']
+)
+
+# Paid -> claimed, in minutes-scale buckets: 1 min .. 2 h
+WAIT_BUCKETS = (60, 120, 300, 600, 900, 1200, 1800, 2700, 3600, 5400, 7200)
+TICKET_WAIT = Histogram(
+    'skate_ticket_wait_seconds',
+    'Time from payment until a sharpener started on the ticket, by dispatch mode',
+    ['dispatch'],
+    buckets=WAIT_BUCKETS
+)
+TICKETS_SHARPENED = Counter(
+    'skate_tickets_sharpened_total',
+    'Completed tickets by dispatch mode (rate() gives throughput)',
+    ['dispatch']
+)
+DISPATCH_EVENTS = Counter(
+    'skate_dispatch_events_total',
+    'Dispatcher offers and assignments by event (offered, accepted, skipped, expired, assigned)',
+    ['event']
+)
+
+OUTBOUND_LATENCY = Histogram(
+    'skate_outbound_request_duration_seconds',
+    'Latency of calls to external providers (Stripe, GatewayAPI, SMTP, reCAPTCHA)',
+    ['provider', 'operation', 'outcome'],
+    buckets=LATENCY_BUCKETS
+)
+
+# Outcomes of the latest calls per provider in this worker, for /readyz:
+# (time.monotonic(), ok) pairs
+RECENT_OUTBOUND_CALLS = 50
+_recent_outbound = defaultdict(lambda: deque(maxlen=RECENT_OUTBOUND_CALLS))
+
+
+def recent_outbound(window_seconds):
+    """{provider: (calls, errors)} over this worker's calls in the last window_seconds"""
+    since = time.monotonic() - window_seconds
+    summary = {}
+    for provider, calls in list(_recent_outbound.items()):
+        outcomes = [ok for started, ok in list(calls) if started >= since]
+        summary[provider] = (len(outcomes), outcomes.count(False))
+    return summary
+
+
+@contextmanager
+def observe_outbound(provider, operation):
+    """
+    Time a call to an external provider.
+
+    Usage:
+        with observe_outbound('stripe', 'payment_intent.create'):
+            stripe.PaymentIntent.create(...)
+
+    The outcome label is 'error' if the block raises, 'ok' otherwise.
+    """
+    start = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        OUTBOUND_LATENCY.labels(provider, operation, outcome).observe(time.perf_counter() - start)
+        _recent_outbound[provider].append((time.monotonic(), outcome == 'ok'))
+
+
+class TicketStatusCollector:
+    """Scrape-time gauges for ticket counts per status (paid = sharpening queue depth)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def collect(self):
+        from models import db, Ticket
+
+        gauge = GaugeMetricFamily('skate_tickets', 'Tickets by status', labels=['status'])
+        with self.app.app_context():
+            rows = db.session.query(Ticket.status, func.count(Ticket.id)).group_by(Ticket.status).all()
+        for status, count in rows:
+            gauge.add_metric([status or 'unknown'], count)
+        yield gauge
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # On the execution context, which goes away with the statement even if it fails
+    context.metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, 'metrics_started', None)
+    if start is not None and has_app_context() and 'metrics_start' in g:
+        g.metrics_db_statements += 1
+        g.metrics_db_seconds += time.perf_counter() - start
+
+
+def generate_metrics(app):
+    """Render all metrics in Prometheus text format, merged across worker processes"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    # Ticket gauges come straight from the database, so they are the same
+    # whichever worker serves the scrape and must not be merged per process
+    ticket_registry = CollectorRegistry()
+    ticket_registry.register(TicketStatusCollector(app))
+
+    return generate_latest(registry) + generate_latest(ticket_registry), CONTENT_TYPE_LATEST
+
+
+def init_metrics(app):
+    """Install request hooks and SQLAlchemy event listeners"""
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_db_statements = 0
+        g.metrics_db_seconds = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'metrics_start' not in g:
+            return response
+
+        endpoint = request.endpoint or 'unknown'
+        REQUEST_COUNT.labels(endpoint, request.method, str(response.status_code)).inc()
+        REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - g.metrics_start)
+        DB_STATEMENTS.labels(endpoint).observe(g.metrics_db_statements)
+        DB_TIME.labels(endpoint).observe(g.metrics_db_seconds)
+        return response
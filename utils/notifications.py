@@ -1,16 +1,21 @@
 """
 Email notification utilities for sharpeners
 """
+import logging
 from email.utils import formataddr
 from flask import current_app
 from flask_mail import Message, Mail
 from models import Sharpener
+from services.clubs import club_url, get_club
 from utils.helpers import mask_phone_number
+from utils.metrics import observe_outbound
+
+logger = logging.getLogger(__name__)
 
 
 def notify_sharpeners_new_ticket(ticket):
     """
-    Send email notification to all registered sharpeners about a new confirmed ticket.
+    Send email notification to the sharpeners of the ticket's club about a new confirmed ticket.
 
     Args:
         ticket: The Ticket object that was just confirmed
@@ -18,19 +23,17 @@ def notify_sharpeners_new_ticket(ticket):
     Returns:
         int: Number of emails sent successfully
     """
-    from app import app
-
-    # Get all active sharpeners
-    sharpeners = Sharpener.query.all()
+    # The club's sharpeners
+    sharpeners = Sharpener.query.filter_by(club_id=ticket.club_id).all()
 
     if not sharpeners:
-        print("[NOTIFICATION] No sharpeners to notify")
+        logger.info("No sharpeners to notify", extra={'ticket_code': ticket.code})
         return 0
 
     # Check if mail is configured
     if not current_app.config.get('MAIL_SERVER'):
-        print("[NOTIFICATION] Email not configured - skipping notification")
-        print(f"[NOTIFICATION] Would notify {len(sharpeners)} sharpeners about ticket {ticket.code}")
+        logger.info("Email not configured - would notify %d sharpeners", len(sharpeners),
+                    extra={'ticket_code': ticket.code})
         return 0
 
     # Build list of recipients with proper name formatting
@@ -40,10 +43,11 @@ def notify_sharpeners_new_ticket(ticket):
             recipients.append(formataddr((sharpener.name, sharpener.email)))
 
     if not recipients:
-        print("[NOTIFICATION] No sharpener email addresses configured")
+        logger.warning("No sharpener email addresses configured", extra={'ticket_code': ticket.code})
         return 0
 
     mail = Mail(current_app)
+    dashboard_url = club_url(get_club(ticket.club_id), '/sharpener')
 
     try:
         # Create single email message to all sharpeners
@@ -66,7 +70,7 @@ Skates: {ticket.brand} {ticket.color} size {ticket.size}
 {'Price: ' + str(ticket.price) + ' DKK' if ticket.price > 0 else 'Confirmation completed'}
 
 Log in to claim this ticket:
-{current_app.config.get('BASE_URL', 'http://localhost:5000')}/sharpener
+{dashboard_url}
 
 Best regards,
 SKK Skate Sharpening System
@@ -91,7 +95,7 @@ SKK Skate Sharpening System
     </div>
 
     <p>
-        <a href="{current_app.config.get('BASE_URL', 'http://localhost:5000')}/sharpener"
+        <a href="{dashboard_url}"
            style="background-color: #2563eb; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; display: inline-block;">
             Log in to claim this ticket
         </a>
@@ -105,11 +109,12 @@ SKK Skate Sharpening System
 """
 
         # Send email
-        mail.send(msg)
-        print(f"[NOTIFICATION] Sent notification to {len(recipients)} sharpeners about ticket {ticket.code}")
-        print(f"[NOTIFICATION] Recipients: {', '.join(recipients)}")
+        with observe_outbound('smtp', 'send'):
+            mail.send(msg)
+        logger.info("Sent new ticket notification to %d sharpeners", len(recipients),
+                    extra={'ticket_code': ticket.code, 'recipients': recipients})
         return len(recipients)
 
     except Exception as e:
-        print(f"[NOTIFICATION] Failed to send notification: {e}")
+        logger.exception("Failed to send new ticket notification", extra={'ticket_code': ticket.code})
         return 0
@@ -0,0 +1,68 @@
+"""
+Rendered-page cache for the public intake page.
+
+customer.index is the busiest page and is identical for every visitor who
+shares a language, so its HTML is rendered once per worker for each key:
+
+    (template, club, URL prefix, language, price, translations version,
+     template objects, asset build)
+
+The URL prefix is part of the key because links in the page carry the
+/c/<slug> prefix when the club is reached by path. Reloaded translations or
+templates, a new asset build and a changed club or SHARPENING_PRICE_DKK
+price all give a new key. Old entries age out with PAGE_CACHE_TTL.
+
+Personal parts are rendered as slot markers and filled in per request after
+the lookup. Today that is only the flashed messages: there is no server-side
+CSRF token, and the browser fetches the reCAPTCHA token itself, so the form
+is the same for everyone.
+
+The cache is bypassed while the SQL profiler is on, because its debug panel
+is per request.
+"""
+from flask import current_app, render_template, request, session
+from markupsafe import Markup
+from utils.cache import TTLCache
+from utils.i18n import get_language, translations_version
+from utils.metrics import PAGE_CACHE_LOOKUPS
+from services.clubs import current_club
+
+FLASHES_SLOT = Markup('<!--page-cache:flashes-->')
+
+
+def render_cached(template_name, **context):
+    """render_template() served from the page cache, with flashes filled in"""
+    app = current_app
+    cache = app.extensions.get('page_cache')
+    if cache is None or app.config.get('SQL_PROFILER'):
+        return render_template(template_name, **context)
+
+    jinja_env = app.jinja_env
+    club = current_club()
+    key = (
+        template_name,
+        club.id,
+        request.script_root,
+        get_language(),
+        club.price,
+        translations_version(),
+        # Jinja replaces a template object when it reloads the file
+        jinja_env.get_template(template_name),
+        jinja_env.get_template('base.html'),
+        app.extensions['assets'].version,
+    )
+    html = cache.get(key)
+    PAGE_CACHE_LOOKUPS.labels(template_name, 'miss' if html is None else 'hit').inc()
+    if html is None:
+        html = render_template(template_name, page_cache_slots={'flashes': FLASHES_SLOT}, **context)
+        cache.set(key, html)
+
+    # Most visitors have no flashes; don't render the partial for them
+    flashes = render_template('_flashes.html') if session.get('_flashes') else ''
+    return html.replace(FLASHES_SLOT, flashes, 1)
+
+
+def init_page_cache(app):
+    """Create the per-worker page cache (app.extensions['page_cache']) if enabled"""
+    if app.config.get('PAGE_CACHE', True):
+        app.extensions['page_cache'] = TTLCache(ttl=app.config.get('PAGE_CACHE_TTL', 300), max_entries=64)
@@ -0,0 +1,75 @@
+"""
+Keyset (seek) pagination.
+
+Pages are addressed by the (timestamp, id) of the last row shown rather than
+an OFFSET, so fetching any page costs one index range scan of page_size + 1
+rows no matter how deep into the list it is.
+"""
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+def encode_cursor(timestamp, row_id):
+    """Encode a (timestamp, id) position as a URL-safe string"""
+    return f"{timestamp.isoformat()}_{row_id}"
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor; returns None if it is malformed"""
+    if not cursor:
+        return None
+    try:
+        timestamp, row_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        return None
+
+
+class KeysetPage:
+    """One page of rows plus the cursors for its neighbours"""
+
+    def __init__(self, items, next_cursor, prev_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def keyset_page(query, time_column, id_column, page_size, after=None, before=None):
+    """
+    Return a newest-first KeysetPage of `query`.
+
+    Args:
+        query: filtered (but unordered) query
+        time_column, id_column: the sort key; the pair must be unique and
+            should be covered by an index together with the query's filters
+        page_size: number of rows per page
+        after: cursor of the last row of the previous page (older rows)
+        before: cursor of the first row of the next page (newer rows)
+    """
+    key = tuple_(time_column, id_column)
+    after_key, before_key = decode_cursor(after), decode_cursor(before)
+
+    if before_key and not after_key:
+        # Walk backwards (oldest first) from the cursor, then flip
+        rows = (query.filter(key > before_key)
+                .order_by(time_column.asc(), id_column.asc())
+                .limit(page_size + 1).all())
+        has_newer = len(rows) > page_size
+        items = list(reversed(rows[:page_size]))
+        has_older = True
+    else:
+        if after_key:
+            query = query.filter(key < after_key)
+        rows = (query.order_by(time_column.desc(), id_column.desc())
+                .limit(page_size + 1).all())
+        has_older = len(rows) > page_size
+        items = rows[:page_size]
+        has_newer = after_key is not None
+
+    time_attr, id_attr = time_column.key, id_column.key
+    next_cursor = prev_cursor = None
+    if items and has_older:
+        next_cursor = encode_cursor(getattr(items[-1], time_attr), getattr(items[-1], id_attr))
+    if items and has_newer:
+        prev_cursor = encode_cursor(getattr(items[0], time_attr), getattr(items[0], id_attr))
+    return KeysetPage(items, next_cursor, prev_cursor)
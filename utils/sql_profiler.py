@@ -0,0 +1,148 @@
+"""
+Development-mode SQL profiler.
+
+Enabled with SQL_PROFILER=true. Records every SQL statement executed while
+handling a request - parameters, duration and the line of application code
+that triggered it - and flags statement shapes that repeat within a request,
+which is the signature of an N+1 query pattern.
+
+Hooks in at the engine level, so it sees Ticket.query, db.session.query and
+raw db.session.execute calls alike.
+"""
+import os
+import logging
+import re
+import time
+import traceback
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Statements repeated at least this many times in one request are flagged
+DUPLICATE_THRESHOLD = 3
+
+_NUMBER_RE = re.compile(r"\b\d+(\.\d+)?\b")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:\?|%\(\w+\)s|:\w+)\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement):
+    """Normalize a SQL statement so that calls differing only in literals compare equal"""
+    shape = _STRING_RE.sub('?', statement)
+    shape = _NUMBER_RE.sub('?', shape)
+    shape = _IN_LIST_RE.sub('IN (...)', shape)
+    return _WHITESPACE_RE.sub(' ', shape).strip()
+
+
+def calling_frame(listener_file=__file__):
+    """Return 'file:line in function' for the innermost application frame outside listener_file"""
+    skip = {os.path.abspath(__file__), os.path.abspath(listener_file)}
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if (filename.startswith(PROJECT_ROOT)
+                and 'site-packages' not in filename
+                and filename not in skip):
+            return f"{os.path.relpath(filename, PROJECT_ROOT)}:{frame.lineno} in {frame.name}"
+    return 'unknown'
+
+
+class RequestProfile:
+    """SQL statements collected for a single request"""
+
+    def __init__(self):
+        self.statements = []
+
+    def add(self, statement, parameters, duration, origin):
+        self.statements.append({
+            'statement': statement,
+            'parameters': parameters,
+            'duration_ms': duration * 1000,
+            'origin': origin,
+            'shape': statement_shape(statement),
+        })
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def total_ms(self):
+        return sum(s['duration_ms'] for s in self.statements)
+
+    def duplicates(self, threshold=DUPLICATE_THRESHOLD):
+        """
+        Statement shapes executed at least `threshold` times.
+
+        Returns:
+            list of dicts with shape, count, total_ms and the distinct origins,
+            most frequent first
+        """
+        counts = Counter(s['shape'] for s in self.statements)
+        result = []
+        for shape, count in counts.most_common():
+            if count < threshold:
+                break
+            matching = [s for s in self.statements if s['shape'] == shape]
+            result.append({
+                'shape': shape,
+                'count': count,
+                'total_ms': sum(s['duration_ms'] for s in matching),
+                'origins': sorted({s['origin'] for s in matching}),
+            })
+        return result
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # On the execution context, which goes away with the statement even if it fails
+    context.sql_profiler_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, 'sql_profiler_started', None)
+    if start is not None and has_request_context() and 'sql_profile' in g:
+        g.sql_profile.add(statement, parameters, time.perf_counter() - start, calling_frame())
+
+
+def init_sql_profiler(app):
+    """Install the profiler if SQL_PROFILER is enabled in the app config"""
+    if not app.config.get('SQL_PROFILER'):
+        return
+
+    slow_ms = app.config.get('SQL_PROFILER_SLOW_MS', 100)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_sql_profile():
+        g.sql_profile = RequestProfile()
+
+    @app.after_request
+    def report_sql_profile(response):
+        profile = g.get('sql_profile')
+        if profile is None:
+            return response
+
+        duplicates = profile.duplicates()
+        response.headers['X-SQL-Queries'] = str(profile.count)
+        response.headers['X-SQL-Time-Ms'] = f"{profile.total_ms:.1f}"
+        response.headers['X-SQL-Duplicates'] = str(len(duplicates))
+
+        if profile.total_ms > slow_ms:
+            logger.warning("Slow request %s %s: %d queries in %.1f ms",
+                           request.method, request.path, profile.count, profile.total_ms)
+            for dup in duplicates:
+                logger.warning("N+1 suspect (%dx, %.1f ms) from %s: %s",
+                               dup['count'], dup['total_ms'], ', '.join(dup['origins']), dup['shape'][:200])
+        return response
+
+    @app.context_processor
+    def inject_sql_profile():
+        return {'sql_profile': g.get('sql_profile')}